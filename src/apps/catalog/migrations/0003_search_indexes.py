@@ -0,0 +1,49 @@
+from django.contrib.postgres.operations import TrigramExtension, UnaccentExtension
+from django.db import migrations
+
+# unaccent() no es IMMUTABLE y no se puede usar en un índice: lo envolvemos
+CREATE_FUNCTION = """
+CREATE OR REPLACE FUNCTION public.immutable_unaccent(text) RETURNS text
+AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+"""
+
+# Deben coincidir con las expresiones de apps.catalog.search (immutable_unaccent(lower(campo)))
+INDEXES = [
+    ("catalog_product_nombre_trgm", "catalog_product", "nombre"),
+    ("catalog_provider_nombre_trgm", "catalog_provider", "nombre_empresa"),
+    ("catalog_provider_nit_trgm", "catalog_provider", "nit"),
+    ("catalog_provider_codigo_trgm", "catalog_provider", "codigo"),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(CREATE_FUNCTION)
+    for name, table, column in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" '
+            f'USING gin (public.immutable_unaccent(lower("{column}")) gin_trgm_ops)'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+    schema_editor.execute("DROP FUNCTION IF EXISTS public.immutable_unaccent(text)")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0002_alter_provider_codigo"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        UnaccentExtension(),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
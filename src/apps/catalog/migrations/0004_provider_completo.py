@@ -0,0 +1,47 @@
+# Generated by Django 5.0.7 on 2026-10-17 22:00
+
+from django.db import migrations, models
+
+# Copia de apps.catalog.models.PROVIDER_REQUIRED_FIELDS al momento de la migración
+REQUIRED_FIELDS = ("nit", "telefono", "direccion", "entidad", "nro_cuenta", "datos_transferencia")
+
+
+def backfill_completo(apps, schema_editor):
+    Provider = apps.get_model("catalog", "Provider")
+    qs = Provider.objects.all()
+    for field in REQUIRED_FIELDS:
+        qs = qs.exclude(**{field: ""})
+    # Un solo UPDATE (el resto queda en False por el default)
+    qs.update(completo=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0003_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='provider',
+            name='completo',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(backfill_completo, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='provider',
+            index=models.Index(fields=['nombre_empresa', 'id'], name='prov_nombre_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='provider',
+            index=models.Index(condition=models.Q(('completo', False)), fields=['nombre_empresa', 'id'], name='prov_incompleto_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='provider',
+            index=models.Index(condition=models.Q(('nit', ''), _negated=True), fields=['nombre_empresa', 'id'], name='prov_con_nit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='provider',
+            index=models.Index(condition=models.Q(('nit', '')), fields=['nombre_empresa', 'id'], name='prov_sin_nit_idx'),
+        ),
+    ]
@@ -1,7 +1,12 @@
 from django.db import models
+from django.db.models import Q
 
 from django.db import models
 
+# Campos que debe tener un proveedor para considerarse "completo"
+PROVIDER_REQUIRED_FIELDS = ("nit", "telefono", "direccion", "entidad", "nro_cuenta", "datos_transferencia")
+
+
 class Provider(models.Model):
     codigo = models.CharField(max_length=20, unique=True, null=True, blank=True)
   # opcional
@@ -20,6 +25,29 @@ class Provider(models.Model):
 
     activo = models.BooleanField(default=True)
 
+    # ✅ Guardado (no calculado en cada consulta): se actualiza en save()
+    completo = models.BooleanField(default=False, editable=False)
+
+    class Meta:
+        indexes = [
+            # Listado: paginación por cursor (nombre_empresa, id)
+            models.Index(fields=["nombre_empresa", "id"], name="prov_nombre_id_idx"),
+            # Tabs del listado (índices parciales, mismo orden)
+            models.Index(fields=["nombre_empresa", "id"], condition=Q(completo=False), name="prov_incompleto_idx"),
+            models.Index(fields=["nombre_empresa", "id"], condition=~Q(nit=""), name="prov_con_nit_idx"),
+            models.Index(fields=["nombre_empresa", "id"], condition=Q(nit=""), name="prov_sin_nit_idx"),
+        ]
+
+    def compute_completo(self) -> bool:
+        return all(getattr(self, f) for f in PROVIDER_REQUIRED_FIELDS)
+
+    def save(self, *args, **kwargs):
+        self.completo = self.compute_completo()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and set(update_fields) & set(PROVIDER_REQUIRED_FIELDS):
+            kwargs["update_fields"] = {*update_fields, "completo"}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.nombre_empresa
 
@@ -0,0 +1,119 @@
+"""
+Búsqueda para los typeahead de productos y proveedores.
+
+En PostgreSQL: sin acentos y sin mayúsculas (public.immutable_unaccent(lower(campo))),
+por prefijo / contiene / similitud de palabras (pg_trgm), con índices GIN trigram
+(migración catalog 0003). Primero los que empiezan con el texto, luego por similitud.
+Sin PostgreSQL (desarrollo) es un icontains simple, sin índices ni ranking.
+"""
+import unicodedata
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection
+from django.db.models import Case, CharField, Func, IntegerField, Q, Value, When
+from django.db.models.functions import Lower
+
+from .models import Product, Provider
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE = 50
+# Con menos letras pg_trgm no aporta: solo prefijo
+TRIGRAM_MIN_LENGTH = 3
+
+PROVIDER_SEARCH_FIELDS = ["nombre_empresa", "nit", "codigo"]
+
+
+class ImmutableUnaccent(Func):
+    """unaccent() no es IMMUTABLE: usamos el envoltorio de la migración para poder indexarlo."""
+    function = "public.immutable_unaccent"
+    output_field = CharField()
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in text if not unicodedata.combining(c)).lower().strip()
+
+
+def _page_slice(page: int):
+    page = min(max(page, 1), SEARCH_MAX_PAGE)
+    offset = (page - 1) * SEARCH_PAGE_SIZE
+    return page, offset, offset + SEARCH_PAGE_SIZE + 1
+
+
+def _pg_match(qs, term, fields):
+    """Anota immutable_unaccent(lower(campo)) y arma los filtros (prefijo, coincidencia)."""
+    aliases = [f"_s_{f}" for f in fields]
+    qs = qs.annotate(**{alias: ImmutableUnaccent(Lower(f)) for alias, f in zip(aliases, fields)})
+
+    prefix = Q()
+    for alias in aliases:
+        prefix |= Q(**{f"{alias}__startswith": term})
+
+    match = prefix
+    if len(term) >= TRIGRAM_MIN_LENGTH:
+        for alias in aliases:
+            match |= Q(**{f"{alias}__contains": term})
+        match |= Q(**{f"{aliases[0]}__trigram_word_similar": term})
+    return qs, aliases, prefix, match
+
+
+def _pg_search(qs, term, fields, order_field):
+    qs, aliases, prefix, match = _pg_match(qs, term, fields)
+    return (
+        qs.filter(match)
+        .annotate(
+            _rank=Case(When(prefix, then=Value(0)), default=Value(1), output_field=IntegerField()),
+            _sim=TrigramWordSimilarity(term, aliases[0]),
+        )
+        .order_by("_rank", "-_sim", order_field, "id")
+    )
+
+
+def _plain_match(q, fields):
+    match = Q()
+    for field in fields:
+        match |= Q(**{f"{field}__icontains": q.strip()})
+    return match
+
+
+def _search(qs, q, fields, order_field):
+    term = normalize(q)
+    if not term:
+        return qs.order_by(order_field, "id")
+    if connection.vendor == "postgresql":
+        return _pg_search(qs, term, fields, order_field)
+    return qs.filter(_plain_match(q, fields)).order_by(order_field, "id")
+
+
+def search_products(q: str, page: int = 1):
+    """Productos ACTIVOS. Devuelve (page, [{"id", "text", "unidad"}], has_more)."""
+    page, start, stop = _page_slice(page)
+    qs = _search(Product.objects.filter(activo=True), q, ["nombre"], "nombre")
+    rows = list(qs.values_list("id", "nombre", "unidad")[start:stop])
+
+    results = [{"id": pk, "text": nombre, "unidad": unidad} for pk, nombre, unidad in rows[:SEARCH_PAGE_SIZE]]
+    return page, results, len(rows) > SEARCH_PAGE_SIZE
+
+
+def search_providers(q: str, page: int = 1):
+    """Proveedores por nombre, NIT o código. Devuelve (page, [{"id", "text", "nit"}], has_more)."""
+    page, start, stop = _page_slice(page)
+    qs = _search(Provider.objects.all(), q, PROVIDER_SEARCH_FIELDS, "nombre_empresa")
+    rows = list(qs.values_list("id", "nombre_empresa", "nit")[start:stop])
+
+    results = [{"id": pk, "text": nombre, "nit": nit} for pk, nombre, nit in rows[:SEARCH_PAGE_SIZE]]
+    return page, results, len(rows) > SEARCH_PAGE_SIZE
+
+
+def filter_providers(qs, q: str):
+    """
+    Filtra un queryset de proveedores por nombre / NIT / código SIN cambiar su orden
+    (para listados paginados por cursor). En PostgreSQL usa los mismos índices trigram.
+    """
+    term = normalize(q)
+    if not term:
+        return qs
+    if connection.vendor == "postgresql":
+        qs, _, _, match = _pg_match(qs, term, PROVIDER_SEARCH_FIELDS)
+        return qs.filter(match)
+    return qs.filter(_plain_match(q, PROVIDER_SEARCH_FIELDS))
@@ -1,3 +1,56 @@
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from apps.procurement.forms import ComparativeItemForm, ComparativeSupplierForm
+
+from .models import Product, Provider
+from .search import SEARCH_PAGE_SIZE, search_products, search_providers
+
+# El widget enlaza js/autocomplete.js: sin collectstatic no hay manifest
+STATIC_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+class SearchTests(TestCase):
+    def test_products_are_active_prefix_first_and_paginated(self):
+        Product.objects.create(nombre="Arena fina")
+        Product.objects.create(nombre="Cemento", activo=False)
+        for i in range(SEARCH_PAGE_SIZE + 2):
+            Product.objects.create(nombre=f"Cemento {i:02d}")
+
+        page, results, has_more = search_products("cemento")
+        self.assertEqual((page, len(results), has_more), (1, SEARCH_PAGE_SIZE, True))
+        self.assertEqual(results[0]["text"], "Cemento 00")
+        _, results, has_more = search_products("cemento", page=2)
+        self.assertEqual(([r["text"] for r in results], has_more), (["Cemento 20", "Cemento 21"], False))
+        self.assertEqual(search_products("")[1][0]["text"], "Arena fina")
+
+    def test_providers_match_name_nit_or_code(self):
+        a = Provider.objects.create(nombre_empresa="Ferretería Sur", nit="778899")
+        b = Provider.objects.create(nombre_empresa="Maderas", codigo="FER-01")
+        self.assertEqual([r["id"] for r in search_providers("778")[1]], [a.pk])
+        self.assertEqual([r["id"] for r in search_providers("fer")[1]], [a.pk, b.pk])
+
+
+@override_settings(STORAGES=STATIC_STORAGES)
+class AutocompleteLabelTests(TestCase):
+    def test_label_is_one_lookup_by_pk_and_only_with_a_value(self):
+        p = Product.objects.create(nombre="Cemento")
+        with CaptureQueriesContext(connection) as ctx:
+            html = str(ComparativeItemForm()["producto"])
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertNotIn("<option", html)
+
+        with CaptureQueriesContext(connection) as ctx:
+            html = str(ComparativeItemForm(initial={"producto": p.pk})["producto"])
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn('value="Cemento"', html)
+
+    def test_unknown_provider_has_no_label(self):
+        Provider.objects.create(nombre_empresa="Maderas")
+        html = str(ComparativeSupplierForm(data={"proveedor": "999999"})["proveedor"])
+        self.assertIn('value="999999"', html)
+        self.assertIn('id="id_proveedor_search" value=""', html)
@@ -9,4 +9,8 @@ urlpatterns = [
     path("productos/nuevo/", views.product_create, name="product_create"),
     path("productos/<int:pk>/editar/", views.product_edit, name="product_edit"),
     path("productos/<int:pk>/eliminar/", views.product_delete, name="product_delete"),
+
+    # Typeahead de formularios
+    path("api/catalogo/productos/", views.api_product_search, name="api_product_search"),
+    path("api/catalogo/proveedores/", views.api_provider_search, name="api_provider_search"),
 ]
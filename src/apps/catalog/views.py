@@ -1,10 +1,14 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.db.models import Count, Q
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.http import urlencode
+from apps.core.pagination import keyset_paginate_by
 from apps.catalog.models import Product
 from apps.catalog.models import Provider
 from .forms import ProviderForm, ProductForm
-from django.db import models
+from .search import filter_providers, search_products, search_providers
 
 
 @login_required
@@ -76,34 +80,49 @@ def product_create(request):
     return render(request, "catalog/product_form.html", {"form": form, "next_url": next_url})
 
 
+# Tabs del listado de proveedores: filtro (servido por un índice parcial de Provider.Meta)
+PROVIDER_TABS = {
+    "all": None,
+    "incomplete": Q(completo=False),
+    "with_nit": ~Q(nit=""),
+    "no_nit": Q(nit=""),
+}
+
+
 @login_required
 def provider_list(request):
-    proveedores = Provider.objects.order_by("nombre_empresa")
-
+    q = (request.GET.get("q") or "").strip()
     f = (request.GET.get("f") or "all").lower()
-
-    if f == "incomplete":
-        # Incompleto = faltan datos importantes (campos vacíos)
-        proveedores = proveedores.filter(
-            models.Q(nit="") |
-            models.Q(telefono="") |
-            models.Q(direccion="") |
-            models.Q(entidad="") |
-            models.Q(nro_cuenta="") |
-            models.Q(datos_transferencia="")
-        )
-    elif f == "with_nit":
-        proveedores = proveedores.exclude(nit="")
-    elif f == "no_nit":
-        proveedores = proveedores.filter(nit="")
-    else:
+    if f not in PROVIDER_TABS:
         f = "all"
 
+    base = filter_providers(Provider.objects.all(), q)
+
+    # ✅ Conteo de TODOS los tabs en una sola consulta agrupada
+    counts = base.aggregate(
+        **{tab: Count("id", filter=cond) if cond else Count("id") for tab, cond in PROVIDER_TABS.items()}
+    )
+
+    # ✅ Solo la página actual (cursor sobre nombre_empresa, id; índices parciales por tab)
+    qs = base.filter(PROVIDER_TABS[f]) if PROVIDER_TABS[f] else base
+    page = keyset_paginate_by(
+        qs.only("id", "nombre_empresa", "nit", "telefono", "completo"), request, "nombre_empresa"
+    )
+
     return render(
         request,
         "catalog/provider_list.html",
-        {"proveedores": proveedores, "f": f},
+        {
+            "proveedores": page.object_list,
+            "page": page,
+            "f": f,
+            "q": q,
+            "counts": counts,
+            "base_query": urlencode({"f": f, "q": q}),
+        },
     )
+
+
 @login_required
 def product_edit(request, pk: int):
     producto = get_object_or_404(Product, pk=pk)
@@ -147,3 +166,29 @@ def product_delete(request, pk: int):
         "catalog/product_confirm_delete.html",
         {"producto": producto, "next_url": next_url},
     )
+
+
+# =========================
+# Typeahead (JSON): ?q=<texto>&page=<n>
+# =========================
+def _search_response(request, search_fn):
+    try:
+        page = int(request.GET.get("page") or 1)
+    except ValueError:
+        page = 1
+
+    page, results, has_more = search_fn((request.GET.get("q") or "")[:100], page)
+    return JsonResponse(
+        {"results": results, "page": page, "has_more": has_more},
+        json_dumps_params={"ensure_ascii": False},
+    )
+
+
+@login_required
+def api_product_search(request):
+    return _search_response(request, search_products)
+
+
+@login_required
+def api_provider_search(request):
+    return _search_response(request, search_providers)
@@ -0,0 +1,42 @@
+from django import forms
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.html import format_html
+
+
+class AutocompleteInput(forms.Widget):
+    """
+    Typeahead contra un endpoint JSON de apps.catalog (ver static/js/autocomplete.js).
+    Se envía un <input hidden> con el id elegido; el texto visible solo sirve para buscar.
+    `label_for(value)` devuelve el texto del valor actual (no se carga ninguna lista de opciones).
+    """
+
+    def __init__(self, url_name, label_for, placeholder="Buscar…", attrs=None):
+        super().__init__(attrs)
+        self.url_name = url_name
+        self.label_for = label_for
+        self.placeholder = placeholder
+
+    def render(self, name, value, attrs=None, renderer=None):
+        attrs = self.build_attrs(self.attrs, attrs)
+        field_id = attrs.get("id") or f"id_{name}"
+        value = "" if value in (None, "") else str(value)
+        label = self.label_for(value) if value else ""
+
+        return format_html(
+            '<div class="autocomplete" data-url="{url}">'
+            '<input type="hidden" name="{name}" id="{id}" value="{value}">'
+            '<input type="text" class="{css}" id="{id}_search" value="{label}" '
+            'placeholder="{placeholder}" autocomplete="off">'
+            '<div class="combo-list" style="display:none;"></div>'
+            "</div>"
+            '<script src="{js}" defer></script>',
+            url=reverse(self.url_name),
+            name=name,
+            id=field_id,
+            value=value,
+            css=attrs.get("class", "control"),
+            label=label,
+            placeholder=self.placeholder,
+            js=static("js/autocomplete.js"),
+        )
@@ -1,4 +1,18 @@
 from django.contrib import admin
-from .models import DocumentSequence
+from .models import DocumentSequence, Export, Job
 
 admin.site.register(DocumentSequence)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "tarea", "estado", "prioridad", "intentos", "creado_en", "terminado_en")
+    list_filter = ("estado", "tarea")
+    readonly_fields = ("tomado_por", "tomado_en", "resultado", "error", "creado_en", "terminado_en")
+
+
+@admin.register(Export)
+class ExportAdmin(admin.ModelAdmin):
+    list_display = ("id", "nombre", "usuario", "estado", "creado_en", "terminado_en")
+    list_filter = ("estado", "kind")
+    readonly_fields = ("params", "archivo", "error", "creado_en", "terminado_en")
@@ -0,0 +1,132 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Q
+
+from .models import DocumentCounter
+
+
+def apply_counter_delta(doc_type: str, estado: str, creado_por_id, delta: int) -> None:
+    if not delta or not estado or not creado_por_id:
+        return
+
+    updated = DocumentCounter.objects.filter(
+        doc_type=doc_type, estado=estado, creado_por_id=creado_por_id
+    ).update(total=F("total") + delta)
+    if updated:
+        return
+
+    try:
+        with transaction.atomic():
+            DocumentCounter.objects.create(
+                doc_type=doc_type, estado=estado, creado_por_id=creado_por_id, total=delta
+            )
+    except IntegrityError:
+        # otro request creó la fila al mismo tiempo: sumamos sobre ella
+        DocumentCounter.objects.filter(
+            doc_type=doc_type, estado=estado, creado_por_id=creado_por_id
+        ).update(total=F("total") + delta)
+
+
+class EstadoCounterMixin(models.Model):
+    """
+    Mantiene DocumentCounter al día en cada save() de un documento con estado/creado_por.
+    - El conteo se actualiza en la MISMA transacción que el documento.
+    - Los borrados se descuentan con post_delete (ver apps.core.signals),
+      así también cubre queryset.delete() y cascadas.
+    """
+    COUNTER_DOC_TYPE = ""
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._counter_key = (
+            instance.__dict__.get("estado"),
+            instance.__dict__.get("creado_por_id"),
+        )
+        return instance
+
+    def _locked_counter_key(self):
+        """
+        Estado y creador GUARDADOS, con la fila bloqueada hasta el fin de la transacción.
+        No se usa _counter_key: la instancia puede estar desactualizada (otro request cambió el
+        estado después de cargarla) y el delta se restaría de la clave equivocada.
+        """
+        return (
+            type(self)._base_manager.select_for_update()
+            .filter(pk=self.pk)
+            .values_list("estado", "creado_por_id")
+            .first()
+        )
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        update_fields = kwargs.get("update_fields")
+        tracked = update_fields is None or bool({"estado", "creado_por", "creado_por_id"} & set(update_fields))
+
+        with transaction.atomic():
+            old_key = None if adding or not tracked else self._locked_counter_key()
+            super().save(*args, **kwargs)
+
+            if adding or tracked:
+                new_key = (self.estado, self.creado_por_id)
+                if old_key != new_key:
+                    if old_key:
+                        apply_counter_delta(self.COUNTER_DOC_TYPE, *old_key, -1)
+                    apply_counter_delta(self.COUNTER_DOC_TYPE, *new_key, +1)
+                self._counter_key = new_key
+
+
+def counters_bulk_created(objs) -> None:
+    """bulk_create() no pasa por save(): sumamos los documentos creados agrupados por clave."""
+    deltas = defaultdict(int)
+    for obj in objs:
+        deltas[(obj.COUNTER_DOC_TYPE, obj.estado, obj.creado_por_id)] += 1
+        obj._counter_key = (obj.estado, obj.creado_por_id)
+    for (doc_type, estado, creado_por_id), n in deltas.items():
+        apply_counter_delta(doc_type, estado, creado_por_id, n)
+
+
+def counters_deleted(instance) -> None:
+    key = getattr(instance, "_counter_key", None)
+    if key is None or None in key:
+        key = (instance.__dict__.get("estado"), instance.__dict__.get("creado_por_id"))
+    apply_counter_delta(instance.COUNTER_DOC_TYPE, *key, -1)
+
+
+def counter_totals(*, estados=(), user=None) -> dict:
+    """
+    Lee los contadores en UNA consulta.
+    Devuelve {"all": {(doc_type, estado): n}, "own": {(doc_type, estado): n}}
+    - "all": suma de todos los creadores, solo para `estados`
+    - "own": solo documentos del `user` (cualquier estado)
+    """
+    cond = Q(estado__in=list(estados)) if estados else Q(pk__in=[])
+    if user is not None:
+        cond |= Q(creado_por=user)
+
+    totals = {"all": defaultdict(int), "own": defaultdict(int)}
+    for doc_type, estado, creado_por_id, total in DocumentCounter.objects.filter(cond).values_list(
+        "doc_type", "estado", "creado_por_id", "total"
+    ):
+        if estado in estados:
+            totals["all"][(doc_type, estado)] += total
+        if user is not None and creado_por_id == user.pk:
+            totals["own"][(doc_type, estado)] += total
+    return totals
+
+
+def compute_counters_from_source() -> dict:
+    """Conteo real desde las tablas de documentos: {(doc_type, estado, creado_por_id): n}"""
+    from apps.payments.models import PaymentOrder
+    from apps.procurement.models import ComparativeQuote
+
+    real = {}
+    for Model in (ComparativeQuote, PaymentOrder):
+        rows = Model._base_manager.values("estado", "creado_por_id").annotate(n=Count("id"))
+        for r in rows:
+            real[(Model.COUNTER_DOC_TYPE, r["estado"], r["creado_por_id"])] = r["n"]
+    return real
@@ -0,0 +1,150 @@
+"""
+Descarga de archivos de MEDIA con control de permisos (la vista decide quién puede; esto solo entrega).
+
+MEDIA_DOWNLOAD_BACKEND:
+- "nginx":    X-Accel-Redirect a MEDIA_ACCEL_PREFIX (location `internal` en nginx). nginx envía los
+              bytes (sendfile, Range, If-Range) y el worker de Python queda libre al instante.
+- "sendfile": X-Sendfile con la ruta absoluta (Apache mod_xsendfile / lighttpd).
+- "django":   FileResponse desde el proceso (por defecto, runserver). Con gunicorn el archivo se
+              envía con os.sendfile (wsgi.file_wrapper); se soportan rangos simples (206).
+
+Los archivos son de los usuarios: el Content-Type lo decide quien llama (a partir del tipo detectado
+al subir, nunca del nombre), solo PDF e imágenes se muestran en el navegador (el resto se descarga)
+y todas las respuestas llevan `Content-Security-Policy: sandbox` (sin scripts ni acceso al origen).
+"""
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+BACKEND = getattr(settings, "MEDIA_DOWNLOAD_BACKEND", "django")
+ACCEL_PREFIX = getattr(settings, "MEDIA_ACCEL_PREFIX", "/_media_protegida/")
+
+# Únicos tipos que se entregan inline; cualquier otro va con Content-Disposition: attachment
+INLINE_TYPES = {"application/pdf", "image/jpeg", "image/png", "image/gif", "image/tiff", "image/webp"}
+
+
+class _RangeFile:
+    """Archivo abierto limitado a `length` bytes desde la posición actual (mantiene fileno para sendfile)."""
+
+    def __init__(self, f, length: int):
+        self._f = f
+        self._remaining = length
+        self.name = f.name
+
+    def fileno(self):
+        return self._f.fileno()
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b""
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._f.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._f.close()
+
+
+def _parse_range(header: str, size: int):
+    """
+    (inicio, fin) inclusivo para un único rango `bytes=`; None si no aplica (se entrega completo);
+    "invalid" si el rango no se puede satisfacer.
+    """
+    unit, _, spec = (header or "").partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None  # varios rangos: se responde el archivo completo (válido según RFC 9110)
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first == "":
+            if not last:
+                return None
+            length = int(last)  # sufijo: los últimos N bytes
+            if length <= 0:
+                return "invalid"
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or (last and end < start):
+        return "invalid"
+    return start, min(end, size - 1)
+
+
+def _if_range_matches(request, etag, last_modified) -> bool:
+    value = request.headers.get("If-Range")
+    if not value:
+        return True
+    if value.startswith(('"', "W/")):
+        return etag is not None and value == etag
+    since = parse_http_date_safe(value)
+    return since is not None and last_modified is not None and last_modified <= since
+
+
+def serve_file(request, fieldfile, *, filename: str, content_type=None, as_attachment=False, etag=None):
+    """
+    Respuesta para entregar `fieldfile` (FileField de FileSystemStorage) ya autorizado.
+    Sin `content_type` se entrega como application/octet-stream.
+    """
+    path = fieldfile.path
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return HttpResponse("El archivo no existe.", status=404)
+    last_modified = int(stat.st_mtime)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    content_type = content_type or "application/octet-stream"
+    if content_type not in INLINE_TYPES:
+        as_attachment = True
+
+    if BACKEND in ("nginx", "sendfile"):
+        response = HttpResponse(content_type=content_type)
+        if BACKEND == "nginx":
+            response["X-Accel-Redirect"] = ACCEL_PREFIX + quote(fieldfile.name)
+        else:
+            response["X-Sendfile"] = path
+    else:
+        f = open(path, "rb")
+        byte_range = None
+        if request.method == "GET" and "Range" in request.headers and _if_range_matches(request, etag, last_modified):
+            byte_range = _parse_range(request.headers["Range"], stat.st_size)
+
+        if byte_range == "invalid":
+            f.close()
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{stat.st_size}"
+            return response
+
+        if byte_range is None:
+            response = FileResponse(f, content_type=content_type)
+        else:
+            start, end = byte_range
+            f.seek(start)
+            response = FileResponse(_RangeFile(f, end - start + 1), content_type=content_type, status=206)
+            response["Content-Length"] = end - start + 1
+            response["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+        response["Accept-Ranges"] = "bytes"
+
+    if disposition := content_disposition_header(as_attachment, filename):
+        response["Content-Disposition"] = disposition
+    if etag:
+        response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    # Aunque el navegador lo abra inline, nada de lo que contenga corre en el origen de la app
+    response["Content-Security-Policy"] = "sandbox"
+    response["X-Content-Type-Options"] = "nosniff"
+    # Privado (hay control de permisos) y siempre revalidado
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,139 @@
+"""
+Eventos de cambio de estado de CC/OP para /api/live-updates/.
+
+El long-poll no consulta la BD mientras espera: un único hilo por proceso (EventWatcher) lee el
+último id de WorkflowEvent cada LIVE_UPDATES_INTERVAL, y solo mientras haya requests esperando.
+Los requests esperan en memoria (threading.Condition) a que ese id pase su `since`.
+Costo en la BD: ~1 consulta por intervalo y por proceso de gunicorn, sin importar cuántas
+pestañas estén abiertas. Los eventos emitidos en el mismo proceso despiertan a los que esperan
+al instante.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import WorkflowEvent
+
+logger = logging.getLogger(__name__)
+
+# Cuántos eventos recientes se conservan (los clientes solo necesitan "lo nuevo")
+LIVE_EVENTS_KEEP = getattr(settings, "LIVE_EVENTS_KEEP", 5000)
+# Cada cuánto (s) el hilo del proceso consulta el último evento mientras alguien espera
+LIVE_UPDATES_INTERVAL = getattr(settings, "LIVE_UPDATES_INTERVAL", 1)
+
+
+def _kind_for(obj) -> str:
+    return "cc" if obj._meta.model_name == "comparativequote" else "op"
+
+
+def emit_state_change(*objs) -> None:
+    """
+    Registra el cambio de estado de uno o más documentos (CC/OP).
+    Se escribe al confirmar la transacción: si el flujo hace rollback, no se avisa nada.
+    """
+    payload = [(_kind_for(obj), obj.pk, obj.estado) for obj in objs if obj is not None]
+    if not payload:
+        return
+
+    def _write():
+        created = WorkflowEvent.objects.bulk_create(
+            [WorkflowEvent(kind=k, object_id=pk, estado=estado) for k, pk, estado in payload]
+        )
+        last_id = created[-1].pk
+        if last_id and last_id > LIVE_EVENTS_KEEP:
+            WorkflowEvent.objects.filter(id__lte=last_id - LIVE_EVENTS_KEEP).delete()
+        if last_id:
+            watcher.publish(last_id)
+
+    transaction.on_commit(_write)
+
+
+def last_event_id() -> int:
+    return WorkflowEvent.objects.order_by("-id").values_list("id", flat=True).first() or 0
+
+
+class WatcherBusy(Exception):
+    """Ya hay `max_waiters` requests esperando en este proceso."""
+
+
+class EventWatcher:
+    """
+    Último id de evento conocido por el proceso. `wait(since, timeout)` bloquea el hilo del
+    request (sin tocar la BD) hasta que haya un evento > since; True si lo hay.
+    """
+
+    def __init__(self, fetch=last_event_id, interval=LIVE_UPDATES_INTERVAL):
+        self._fetch = fetch
+        self.interval = interval
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+        self._last_id = None
+        self._waiters = 0
+        self._thread = None
+
+    @property
+    def waiters(self) -> int:
+        return self._waiters
+
+    def wait(self, since: int, timeout: float, max_waiters: int | None = None) -> bool:
+        """Con max_waiters, WatcherBusy si ya hay esa cantidad esperando (se cuenta bajo el lock)."""
+        if self._pid != os.getpid():
+            self._reset()  # proceso hijo (fork): el hilo del padre no existe aquí
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if max_waiters is not None and self._waiters >= max_waiters:
+                raise WatcherBusy
+            self._waiters += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="live-updates", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()  # despierta al hilo si estaba inactivo
+            try:
+                while self._last_id is None or self._last_id <= since:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                return True
+            finally:
+                self._waiters -= 1
+
+    def publish(self, last_id: int) -> None:
+        with self._cond:
+            if self._last_id is None or last_id > self._last_id:
+                self._last_id = last_id
+                self._cond.notify_all()
+
+    def _run(self):
+        try:
+            while True:
+                with self._cond:
+                    idle = self._waiters == 0
+                if idle:
+                    # nadie espera: sin consultas y sin conexión abierta hasta el próximo long-poll
+                    connection.close()
+                    with self._cond:
+                        while self._waiters == 0:
+                            self._cond.wait()
+                try:
+                    self.publish(self._fetch())
+                except Exception:
+                    # DatabaseError, InterfaceError (conexión rota) o cualquier otro: el hilo sigue
+                    logger.exception("live-updates: no se pudo leer el último evento")
+                    connection.close()
+                time.sleep(self.interval)
+        finally:
+            # si el hilo muere igual (p. ej. falla connection.close()), el próximo wait() lanza otro
+            with self._cond:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+
+
+watcher = EventWatcher()
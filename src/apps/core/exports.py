@@ -0,0 +1,196 @@
+"""
+Exportación CSV / XLSX de listados (cc_list, op_list) sin cargar todas las filas en memoria.
+
+- Cada listado registra en EXPORT_SOURCES una función (usuario, params) -> (nombre, encabezado,
+  filas); las filas se generan recorriendo el queryset con .iterator(chunk_size=...): en
+  PostgreSQL es un cursor del lado del servidor, y los prefetch se hacen por bloque.
+- CSV: StreamingHttpResponse; cada fila se envía apenas se genera.
+- XLSX: no se puede enviar mientras se arma, así que se genera en la cola de tareas
+  (build_xlsx_export, con EXPORT_QUEUE) y queda en un Export que el usuario descarga cuando
+  está listo. XlsxWriter en modo constant_memory escribe fila por fila a un temporal.
+  Es opcional: sin el paquete solo está CSV.
+- Textos que empiezan con = + - @ (o tab / retorno) se escriben con ' delante: Excel no los
+  interpreta como fórmulas (inyección de fórmulas vía nombres de proveedor/producto).
+"""
+import csv
+import datetime
+import logging
+import tempfile
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.files import File
+from django.http import StreamingHttpResponse
+from django.shortcuts import redirect
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .jobs import enqueue, job
+from .models import Export
+
+try:
+    import xlsxwriter
+except ImportError:  # opcional: sin el paquete solo se exporta CSV
+    xlsxwriter = None
+
+logger = logging.getLogger(__name__)
+
+# Filas por bloque al leer de la BD
+CHUNK_SIZE = getattr(settings, "EXPORT_CHUNK_SIZE", 500)
+# True: los XLSX se generan en la cola de tareas (manage.py runworker); si no, en el mismo request
+EXPORT_QUEUE = getattr(settings, "EXPORT_QUEUE", False)
+# Horas que se conserva un XLSX generado
+EXPORT_KEEP_HOURS = getattr(settings, "EXPORT_KEEP_HOURS", 24)
+
+FORMATS = ("csv", "xlsx") if xlsxwriter is not None else ("csv",)
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# kind -> función (usuario, params) que devuelve (nombre de archivo, encabezado, filas)
+EXPORT_SOURCES = {
+    "cc": "apps.procurement.views.cc_export_data",
+    "op": "apps.payments.views.op_export_data",
+}
+# Parámetros del GET que se guardan para repetir la consulta en la cola
+EXPORT_PARAMS = ("status", "desde", "hasta")
+
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def money(value):
+    """Montos a 2 decimales (cantidad × precio da 4)."""
+    return None if value is None else value.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def safe_text(value: str) -> str:
+    return "'" + value if value.startswith(FORMULA_PREFIXES) else value
+
+
+class _Echo:
+    """csv.writer escribe aquí y recibimos la línea ya formateada."""
+
+    def write(self, value):
+        return value
+
+
+def _local(value: datetime.datetime) -> datetime.datetime:
+    return timezone.localtime(value) if timezone.is_aware(value) else value
+
+
+def _plain(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime.datetime):
+        return _local(value).strftime("%d/%m/%Y %H:%M")
+    if isinstance(value, datetime.date):
+        return value.strftime("%d/%m/%Y")
+    if isinstance(value, bool):
+        return "Sí" if value else "No"
+    if isinstance(value, str):
+        return safe_text(value)
+    return value
+
+
+def csv_response(filename: str, header, rows):
+    writer = csv.writer(_Echo())
+
+    def _stream():
+        # BOM: Excel abre el CSV como UTF-8 (tildes, ñ)
+        yield "﻿" + writer.writerow(header)
+        for row in rows:
+            yield writer.writerow([_plain(v) for v in row])
+
+    response = StreamingHttpResponse(_stream(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def write_xlsx(fileobj, header, rows) -> None:
+    workbook = xlsxwriter.Workbook(fileobj, {"constant_memory": True, "remove_timezone": True})
+    sheet = workbook.add_worksheet()
+    bold = workbook.add_format({"bold": True})
+    money_fmt = workbook.add_format({"num_format": "#,##0.00"})
+    date_fmt = workbook.add_format({"num_format": "dd/mm/yyyy"})
+    datetime_fmt = workbook.add_format({"num_format": "dd/mm/yyyy hh:mm"})
+
+    sheet.write_row(0, 0, header, bold)
+    sheet.freeze_panes(1, 0)
+    for r, row in enumerate(rows, start=1):
+        for c, value in enumerate(row):
+            if value is None:
+                continue
+            if isinstance(value, Decimal):
+                sheet.write_number(r, c, float(value), money_fmt)
+            elif isinstance(value, datetime.datetime):
+                sheet.write_datetime(r, c, _local(value).replace(tzinfo=None), datetime_fmt)
+            elif isinstance(value, datetime.date):
+                sheet.write_datetime(r, c, value, date_fmt)
+            elif isinstance(value, str):
+                # write() convertiría "=..." en fórmula
+                sheet.write_string(r, c, safe_text(value))
+            else:
+                sheet.write(r, c, _plain(value))
+    workbook.close()
+
+
+def filter_created_range(qs, params):
+    """?desde= / ?hasta= (AAAA-MM-DD, inclusive) sobre creado_en. ValueError si una fecha es inválida."""
+    for param, lookup in (("desde", "creado_en__date__gte"), ("hasta", "creado_en__date__lte")):
+        raw = (params.get(param) or "").strip()
+        if raw:
+            qs = qs.filter(**{lookup: datetime.date.fromisoformat(raw)})
+    return qs
+
+
+# =========================
+# XLSX en segundo plano
+# =========================
+def start_xlsx_export(request, kind: str, filename: str):
+    """Registra el Export, lo encola (o lo genera ya, sin EXPORT_QUEUE) y lleva a su página."""
+    purge_old_exports()
+    export = Export.objects.create(
+        usuario=request.user,
+        kind=kind,
+        params={k: request.GET[k] for k in EXPORT_PARAMS if request.GET.get(k)},
+        nombre=f"{filename}.xlsx",
+    )
+    if EXPORT_QUEUE:
+        enqueue(build_xlsx_export, export.pk, max_attempts=1)
+    else:
+        try:
+            build_xlsx_export(export.pk)
+        except Exception:
+            logger.exception("No se pudo generar la exportación #%s", export.pk)
+    return redirect("export_detail", pk=export.pk)
+
+
+@job
+def build_xlsx_export(export_id: int):
+    export = Export.objects.select_related("usuario").get(pk=export_id)
+    try:
+        _, header, rows = import_string(EXPORT_SOURCES[export.kind])(export.usuario, export.params)
+        with tempfile.TemporaryFile() as tmp:
+            write_xlsx(tmp, header, rows)
+            tmp.seek(0)
+            export.archivo.save(export.nombre, File(tmp), save=False)
+    except Exception as e:
+        Export.objects.filter(pk=export.pk).update(
+            estado=Export.Status.ERROR, error=str(e)[:1000], terminado_en=timezone.now()
+        )
+        raise
+
+    export.estado = Export.Status.LISTO
+    export.terminado_en = timezone.now()
+    export.save(update_fields=["archivo", "estado", "terminado_en"])
+    return {"archivo": export.archivo.name}
+
+
+def purge_old_exports() -> int:
+    cutoff = timezone.now() - datetime.timedelta(hours=EXPORT_KEEP_HOURS)
+    count = 0
+    for export in Export.objects.filter(creado_en__lt=cutoff).iterator():
+        if export.archivo:
+            export.archivo.delete(save=False)
+        export.delete()
+        count += 1
+    return count
@@ -0,0 +1,234 @@
+"""
+Cola de tareas en segundo plano guardada en la BD (sin broker externo).
+
+- Una tarea es una función marcada con @job; se encola con enqueue(func, *args, **kwargs).
+  La fila se crea en la transacción actual: si el request hace rollback, la tarea no existe.
+- `manage.py runworker` la ejecuta fuera de gunicorn. Cada worker toma la siguiente tarea con
+  SELECT ... FOR UPDATE SKIP LOCKED: varios procesos no se bloquean ni toman la misma.
+- Orden: mayor prioridad primero, luego la más antigua.
+- Si falla se reintenta con espera creciente hasta max_intentos. Lo que devuelve la función
+  (JSON) queda en Job.resultado.
+- Mientras corre, un hilo del worker renueva tomado_en cada JOB_HEARTBEAT_INTERVAL (latido).
+  Una tarea EN_CURSO sin latido por más de JOB_LOCK_TIMEOUT (worker caído) vuelve a la cola;
+  si el worker original termina después, ya no es dueño de la fila y su resultado se descarta.
+- Un error de BD (caída, reinicio) no termina el worker: espera y vuelve a intentar.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+LOCK_TIMEOUT = getattr(settings, "JOB_LOCK_TIMEOUT", 600)
+KEEP_DAYS = getattr(settings, "JOB_KEEP_DAYS", 7)
+POLL_INTERVAL = getattr(settings, "JOB_POLL_INTERVAL", 1.0)
+# Cada cuánto se renueva tomado_en de la tarea en curso (debe ser bastante menor que LOCK_TIMEOUT)
+HEARTBEAT_INTERVAL = getattr(settings, "JOB_HEARTBEAT_INTERVAL", 30)
+# Espera antes del reintento n: RETRY_DELAY * 2**(n-1) segundos
+RETRY_DELAY = 30
+# Cada cuánto un worker devuelve a la cola las tareas colgadas y borra las viejas
+MAINTENANCE_EVERY = 60
+
+
+def job(func):
+    """Marca `func` como tarea: runworker solo ejecuta funciones marcadas."""
+    func.is_job = True
+    func.job_path = f"{func.__module__}.{func.__qualname__}"
+    return func
+
+
+def enqueue(func, *args, priority=0, max_attempts=3, run_at=None, unique=False, **kwargs) -> Job:
+    """
+    Encola `func(*args, **kwargs)`; los argumentos deben ser serializables a JSON.
+    unique=True: si ya hay una pendiente igual, devuelve esa en vez de crear otra.
+    """
+    if not getattr(func, "is_job", False):
+        raise ValueError(f"{func!r} no está marcada con @job")
+    if unique:
+        pending = Job.objects.filter(
+            tarea=func.job_path, args=list(args), kwargs=kwargs, estado=Job.Status.PENDIENTE
+        ).first()
+        if pending is not None:
+            return pending
+    return Job.objects.create(
+        tarea=func.job_path,
+        args=list(args),
+        kwargs=kwargs,
+        prioridad=priority,
+        max_intentos=max_attempts,
+        ejecutar_desde=run_at or timezone.now(),
+    )
+
+
+# =========================
+# Worker
+# =========================
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"[:100]
+
+
+def claim(worker: str):
+    """Toma la siguiente tarea lista (o None). Las filas bloqueadas por otro worker se saltan."""
+    with transaction.atomic():
+        job_row = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(estado=Job.Status.PENDIENTE, ejecutar_desde__lte=timezone.now())
+            .order_by("-prioridad", "ejecutar_desde", "id")
+            .first()
+        )
+        if job_row is None:
+            return None
+        job_row.estado = Job.Status.EN_CURSO
+        job_row.intentos += 1
+        job_row.tomado_por = worker
+        job_row.tomado_en = timezone.now()
+        job_row.save(update_fields=["estado", "intentos", "tomado_por", "tomado_en"])
+    return job_row
+
+
+def _jsonable(value):
+    try:
+        return json.loads(json.dumps(value, cls=DjangoJSONEncoder))
+    except (TypeError, ValueError):
+        return repr(value)
+
+
+@contextmanager
+def _heartbeat(owned):
+    """Mientras dura el bloque, otro hilo renueva tomado_en de `owned` (la fila en curso)."""
+    done = threading.Event()
+
+    def beat():
+        try:
+            while not done.wait(HEARTBEAT_INTERVAL):
+                try:
+                    if not owned.update(tomado_en=timezone.now()):
+                        # maintenance() ya la devolvió a la cola: run() lo ve al guardar
+                        return
+                except DatabaseError:
+                    logger.exception("No se pudo renovar el latido de la tarea en curso")
+                    connection.close()
+        finally:
+            connection.close()  # la conexión propia de este hilo
+
+    thread = threading.Thread(target=beat, name="job-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        done.set()
+        thread.join()
+
+
+def run(job_row) -> bool:
+    """
+    Ejecuta una tarea ya tomada y guarda el resultado o el error. True si terminó bien.
+    False también si la fila dejó de ser de este worker (reencolada por maintenance()).
+    """
+    owned = Job.objects.filter(
+        pk=job_row.pk, estado=Job.Status.EN_CURSO, tomado_por=job_row.tomado_por, intentos=job_row.intentos
+    )
+    try:
+        func = import_string(job_row.tarea)
+        if not getattr(func, "is_job", False):
+            raise ValueError(f"{job_row.tarea} no está marcada con @job")
+        with _heartbeat(owned):
+            result = func(*job_row.args, **job_row.kwargs)
+    except Exception:
+        logger.exception("Falló la tarea #%s %s (intento %s)", job_row.pk, job_row.tarea, job_row.intentos)
+        error = traceback.format_exc()[-10000:]
+        if job_row.intentos < job_row.max_intentos:
+            delay = RETRY_DELAY * 2 ** (job_row.intentos - 1)
+            saved = owned.update(
+                estado=Job.Status.PENDIENTE,
+                ejecutar_desde=timezone.now() + timedelta(seconds=delay),
+                error=error,
+            )
+        else:
+            saved = owned.update(estado=Job.Status.ERROR, error=error, terminado_en=timezone.now())
+        if not saved:
+            _log_lost(job_row)
+        return False
+
+    if not owned.update(estado=Job.Status.OK, resultado=_jsonable(result), error="", terminado_en=timezone.now()):
+        _log_lost(job_row)
+        return False
+    return True
+
+
+def _log_lost(job_row) -> None:
+    logger.warning(
+        "La tarea #%s %s (intento %s) ya no es de %s: se reencoló mientras corría; se descarta su resultado",
+        job_row.pk, job_row.tarea, job_row.intentos, job_row.tomado_por,
+    )
+
+
+def maintenance() -> None:
+    now = timezone.now()
+    stuck = Job.objects.filter(estado=Job.Status.EN_CURSO, tomado_en__lt=now - timedelta(seconds=LOCK_TIMEOUT))
+    error = "Tiempo agotado: el worker no terminó la tarea (¿se cayó?)."
+    requeued = stuck.filter(intentos__lt=F("max_intentos")).update(
+        estado=Job.Status.PENDIENTE, ejecutar_desde=now, error=error
+    )
+    failed = stuck.update(estado=Job.Status.ERROR, error=error, terminado_en=now)
+    if requeued or failed:
+        logger.warning("Tareas colgadas: %s reencoladas, %s fallidas", requeued, failed)
+    # Las terminadas bien solo sirven un tiempo (resultado); las fallidas quedan para revisar
+    Job.objects.filter(estado=Job.Status.OK, terminado_en__lt=now - timedelta(days=KEEP_DAYS)).delete()
+
+
+def work(*, burst=False, sleep=None, should_stop=lambda: False) -> int:
+    """
+    Bucle de un worker: toma y ejecuta tareas hasta que should_stop() sea True
+    (o, con burst, hasta que no quede ninguna lista). Devuelve cuántas ejecutó.
+    """
+    sleep = POLL_INTERVAL if sleep is None else sleep
+    worker = worker_name()
+    done = 0
+    last_maintenance = None
+    while not should_stop():
+        close_old_connections()
+        try:
+            if last_maintenance is None or time.monotonic() - last_maintenance > MAINTENANCE_EVERY:
+                maintenance()
+                last_maintenance = time.monotonic()
+            job_row = claim(worker)
+        except DatabaseError:
+            # BD caída o reiniciando: el worker sigue vivo y reintenta
+            logger.exception("Worker %s: error de BD al tomar tareas", worker)
+            connection.close()
+            time.sleep(sleep)
+            continue
+
+        if job_row is None:
+            if burst:
+                break
+            time.sleep(sleep)
+            continue
+        try:
+            run(job_row)
+        except DatabaseError:
+            # la BD se cayó durante la tarea o al guardar su resultado: la fila queda EN_CURSO
+            # y maintenance() la devuelve a la cola tras JOB_LOCK_TIMEOUT
+            logger.exception("Worker %s: error de BD al ejecutar la tarea #%s", worker, job_row.pk)
+            connection.close()
+            time.sleep(sleep)
+            continue
+        done += 1
+    close_old_connections()
+    return done
@@ -0,0 +1,151 @@
+import statistics
+import threading
+import time
+from http.cookies import SimpleCookie
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connection, connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+
+
+def _client_host() -> str:
+    for host in settings.ALLOWED_HOSTS:
+        if host and host != "*" and not host.startswith("."):
+            return host
+    return "localhost"
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga local: N usuarios concurrentes piden un endpoint JSON (p. ej. /api/pending-counts/) "
+        "comparando una conexión por request, conexiones persistentes por hilo y el pool de psycopg."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50, help="Usuarios (hilos) concurrentes.")
+        parser.add_argument("--requests", type=int, default=20, help="Requests por usuario.")
+        parser.add_argument("--url", default="/api/pending-counts/")
+        parser.add_argument("--username", help="Usuario con el que se hacen los requests (por defecto: un superusuario).")
+        parser.add_argument("--max-age", type=int, default=600, help="CONN_MAX_AGE del modo persistente.")
+        parser.add_argument(
+            "--pool-size",
+            type=int,
+            help="max_size del pool (por defecto: --users, como un proceso con un hilo por usuario).",
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options["username"]:
+            user = User.objects.filter(username=options["username"]).first()
+        else:
+            user = User.objects.filter(is_superuser=True, is_active=True).order_by("id").first()
+        if user is None:
+            raise CommandError("No hay usuario para autenticar los requests (usa --username).")
+
+        # Una sola sesión, compartida por todos los "usuarios"
+        login = Client(HTTP_HOST=_client_host())
+        login.force_login(user)
+        cookies = login.cookies
+
+        db = connections.settings[DEFAULT_DB_ALIAS]
+        if "pool" in (db.get("OPTIONS") or {}):
+            # con DB_CONN_MODE=pool ya hay un pool del proceso: cada modo arma el suyo
+            connections.close_all()
+            connections[DEFAULT_DB_ALIAS].close_pool()
+        original = {key: db.get(key) for key in ("CONN_MAX_AGE", "CONN_HEALTH_CHECKS", "OPTIONS")}
+        request_options = {k: v for k, v in (db.get("OPTIONS") or {}).items() if k != "pool"}
+        modes = [
+            ("una conexión por request", {"CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False, "OPTIONS": request_options}),
+            (
+                f"persistente ({options['max_age']}s)",
+                {"CONN_MAX_AGE": options["max_age"], "CONN_HEALTH_CHECKS": True, "OPTIONS": request_options},
+            ),
+        ]
+        if connection.vendor == "postgresql":
+            pool_size = options["pool_size"] or options["users"]
+            pool = {"min_size": min(2, pool_size), "max_size": pool_size, "max_lifetime": options["max_age"]}
+            modes.append(
+                (
+                    f"pool psycopg (max {pool_size})",
+                    {"CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": True, "OPTIONS": {**request_options, "pool": pool}},
+                )
+            )
+
+        self.stdout.write(
+            f"{options['users']} usuarios x {options['requests']} requests → {options['url']}"
+        )
+        try:
+            for label, overrides in modes:
+                connections.close_all()
+                db.update(overrides)
+                result = self._run(cookies, options)
+                pool = connections[DEFAULT_DB_ALIAS].pool if "pool" in overrides["OPTIONS"] else None
+                if pool is not None:
+                    # connection_created se emite en cada préstamo del pool: contamos las reales
+                    result["connects"] = pool.get_stats()["connections_num"]
+                    connections[DEFAULT_DB_ALIAS].close_pool()
+                self.stdout.write(
+                    f"{label:<28} {result['total']} req en {result['elapsed']:6.2f}s → "
+                    f"{result['total'] / result['elapsed']:7.1f} req/s  "
+                    f"p50 {result['p50']:6.1f}ms  p95 {result['p95']:6.1f}ms  "
+                    f"conexiones abiertas: {result['connects']}  errores: {result['errors']}"
+                )
+        finally:
+            connections.close_all()
+            db.update(original)
+
+    def _run(self, cookies, options):
+        latencies, errors, connects = [], [], []
+        lock = threading.Lock()
+        start_barrier = threading.Barrier(options["users"])
+
+        def on_connect(sender, connection, **kwargs):
+            with lock:
+                connects.append(1)
+
+        def worker():
+            client = Client(HTTP_HOST=_client_host())
+            client.cookies = SimpleCookie(cookies)
+            mine, failed = [], 0
+            try:
+                start_barrier.wait()
+                for _ in range(options["requests"]):
+                    t0 = time.perf_counter()
+                    # Igual que el handler WSGI: request_started / request_finished
+                    # cierran la conexión si CONN_MAX_AGE = 0 (el Client de tests no lo hace)
+                    close_old_connections()
+                    response = client.get(options["url"])
+                    close_old_connections()
+                    mine.append((time.perf_counter() - t0) * 1000)
+                    if response.status_code != 200:
+                        failed += 1
+            finally:
+                connection.close()
+                with lock:
+                    latencies.extend(mine)
+                    errors.append(failed)
+
+        connection_created.connect(on_connect, weak=False)
+        try:
+            threads = [threading.Thread(target=worker) for _ in range(options["users"])]
+            t0 = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - t0
+        finally:
+            connection_created.disconnect(on_connect)
+
+        latencies.sort()
+        return {
+            "total": len(latencies),
+            "elapsed": elapsed,
+            "p50": statistics.median(latencies) if latencies else 0.0,
+            "p95": latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0,
+            "connects": len(connects),
+            "errors": sum(errors),
+        }
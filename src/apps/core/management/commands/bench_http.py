@@ -0,0 +1,89 @@
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga HTTP contra un servidor en marcha (runserver, gunicorn, nginx...): N usuarios "
+        "concurrentes con sesión iniciada piden las rutas indicadas. Ver docs/rendimiento.md."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("base_url", help="p. ej. http://127.0.0.1:8000")
+        parser.add_argument("paths", nargs="+", help="Rutas a pedir en ronda, p. ej. /bandeja/ /cuadros/1/")
+        parser.add_argument("--users", type=int, default=50, help="Usuarios (hilos) concurrentes.")
+        parser.add_argument("--requests", type=int, default=20, help="Requests por usuario.")
+        parser.add_argument("--username", help="Usuario de la sesión (por defecto: un superusuario).")
+        parser.add_argument("--gzip", action="store_true", help="Envía Accept-Encoding: gzip.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options["username"]:
+            user = User.objects.filter(username=options["username"]).first()
+        else:
+            user = User.objects.filter(is_superuser=True, is_active=True).order_by("id").first()
+        if user is None:
+            raise CommandError("No hay usuario para autenticar los requests (usa --username).")
+
+        # La sesión se crea en la misma BD que usa el servidor
+        login = Client()
+        login.force_login(user)
+        cookie = f"{settings.SESSION_COOKIE_NAME}={login.cookies[settings.SESSION_COOKIE_NAME].value}"
+
+        headers = {"Cookie": cookie}
+        if options["gzip"]:
+            headers["Accept-Encoding"] = "gzip"
+        base = options["base_url"].rstrip("/")
+        paths = options["paths"]
+
+        latencies, sizes, errors = [], [], []
+        lock = threading.Lock()
+        start_barrier = threading.Barrier(options["users"])
+
+        def worker(offset):
+            mine, mine_sizes, failed = [], [], 0
+            start_barrier.wait()
+            for i in range(options["requests"]):
+                url = base + paths[(offset + i) % len(paths)]
+                t0 = time.perf_counter()
+                try:
+                    with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=60) as resp:
+                        body = resp.read()
+                        if resp.status != 200:
+                            failed += 1
+                except (urllib.error.URLError, OSError):
+                    failed += 1
+                    body = b""
+                mine.append((time.perf_counter() - t0) * 1000)
+                mine_sizes.append(len(body))
+            with lock:
+                latencies.extend(mine)
+                sizes.extend(mine_sizes)
+                errors.append(failed)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(options["users"])]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - t0
+
+        latencies.sort()
+        total = len(latencies)
+        self.stdout.write(
+            f"{options['users']} usuarios x {options['requests']} requests → {base} {' '.join(paths)}"
+        )
+        self.stdout.write(
+            f"{total} req en {elapsed:6.2f}s → {total / elapsed:7.1f} req/s  "
+            f"p50 {statistics.median(latencies):6.1f}ms  p95 {latencies[int(total * 0.95) - 1]:6.1f}ms  "
+            f"bytes/resp {statistics.mean(sizes):8.0f}  errores: {sum(errors)}"
+        )
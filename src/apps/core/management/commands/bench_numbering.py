@@ -0,0 +1,86 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection, transaction
+
+from apps.core import sequences
+from apps.core.models import DocumentSequence
+
+BENCH_DOC_TYPE = "BENCH"
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de numeración concurrente: N hilos crean 'documentos' (transacción con "
+        "trabajo simulado) comparando bloqueo en transacción vs. rangos vs. pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--docs", type=int, default=25, help="Documentos por hilo.")
+        parser.add_argument(
+            "--work-ms", type=float, default=20,
+            help="Trabajo simulado dentro de la transacción del documento (ms).",
+        )
+        parser.add_argument("--pool-size", type=int, default=50)
+
+    def handle(self, *args, **options):
+        modes = [
+            ("bloqueo en transacción", lambda: sequences.reserve_locked(BENCH_DOC_TYPE, 1)),
+            ("rango independiente (1)", lambda: self._from_range(1)),
+            (f"pool por proceso ({options['pool_size']})", self._pool_taker(options["pool_size"])),
+        ]
+
+        try:
+            for label, take in modes:
+                DocumentSequence.objects.filter(doc_type=BENCH_DOC_TYPE).delete()
+                elapsed, numbers = self._run(take, options)
+                total = options["threads"] * options["docs"]
+                dupes = total - len(set(numbers))
+                self.stdout.write(
+                    f"{label:<28} {total} docs en {elapsed:6.2f}s → {total / elapsed:8.1f} docs/s"
+                    f"  (duplicados: {dupes})"
+                )
+        finally:
+            DocumentSequence.objects.filter(doc_type=BENCH_DOC_TYPE).delete()
+
+    @staticmethod
+    def _from_range(count):
+        year, first, last = sequences.reserve_range(BENCH_DOC_TYPE, count)
+        return [sequences.format_document_number(BENCH_DOC_TYPE, year, n) for n in range(first, last + 1)]
+
+    @staticmethod
+    def _pool_taker(size):
+        pool = sequences.DocumentNumberPool(size)
+        return lambda: pool.take(BENCH_DOC_TYPE, 1)
+
+    def _run(self, take, options):
+        numbers = []
+        numbers_lock = threading.Lock()
+        work = options["work_ms"] / 1000
+        start_barrier = threading.Barrier(options["threads"])
+
+        def worker():
+            close_old_connections()
+            mine = []
+            try:
+                start_barrier.wait()
+                for _ in range(options["docs"]):
+                    # Simula un request que crea un documento dentro de su transacción
+                    with transaction.atomic():
+                        mine.extend(take())
+                        time.sleep(work)
+            finally:
+                connection.close()
+                sequences.close_sequence_connection()
+                with numbers_lock:
+                    numbers.extend(mine)
+
+        threads = [threading.Thread(target=worker) for _ in range(options["threads"])]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return time.perf_counter() - t0, numbers
@@ -0,0 +1,89 @@
+import datetime
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+
+from apps.core.media_gc import collect_orphans
+from apps.procurement.models import ComparativeAttachmentUpload
+from apps.procurement.uploads import purge_stale_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        "Busca archivos de MEDIA_ROOT que no referencia ninguna fila (adjuntos borrados, PDFs "
+        "regenerados, subidas abandonadas). Sin --delete/--quarantine solo reporta."
+    )
+
+    def add_arguments(self, parser):
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument("--delete", action="store_true", help="Borra los huérfanos.")
+        group.add_argument(
+            "--quarantine",
+            metavar="DIR",
+            help="Mueve los huérfanos a DIR (misma estructura de carpetas) en vez de borrarlos.",
+        )
+        parser.add_argument(
+            "--min-age",
+            type=float,
+            default=24,
+            help="Horas sin modificar para considerar un archivo (por defecto 24).",
+        )
+        parser.add_argument(
+            "--stale-uploads",
+            type=float,
+            default=48,
+            help="Horas sin partes nuevas para cancelar una subida por partes (por defecto 48).",
+        )
+        parser.add_argument("--batch-size", type=int, default=2000, help="Nombres por consulta a la BD.")
+        parser.add_argument("--show", type=int, default=20, help="Huérfanos a listar en el reporte.")
+
+    def handle(self, *args, **options):
+        if options["min_age"] < 1:
+            raise CommandError("--min-age debe ser de al menos 1 hora (subidas y PDFs en curso).")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size debe ser positivo.")
+
+        quarantine = options["quarantine"]
+        if quarantine:
+            quarantine = os.path.realpath(quarantine)
+            os.makedirs(quarantine, exist_ok=True)
+
+        action = "delete" if options["delete"] else "quarantine" if quarantine else None
+
+        # Subidas abandonadas: al cancelarlas se borra su archivo parcial y liberan la cuota del CC
+        cutoff = timezone.now() - datetime.timedelta(hours=options["stale_uploads"])
+        if action:
+            stale = purge_stale_uploads(cutoff)
+        else:
+            stale = ComparativeAttachmentUpload.objects.filter(actualizado_en__lt=cutoff).count()
+        if stale:
+            self.stdout.write(f"Subidas abandonadas{'' if action else ' (se cancelarían)'}: {stale}")
+
+        report = collect_orphans(
+            min_age=options["min_age"] * 3600,
+            batch_size=options["batch_size"],
+            action=action,
+            quarantine=quarantine,
+            sample_size=options["show"],
+        )
+
+        for name in report.sample:
+            self.stdout.write(f"  {name}")
+        if report.orphans > len(report.sample):
+            self.stdout.write(f"  ... y {report.orphans - len(report.sample)} más")
+
+        self.stdout.write(
+            f"{settings.MEDIA_ROOT}: {report.scanned} archivos, {report.recent} recientes (omitidos), "
+            f"{report.orphans} huérfanos ({filesizeformat(report.orphan_bytes)})."
+        )
+        if report.kept:
+            self.stdout.write(f"En uso al revisarlos de nuevo (no se tocaron): {report.kept}.")
+        if action is None:
+            self.stdout.write("Simulacro: no se cambió nada (usa --delete o --quarantine DIR).")
+        elif action == "delete":
+            self.stdout.write(self.style.SUCCESS(f"Borrados: {report.removed}."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Movidos a {quarantine}: {report.removed}."))
@@ -0,0 +1,72 @@
+import datetime
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from apps.core.pdf import PDF_DOCUMENTS, _init_bulk_worker, bulk_generate_job
+
+
+def _parse_date(raw):
+    try:
+        return datetime.date.fromisoformat(raw)
+    except ValueError:
+        raise CommandError(f"Fecha inválida: {raw} (usa AAAA-MM-DD)")
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera y archiva los PDFs de los documentos APROBADOS en un periodo "
+        "(por fecha de aprobación) usando un pool de procesos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--kind", choices=sorted(PDF_DOCUMENTS), default="op")
+        parser.add_argument("--desde", help="AAAA-MM-DD (por defecto: inicio del mes actual)")
+        parser.add_argument("--hasta", help="AAAA-MM-DD inclusive (por defecto: hoy)")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--force", action="store_true", help="Regenera aunque el PDF esté al día.")
+
+    def handle(self, *args, **options):
+        hoy = timezone.localdate()
+        desde = _parse_date(options["desde"]) if options["desde"] else hoy.replace(day=1)
+        hasta = _parse_date(options["hasta"]) if options["hasta"] else hoy
+        if desde > hasta:
+            raise CommandError("--desde no puede ser posterior a --hasta.")
+
+        kind = options["kind"]
+        Model = apps.get_model(PDF_DOCUMENTS[kind][0])
+        pks = list(
+            Model.objects.filter(
+                estado=Model.Status.APROBADO,
+                aprobado_en__date__gte=desde,
+                aprobado_en__date__lte=hasta,
+            )
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        if not pks:
+            self.stdout.write("No hay documentos aprobados en el periodo.")
+            return
+
+        # Los procesos hijos abren sus propias conexiones
+        connections.close_all()
+
+        errores = []
+        jobs = [(kind, pk, options["force"]) for pk in pks]
+        workers = max(1, min(options["workers"], len(pks)))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_bulk_worker) as pool:
+            for pk, error in pool.map(bulk_generate_job, jobs, chunksize=8):
+                if error:
+                    errores.append((pk, error))
+                    self.stderr.write(f"{kind}#{pk}: {error}")
+
+        ok = len(pks) - len(errores)
+        self.stdout.write(
+            self.style.SUCCESS(f"{ok}/{len(pks)} PDF(s) de {kind.upper()} listos ({desde} a {hasta}, {workers} procesos).")
+        )
+        if errores:
+            raise CommandError(f"{len(errores)} documento(s) con error.")
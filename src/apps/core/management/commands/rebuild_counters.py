@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.core.counters import compute_counters_from_source
+from apps.core.models import DocumentCounter
+
+
+class Command(BaseCommand):
+    help = "Verifica y reconstruye los contadores de documentos (DocumentCounter) desde CC/OP."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Solo verifica: muestra diferencias y termina con error si las hay.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # Bloqueamos los contadores mientras comparamos/reescribimos
+            stored = {
+                (c.doc_type, c.estado, c.creado_por_id): c.total
+                for c in DocumentCounter.objects.select_for_update()
+            }
+            real = compute_counters_from_source()
+
+            diffs = []
+            for key in sorted(set(stored) | set(real), key=str):
+                if stored.get(key, 0) != real.get(key, 0):
+                    diffs.append((key, stored.get(key, 0), real.get(key, 0)))
+
+            for (doc_type, estado, user_id), before, after in diffs:
+                self.stdout.write(f"{doc_type} {estado} user={user_id}: guardado={before} real={after}")
+
+            if options["check"]:
+                if diffs:
+                    raise CommandError(f"{len(diffs)} contador(es) no coinciden.")
+                self.stdout.write(self.style.SUCCESS("Contadores OK."))
+                return
+
+            DocumentCounter.objects.all().delete()
+            DocumentCounter.objects.bulk_create(
+                [
+                    DocumentCounter(doc_type=doc_type, estado=estado, creado_por_id=user_id, total=n)
+                    for (doc_type, estado, user_id), n in real.items()
+                ]
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Contadores reconstruidos ({len(real)} filas, {len(diffs)} corregidas).")
+        )
@@ -0,0 +1,95 @@
+import multiprocessing
+import multiprocessing.connection
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from apps.core import jobs
+
+# Segundos antes de reemplazar un hijo que terminó inesperadamente (evita un bucle de reinicios)
+RESPAWN_DELAY = 1.0
+
+
+def _child(burst, sleep):
+    stop = {"flag": False}
+
+    def _stop(signum, frame):
+        # termina la tarea en curso y sale
+        stop["flag"] = True
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    jobs.work(burst=burst, sleep=sleep, should_stop=lambda: stop["flag"])
+
+
+class Command(BaseCommand):
+    help = (
+        "Ejecuta las tareas en segundo plano de apps.core.jobs (PDFs, exportaciones...) "
+        "con un pool de procesos. SIGTERM/Ctrl+C: terminan la tarea en curso y salen."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=1, help="Procesos worker (por defecto 1).")
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=None,
+            help="Segundos entre consultas cuando la cola está vacía (JOB_POLL_INTERVAL).",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Sale cuando no quedan tareas listas (cron, pruebas).",
+        )
+
+    def handle(self, *args, **options):
+        processes = options["processes"]
+        if processes < 1:
+            raise CommandError("--processes debe ser al menos 1.")
+
+        if processes == 1:
+            self.stdout.write(f"Worker {jobs.worker_name()} esperando tareas...")
+            _child(options["burst"], options["sleep"])
+            return
+
+        # Los procesos hijos abren sus propias conexiones
+        connections.close_all()
+        ctx = multiprocessing.get_context("fork")
+        burst, sleep = options["burst"], options["sleep"]
+        stopping = {"flag": False}
+
+        def _spawn(name):
+            child = ctx.Process(target=_child, args=(burst, sleep), name=name)
+            child.start()
+            return child
+
+        def _forward(signum, frame):
+            stopping["flag"] = True
+            for child in children:
+                if child.is_alive():
+                    child.terminate()  # SIGTERM: cada hijo termina su tarea actual
+
+        children = [_spawn(f"worker-{n}") for n in range(processes)]
+        signal.signal(signal.SIGTERM, _forward)
+        signal.signal(signal.SIGINT, _forward)
+        self.stdout.write(f"{processes} workers esperando tareas...")
+
+        # El padre vigila a los hijos: uno que muere sin que se lo pidamos (OOM killer, segfault
+        # en una librería, error no capturado) se reemplaza para no perder capacidad en silencio.
+        while children:
+            multiprocessing.connection.wait([child.sentinel for child in children])
+            for child in list(children):
+                if child.is_alive():
+                    continue
+                child.join()
+                if stopping["flag"] or (burst and child.exitcode == 0):
+                    children.remove(child)
+                    continue
+                self.stderr.write(f"{child.name} terminó inesperadamente (código {child.exitcode}); se reinicia.")
+                time.sleep(RESPAWN_DELAY)
+                if stopping["flag"]:
+                    children.remove(child)
+                else:
+                    children[children.index(child)] = _spawn(child.name)
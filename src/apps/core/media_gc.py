@@ -0,0 +1,154 @@
+"""
+Archivos huérfanos en MEDIA_ROOT: archivos que ya no referencia ninguna fila.
+
+- Recorre el árbol con os.scandir (pila de directorios, sin listas del árbol completo).
+- Los nombres se revisan por lotes: por cada lote se consulta `campo__in=<lote>` en cada campo
+  que guarda rutas de MEDIA. La memoria depende del tamaño del lote, no del número de archivos.
+- Solo se consideran archivos sin tocar hace más de `min_age` (subidas en curso, PDFs que se
+  están generando, adjuntos recién reutilizados en ContentAddressedStorage).
+- Antes de borrar o mover cada huérfano se vuelve a revisar (stat + referencias de ese nombre)
+  con blob_lock tomado: un adjunto reutilizado después del escaneo no se toca.
+"""
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import models
+
+from .storage import blob_lock
+
+# Campos de texto (no FileField) que también guardan rutas relativas a MEDIA_ROOT
+EXTRA_REFERENCES = (
+    ("procurement.ComparativeAttachmentUpload", "archivo_parcial"),
+)
+
+
+@dataclass
+class GCReport:
+    scanned: int = 0
+    recent: int = 0
+    orphans: int = 0
+    orphan_bytes: int = 0
+    removed: int = 0
+    # huérfanos en el escaneo que al revisarlos de nuevo ya estaban en uso (o ya no existían)
+    kept: int = 0
+    sample: list = field(default_factory=list)
+
+
+def media_references():
+    """(modelo, campo) de todos los campos que guardan archivos de MEDIA_ROOT."""
+    root = os.path.realpath(settings.MEDIA_ROOT)
+    refs = []
+    for model in apps.get_models():
+        for f in model._meta.get_fields():
+            if (
+                isinstance(f, models.FileField)
+                and isinstance(f.storage, FileSystemStorage)
+                and os.path.realpath(f.storage.location) == root
+            ):
+                refs.append((model, f.name))
+    for label, name in EXTRA_REFERENCES:
+        refs.append((apps.get_model(label), name))
+    return refs
+
+
+def iter_media_files(root, exclude=()):
+    """(nombre relativo con '/', stat) de cada archivo bajo `root`."""
+    root = os.path.realpath(root)
+    exclude = {os.path.realpath(p) for p in exclude}
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            it = os.scandir(current)
+        except FileNotFoundError:
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.path not in exclude:
+                        stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    rel = os.path.relpath(entry.path, root).replace(os.sep, "/")
+                    yield rel, entry.stat(follow_symlinks=False)
+
+
+def referenced(names, refs) -> set:
+    found = set()
+    for model, name in refs:
+        found.update(
+            model._default_manager.filter(**{f"{name}__in": names}).values_list(name, flat=True)
+        )
+    return found
+
+
+def collect_orphans(*, min_age: float, batch_size=2000, action=None, quarantine=None, sample_size=20):
+    """
+    Busca (y con action="delete"/"quarantine", elimina o mueve) los huérfanos de MEDIA_ROOT.
+    action=None es un simulacro: solo reporta.
+    """
+    root = os.path.realpath(settings.MEDIA_ROOT)
+    refs = media_references()
+    cutoff = time.time() - min_age
+    report = GCReport()
+    exclude = [quarantine] if quarantine else []
+
+    def flush(batch):
+        used = referenced(list(batch), refs)
+        for name, st in batch.items():
+            if name in used:
+                continue
+            report.orphans += 1
+            report.orphan_bytes += st.st_size
+            if len(report.sample) < sample_size:
+                report.sample.append(name)
+            if action:
+                if _remove(root, name, action, quarantine, refs=refs, cutoff=cutoff):
+                    report.removed += 1
+                else:
+                    report.kept += 1
+        batch.clear()
+
+    batch = {}
+    for name, st in iter_media_files(root, exclude=exclude):
+        report.scanned += 1
+        if st.st_mtime > cutoff:
+            report.recent += 1
+            continue
+        batch[name] = st
+        if len(batch) >= batch_size:
+            flush(batch)
+    if batch:
+        flush(batch)
+    return report
+
+
+def _remove(root, name, action, quarantine, *, refs, cutoff) -> bool:
+    """
+    Borra o mueve `name` si sigue siendo huérfano. El escaneo y la consulta del lote pueden ser
+    de hace un rato: con el lock de las subidas (ContentAddressedStorage) se vuelven a revisar
+    la fecha y las referencias de este nombre justo antes de actuar.
+    """
+    path = os.path.join(root, name)
+    with blob_lock(name):
+        try:
+            if os.stat(path).st_mtime > cutoff:
+                return False
+        except FileNotFoundError:
+            return False
+        if referenced([name], refs):
+            return False
+        try:
+            if action == "quarantine":
+                target = os.path.join(quarantine, name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(path, target)
+            else:
+                os.unlink(path)
+        except FileNotFoundError:
+            return False
+    return True
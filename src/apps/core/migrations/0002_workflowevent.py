@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-17 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkflowEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=2)),
+                ('object_id', models.BigIntegerField()),
+                ('estado', models.CharField(max_length=20)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.0.7 on 2026-10-17 21:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_counters(apps, schema_editor):
+    DocumentCounter = apps.get_model("core", "DocumentCounter")
+    sources = [
+        ("CC", apps.get_model("procurement", "ComparativeQuote")),
+        ("OP", apps.get_model("payments", "PaymentOrder")),
+    ]
+
+    rows = []
+    for doc_type, Model in sources:
+        for r in Model.objects.values("estado", "creado_por_id").annotate(n=Count("id")):
+            rows.append(
+                DocumentCounter(
+                    doc_type=doc_type,
+                    estado=r["estado"],
+                    creado_por_id=r["creado_por_id"],
+                    total=r["n"],
+                )
+            )
+    DocumentCounter.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_workflowevent'),
+        ('procurement', '0006_add_rechazo_fields'),
+        ('payments', '0008_paymentorder_rechazo_and_estado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_type', models.CharField(max_length=10)),
+                ('estado', models.CharField(max_length=20)),
+                ('total', models.IntegerField(default=0)),
+                ('creado_por', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('doc_type', 'estado', 'creado_por')},
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.7 on 2026-10-17 21:53
+
+import apps.core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_documentcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPDF',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=2)),
+                ('object_id', models.BigIntegerField()),
+                ('render_version', models.PositiveIntegerField(default=0)),
+                ('archivo', models.FileField(max_length=255, upload_to=apps.core.models._archived_pdf_path)),
+                ('generado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+    ]
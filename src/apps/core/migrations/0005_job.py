@@ -0,0 +1,37 @@
+# Generated by Django 5.0.7 on 2026-10-17 22:28
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_archivedpdf'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tarea', models.CharField(max_length=200)),
+                ('args', models.JSONField(blank=True, default=list)),
+                ('kwargs', models.JSONField(blank=True, default=dict)),
+                ('prioridad', models.SmallIntegerField(default=0)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_CURSO', 'En curso'), ('OK', 'Terminada'), ('ERROR', 'Fallida')], default='PENDIENTE', max_length=10)),
+                ('ejecutar_desde', models.DateTimeField(default=django.utils.timezone.now)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('max_intentos', models.PositiveSmallIntegerField(default=3)),
+                ('tomado_por', models.CharField(blank=True, max_length=100)),
+                ('tomado_en', models.DateTimeField(blank=True, null=True)),
+                ('resultado', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('terminado_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(models.OrderBy(models.F('prioridad'), descending=True), models.F('ejecutar_desde'), models.F('id'), condition=models.Q(('estado', 'PENDIENTE')), name='job_cola_idx'), models.Index(fields=['estado', 'terminado_en'], name='job_estado_terminado_idx')],
+            },
+        ),
+    ]
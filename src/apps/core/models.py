@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 class DocumentSequence(models.Model):
     doc_type = models.CharField(max_length=10)  # "CC" o "OP"
@@ -10,3 +12,133 @@ class DocumentSequence(models.Model):
 
     def __str__(self):
         return f"{self.doc_type}-{self.year}: {self.last_number}"
+
+
+class WorkflowEvent(models.Model):
+    """
+    Cambio de estado de un documento (CC u OP).
+    Lo usa /api/live-updates/ para avisar a los navegadores SOLO cuando algo cambió.
+    """
+    kind = models.CharField(max_length=2)  # "cc" o "op"
+    object_id = models.BigIntegerField()
+    estado = models.CharField(max_length=20)
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.kind}#{self.object_id} -> {self.estado}"
+
+
+class DocumentCounter(models.Model):
+    """
+    Conteo denormalizado de documentos por (tipo, estado, creador).
+    Se mantiene en la misma transacción que cada cambio de estado (ver apps.core.counters)
+    y se puede reconstruir/verificar con: manage.py rebuild_counters
+    """
+    doc_type = models.CharField(max_length=10)  # "CC" o "OP"
+    estado = models.CharField(max_length=20)
+    creado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("doc_type", "estado", "creado_por")
+
+    def __str__(self):
+        return f"{self.doc_type}/{self.estado}/{self.creado_por_id}: {self.total}"
+
+
+def _archived_pdf_path(instance, filename):
+    # Junto a los adjuntos: media/cc_pdf/2026/03/CC-2026-000001.pdf, media/op_pdf/...
+    return f"{instance.kind}_pdf/{timezone.now():%Y/%m}/{filename}"
+
+
+class ArchivedPDF(models.Model):
+    """
+    PDF generado en el servidor para un CC u OP aprobado (ver apps.core.pdf).
+    render_version es la versión del documento con la que se generó: si cambió, se regenera.
+    """
+    kind = models.CharField(max_length=2)  # "cc" o "op"
+    object_id = models.BigIntegerField()
+    render_version = models.PositiveIntegerField(default=0)
+    archivo = models.FileField(upload_to=_archived_pdf_path, max_length=255)
+    generado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("kind", "object_id")
+
+    def __str__(self):
+        return f"{self.kind}#{self.object_id} v{self.render_version}"
+
+
+def _export_path(instance, filename):
+    return f"exportaciones/{timezone.now():%Y/%m}/{filename}"
+
+
+class Export(models.Model):
+    """
+    Exportación XLSX de un listado (CC u OP), generada en la cola de tareas (ver apps.core.exports).
+    Solo la descarga quien la pidió; se borra a las EXPORT_KEEP_HOURS horas.
+    """
+
+    class Status(models.TextChoices):
+        PENDIENTE = "PENDIENTE", "En preparación"
+        LISTO = "LISTO", "Lista"
+        ERROR = "ERROR", "Fallida"
+
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    kind = models.CharField(max_length=2)  # "cc" o "op"
+    params = models.JSONField(default=dict, blank=True)  # status / desde / hasta del listado
+    estado = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDIENTE)
+    nombre = models.CharField(max_length=255)  # nombre del archivo al descargar
+    archivo = models.FileField(upload_to=_export_path, max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    terminado_en = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.nombre} ({self.estado})"
+
+
+class Job(models.Model):
+    """
+    Tarea en segundo plano (ver apps.core.jobs). La ejecuta `manage.py runworker`;
+    los workers toman filas con SELECT ... FOR UPDATE SKIP LOCKED.
+    """
+
+    class Status(models.TextChoices):
+        PENDIENTE = "PENDIENTE", "Pendiente"
+        EN_CURSO = "EN_CURSO", "En curso"
+        OK = "OK", "Terminada"
+        ERROR = "ERROR", "Fallida"
+
+    tarea = models.CharField(max_length=200)  # ruta de la función marcada con @job
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    prioridad = models.SmallIntegerField(default=0)  # mayor = antes
+    estado = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDIENTE)
+    ejecutar_desde = models.DateTimeField(default=timezone.now)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=3)
+    tomado_por = models.CharField(max_length=100, blank=True)
+    tomado_en = models.DateTimeField(null=True, blank=True)
+    resultado = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    terminado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # cola: solo las pendientes, en el orden en que se toman
+            models.Index(
+                models.F("prioridad").desc(),
+                "ejecutar_desde",
+                "id",
+                name="job_cola_idx",
+                condition=models.Q(estado="PENDIENTE"),
+            ),
+            models.Index(fields=["estado", "terminado_en"], name="job_estado_terminado_idx"),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.tarea} ({self.estado})"
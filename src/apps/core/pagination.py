@@ -0,0 +1,114 @@
+import base64
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+
+# Tamaño de página por defecto de los listados (cc_list / op_list / provider_list)
+LIST_PAGE_SIZE = getattr(settings, "LIST_PAGE_SIZE", 50)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_MICRO = timedelta(microseconds=1)
+
+
+def encode_cursor(obj) -> str:
+    """Cursor opaco para (creado_en, id): "<microsegundos>_<id>"."""
+    return f"{(obj.creado_en - _EPOCH) // _MICRO}_{obj.id}"
+
+
+def decode_cursor(raw: str):
+    try:
+        micros, pk = (raw or "").split("_", 1)
+        return _EPOCH + timedelta(microseconds=int(micros)), int(pk)
+    except (ValueError, OverflowError):
+        return None
+
+
+def encode_value_cursor(value, pk) -> str:
+    """Cursor opaco para (valor, id) con cualquier valor JSON (p. ej. un nombre)."""
+    raw = json.dumps([value, pk], ensure_ascii=False, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_value_cursor(raw: str):
+    try:
+        raw = raw or ""
+        value, pk = json.loads(base64.urlsafe_b64decode(raw + "=" * (-len(raw) % 4)))
+        return value, int(pk)
+    except (ValueError, TypeError):
+        return None
+
+
+class KeysetPage:
+    def __init__(self, object_list, *, has_next: bool, has_previous: bool, encode=encode_cursor):
+        self.object_list = object_list
+        self.has_next = has_next and bool(object_list)
+        self.has_previous = has_previous and bool(object_list)
+        self.next_cursor = encode(object_list[-1]) if self.has_next else ""
+        self.previous_cursor = encode(object_list[0]) if self.has_previous else ""
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def keyset_paginate(qs, request, *, page_size: int = None) -> KeysetPage:
+    """
+    Paginación por cursor sobre (creado_en, id), del más nuevo al más antiguo.
+    - ?after=<cursor>: página siguiente (más antiguos)
+    - ?before=<cursor>: página anterior (más nuevos)
+    No usa OFFSET: cada página cuesta lo mismo sin importar cuántos documentos haya.
+    """
+    size = page_size or LIST_PAGE_SIZE
+    after = decode_cursor(request.GET.get("after"))
+    before = None if after else decode_cursor(request.GET.get("before"))
+
+    if before:
+        ts, pk = before
+        rows = list(
+            qs.filter(Q(creado_en__gt=ts) | Q(creado_en=ts, id__gt=pk))
+            .order_by("creado_en", "id")[: size + 1]
+        )
+        has_previous = len(rows) > size
+        rows = rows[:size][::-1]
+        return KeysetPage(rows, has_next=True, has_previous=has_previous)
+
+    if after:
+        ts, pk = after
+        qs = qs.filter(Q(creado_en__lt=ts) | Q(creado_en=ts, id__lt=pk))
+
+    rows = list(qs.order_by("-creado_en", "-id")[: size + 1])
+    return KeysetPage(rows[:size], has_next=len(rows) > size, has_previous=bool(after))
+
+
+def keyset_paginate_by(qs, request, field: str, *, page_size: int = None) -> KeysetPage:
+    """
+    Igual que keyset_paginate, pero en orden ascendente sobre (field, id), p. ej. por nombre.
+    Conviene un índice (field, id) con el mismo filtro que `qs`.
+    """
+    size = page_size or LIST_PAGE_SIZE
+    after = decode_value_cursor(request.GET.get("after"))
+    before = None if after else decode_value_cursor(request.GET.get("before"))
+
+    def encode(obj):
+        return encode_value_cursor(getattr(obj, field), obj.id)
+
+    if before:
+        value, pk = before
+        rows = list(
+            qs.filter(Q(**{f"{field}__lt": value}) | Q(**{field: value, "id__lt": pk}))
+            .order_by(f"-{field}", "-id")[: size + 1]
+        )
+        has_previous = len(rows) > size
+        rows = rows[:size][::-1]
+        return KeysetPage(rows, has_next=True, has_previous=has_previous, encode=encode)
+
+    if after:
+        value, pk = after
+        qs = qs.filter(Q(**{f"{field}__gt": value}) | Q(**{field: value, "id__gt": pk}))
+
+    rows = list(qs.order_by(field, "id")[: size + 1])
+    return KeysetPage(rows[:size], has_next=len(rows) > size, has_previous=bool(after), encode=encode)
@@ -0,0 +1,210 @@
+"""
+PDF de las impresiones de CC / OP, generados en el servidor (WeasyPrint).
+
+- Cuando un documento queda (o se guarda) en APROBADO, su PDF se genera en segundo plano
+  y se archiva en MEDIA junto a los adjuntos: con PDF_QUEUE en la cola de tareas
+  (manage.py runworker, fuera de gunicorn); si no, en un pool de hilos del proceso web tras el commit.
+- pdf_response() sirve el archivo archivado (apps/core/downloads.py) con ETag / Last-Modified, aunque
+  haya quedado viejo (cambió render_version); en ese caso programa la regeneración. Si aún no hay
+  archivo, lo programa y responde 202 con una página que se recarga sola. WeasyPrint nunca corre
+  en el hilo del request (salvo PDF_WORKERS=0).
+- manage.py generate_pdfs genera en lote (p. ej. todas las OPs de un mes) con un pool de procesos.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils.module_loading import import_string
+
+from .downloads import serve_file
+from .jobs import enqueue, job
+from .models import ArchivedPDF
+
+logger = logging.getLogger(__name__)
+
+# kind -> (modelo, template de impresión, función que arma el contexto)
+PDF_DOCUMENTS = {
+    "cc": ("procurement.ComparativeQuote", "procurement/cc_print.html", "apps.procurement.printing.cc_print_context"),
+    "op": ("payments.PaymentOrder", "payments/op_print.html", "apps.payments.printing.op_print_context"),
+}
+
+# Hilos del proceso web dedicados a generar PDFs (0 = generar en el mismo request, tras el commit)
+PDF_WORKERS = getattr(settings, "PDF_WORKERS", 1)
+# True: los PDFs se generan en la cola de tareas (apps.core.jobs) en vez de en el proceso web
+PDF_QUEUE = getattr(settings, "PDF_QUEUE", False)
+
+
+def kind_for(obj) -> str:
+    label = obj._meta.label
+    for kind, (model_label, _, _) in PDF_DOCUMENTS.items():
+        if model_label == label:
+            return kind
+    raise ValueError(f"{label} no tiene PDF")
+
+
+def render_pdf_bytes(kind: str, obj) -> bytes:
+    from weasyprint import HTML  # dependencia pesada: solo se carga al generar
+
+    _, template, context_fn = PDF_DOCUMENTS[kind]
+    html = render_to_string(template, import_string(context_fn)(obj))
+    return HTML(string=html, base_url=str(settings.BASE_DIR)).write_pdf()
+
+
+def generate_pdf(kind: str, pk: int, *, force: bool = False) -> ArchivedPDF:
+    """Genera (si hace falta) y archiva el PDF del documento. Devuelve el ArchivedPDF."""
+    Model = apps.get_model(PDF_DOCUMENTS[kind][0])
+    obj = Model._base_manager.get(pk=pk)
+
+    archived = ArchivedPDF.objects.filter(kind=kind, object_id=pk).first()
+    if (
+        archived
+        and not force
+        and archived.render_version == obj.render_version
+        and archived.archivo
+        and default_storage.exists(archived.archivo.name)
+    ):
+        return archived
+
+    data = render_pdf_bytes(kind, obj)
+    old_name = archived.archivo.name if archived else ""
+
+    archived = archived or ArchivedPDF(kind=kind, object_id=pk)
+    archived.render_version = obj.render_version
+    archived.archivo.save(f"{obj.number}.pdf", ContentFile(data), save=False)
+    try:
+        archived.save()
+    except IntegrityError:
+        # otro proceso lo archivó al mismo tiempo: nos quedamos con el suyo
+        default_storage.delete(archived.archivo.name)
+        return ArchivedPDF.objects.get(kind=kind, object_id=pk)
+    except Exception:
+        default_storage.delete(archived.archivo.name)
+        raise
+
+    if old_name and old_name != archived.archivo.name:
+        default_storage.delete(old_name)
+    return archived
+
+
+# =========================
+# Segundo plano (dentro del proceso web)
+# =========================
+_executor = None
+_executor_lock = threading.Lock()
+# (kind, pk) ya enviados al pool y sin terminar: varias descargas no los generan dos veces
+_in_flight = set()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PDF_WORKERS, thread_name_prefix="pdf")
+        return _executor
+
+
+def _run_job(kind: str, pk: int) -> None:
+    close_old_connections()
+    try:
+        generate_pdf(kind, pk)
+    except Exception:
+        logger.exception("No se pudo generar el PDF de %s#%s", kind, pk)
+    finally:
+        with _executor_lock:
+            _in_flight.discard((kind, pk))
+        connection.close()
+
+
+@job
+def generate_pdf_job(kind: str, pk: int) -> dict:
+    archived = generate_pdf(kind, pk)
+    return {"archivo": archived.archivo.name, "render_version": archived.render_version}
+
+
+def schedule_pdf(obj) -> None:
+    """Genera el PDF de `obj` después del commit, fuera del request."""
+    kind, pk = kind_for(obj), obj.pk
+
+    if PDF_QUEUE:
+        # la tarea se guarda en la misma transacción: el worker solo la ve tras el commit
+        enqueue(generate_pdf_job, kind, pk, unique=True)
+        return
+
+    def _submit():
+        if PDF_WORKERS < 1:
+            try:
+                generate_pdf(kind, pk)
+            except Exception:
+                logger.exception("No se pudo generar el PDF de %s#%s", kind, pk)
+            return
+        with _executor_lock:
+            if (kind, pk) in _in_flight:
+                return
+            _in_flight.add((kind, pk))
+        _get_executor().submit(_run_job, kind, pk)
+
+    transaction.on_commit(_submit)
+
+
+# =========================
+# Descarga
+# =========================
+def _archived(kind: str, pk: int):
+    """ArchivedPDF de un documento con su archivo presente (de cualquier versión), o None."""
+    archived = ArchivedPDF.objects.filter(kind=kind, object_id=pk).first()
+    if archived and archived.archivo and default_storage.exists(archived.archivo.name):
+        return archived
+    return None
+
+
+def pdf_response(request, obj):
+    """
+    PDF archivado de `obj` con ETag (versión) y Last-Modified para revalidar barato.
+    No genera en el request: si falta o quedó viejo se programa, y mientras tanto se sirve la
+    versión anterior o, si no hay ninguna, una página "generándose" (202).
+    """
+    kind = kind_for(obj)
+    archived = _archived(kind, obj.pk)
+    if archived is None or archived.render_version != obj.render_version:
+        schedule_pdf(obj)
+        if PDF_WORKERS < 1 and not PDF_QUEUE:
+            archived = _archived(kind, obj.pk)  # PDF_WORKERS=0: se generó al programarlo
+    if archived is None:
+        return render(request, "core/pdf_pending.html", {"number": obj.number}, status=202)
+
+    # Entrega como los adjuntos: X-Accel-Redirect / sendfile según MEDIA_DOWNLOAD_BACKEND
+    return serve_file(
+        request,
+        archived.archivo,
+        filename=f"{obj.number}.pdf",
+        content_type="application/pdf",
+        etag=f'"{kind}-{obj.pk}-v{archived.render_version}"',
+    )
+
+
+# =========================
+# Lote (pool de procesos)
+# =========================
+def _init_bulk_worker():
+    import django
+
+    django.setup()
+    # las conexiones heredadas del proceso padre no se comparten
+    connection.close()
+
+
+def bulk_generate_job(args) -> tuple:
+    kind, pk, force = args
+    close_old_connections()
+    try:
+        generate_pdf(kind, pk, force=force)
+        return pk, ""
+    except Exception as exc:  # se reporta en el comando
+        return pk, str(exc) or exc.__class__.__name__
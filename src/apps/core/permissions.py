@@ -1,9 +1,34 @@
 from django.contrib.auth.models import Group
 
+ROLE_CACHE_ATTR = "_role_names_cache"
+
+
+def get_role_names(user) -> frozenset:
+    """
+    Roles (grupos) del usuario, resueltos UNA sola vez por request.
+    Se guardan en el propio objeto user (AuthenticationMiddleware crea uno por request),
+    así is_creator / is_reviewer / is_approver no repiten la consulta.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+
+    cached = getattr(user, ROLE_CACHE_ATTR, None)
+    if cached is None:
+        cached = frozenset(user.groups.values_list("name", flat=True))
+        setattr(user, ROLE_CACHE_ATTR, cached)
+    return cached
+
+
+def clear_role_cache(user) -> None:
+    """Invalida el cache de roles (ej: cuando cambia la membresía de grupos)."""
+    if user is not None and hasattr(user, ROLE_CACHE_ATTR):
+        delattr(user, ROLE_CACHE_ATTR)
+
+
 def in_group(user, group_name: str) -> bool:
     if not user.is_authenticated:
         return False
-    return user.groups.filter(name=group_name).exists()
+    return group_name in get_role_names(user)
 
 def is_creator(user) -> bool:
     return in_group(user, "creador")
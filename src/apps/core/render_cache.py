@@ -0,0 +1,71 @@
+"""
+Caché de impresiones (cc_print / op_print) para documentos bloqueados.
+
+- Clave: modelo + id + render_version del documento. La versión vive en la BD y se
+  incrementa con cualquier cambio que afecte la impresión (ver apps.core.signals),
+  así una entrada vieja simplemente deja de usarse: no hace falta borrarla y funciona
+  igual con una caché por proceso (locmem), en archivos o en un servidor tipo Redis.
+- El backend se elige en settings (CACHES["render"], variable RENDER_CACHE_BACKEND).
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import models
+from django.db.models import F
+from django.http import HttpResponse
+
+RENDER_CACHE_ALIAS = getattr(settings, "RENDER_CACHE_ALIAS", "render")
+
+
+class RenderVersionMixin(models.Model):
+    """
+    Cada save() de un documento existente incrementa render_version EN LA BD (F() + 1),
+    también con update_fields, así nunca se reescribe una versión vieja que esté en memoria.
+    """
+    render_version = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if self._state.adding or (update_fields is not None and not update_fields):
+            return super().save(*args, **kwargs)
+
+        self.render_version = F("render_version") + 1
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "render_version"}
+        try:
+            super().save(*args, **kwargs)
+        finally:
+            # el valor real se vuelve a leer de la BD si alguien lo necesita
+            self.__dict__.pop("render_version", None)
+
+
+def render_cache_key(obj) -> str:
+    return f"print:{obj._meta.label_lower}:{obj.pk}:v{obj.render_version}"
+
+
+def cached_render(obj, render_fn, *, enabled: bool = True) -> HttpResponse:
+    """
+    Devuelve la impresión guardada de `obj` o la genera con `render_fn()` y la guarda.
+    Con enabled=False (documento editable) siempre se renderiza.
+    """
+    if not enabled:
+        return render_fn()
+
+    cache = caches[RENDER_CACHE_ALIAS]
+    key = render_cache_key(obj)
+
+    html = cache.get(key)
+    if html is not None:
+        return HttpResponse(html)
+
+    response = render_fn()
+    if response.status_code == 200:
+        cache.set(key, response.content.decode(response.charset))
+    return response
+
+
+def bump_render_version(model, **filters) -> None:
+    """Invalida la impresión de los documentos de `model` que cumplen `filters`."""
+    model._base_manager.filter(**filters).update(render_version=F("render_version") + 1)
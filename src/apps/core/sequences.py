@@ -0,0 +1,156 @@
+"""
+Numeración de documentos (CC-2026-000001, OP-2026-000001, ...).
+
+Dos modos, según settings.DOCUMENT_NUMBER_POOL_SIZE:
+
+- 0 (por defecto): el número se toma bloqueando la fila de DocumentSequence DENTRO de
+  la transacción del documento. Sin huecos, pero la fila queda bloqueada hasta que
+  termina todo el request.
+
+- N >= 1: los números se reservan en bloques de N, en una transacción CORTA e
+  INDEPENDIENTE (conexión propia, autocommit), y cada proceso los reparte desde memoria.
+  Semántica de huecos explícita:
+    * si el documento hace rollback, su número NO se devuelve (queda un hueco);
+    * los números que un proceso no llegó a usar (reinicio/recycle) se pierden;
+    * entre procesos el orden numérico no sigue exactamente el orden de creación.
+"""
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from .models import DocumentSequence
+
+
+def format_document_number(doc_type: str, year: int, number: int) -> str:
+    return f"{doc_type}-{year}-{number:06d}"
+
+
+def reserve_locked(doc_type: str, count: int, *, year: int = None) -> list:
+    """
+    Reserva `count` números bloqueando la secuencia en la transacción ACTUAL
+    (si hay rollback, los números vuelven: sin huecos).
+    """
+    year = year or timezone.now().year
+    with transaction.atomic():
+        seq, _ = DocumentSequence.objects.select_for_update().get_or_create(
+            doc_type=doc_type,
+            year=year,
+            defaults={"last_number": 0},
+        )
+        first = seq.last_number + 1
+        seq.last_number += count
+        seq.save(update_fields=["last_number"])
+        return [format_document_number(doc_type, year, n) for n in range(first, seq.last_number + 1)]
+
+
+_local = threading.local()
+
+
+def _sequence_connection():
+    """Conexión propia por hilo, fuera de la transacción del request."""
+    conn = getattr(_local, "connection", None)
+    if conn is None:
+        conn = connections.create_connection(DEFAULT_DB_ALIAS)
+        _local.connection = conn
+    conn.close_if_unusable_or_obsolete()
+    return conn
+
+
+def close_sequence_connection():
+    conn = getattr(_local, "connection", None)
+    if conn is not None:
+        conn.close()
+        _local.connection = None
+
+
+def reserve_range(doc_type: str, count: int, *, year: int = None) -> tuple:
+    """
+    Reserva un bloque de `count` números en UNA sentencia, en su propia transacción
+    (autocommit, conexión aparte). Devuelve (year, primero, ultimo).
+    El bloque queda confirmado aunque la transacción del llamador haga rollback.
+    """
+    if count < 1:
+        raise ValueError("count debe ser >= 1")
+
+    year = year or timezone.now().year
+    conn = _sequence_connection()
+    qn = conn.ops.quote_name
+    table = qn(DocumentSequence._meta.db_table)
+
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET {qn('last_number')} = {qn('last_number')} + %s "
+            f"WHERE {qn('doc_type')} = %s AND {qn('year')} = %s "
+            f"RETURNING {qn('last_number')}",
+            [count, doc_type, year],
+        )
+        row = cursor.fetchone()
+        if row is None:
+            # primera reserva del año: creamos la fila (si otro la creó antes, no pasa nada)
+            cursor.execute(
+                f"INSERT INTO {table} ({qn('doc_type')}, {qn('year')}, {qn('last_number')}) "
+                f"VALUES (%s, %s, 0) ON CONFLICT ({qn('doc_type')}, {qn('year')}) DO NOTHING",
+                [doc_type, year],
+            )
+            cursor.execute(
+                f"UPDATE {table} SET {qn('last_number')} = {qn('last_number')} + %s "
+                f"WHERE {qn('doc_type')} = %s AND {qn('year')} = %s "
+                f"RETURNING {qn('last_number')}",
+                [count, doc_type, year],
+            )
+            row = cursor.fetchone()
+
+    last = row[0]
+    return year, last - count + 1, last
+
+
+class DocumentNumberPool:
+    """
+    Pool por proceso de números pre-reservados (ver semántica de huecos arriba).
+    """
+
+    def __init__(self, block_size: int):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._ranges = {}  # {(doc_type, year): [siguiente, ultimo]}
+
+    def take(self, doc_type: str, count: int = 1) -> list:
+        year = timezone.now().year
+        key = (doc_type, year)
+        numbers = []
+        with self._lock:
+            while len(numbers) < count:
+                rng = self._ranges.get(key)
+                if rng is None or rng[0] > rng[1]:
+                    size = max(self.block_size, count - len(numbers))
+                    _, first, last = reserve_range(doc_type, size, year=year)
+                    rng = self._ranges[key] = [first, last]
+                take = min(count - len(numbers), rng[1] - rng[0] + 1)
+                numbers.extend(range(rng[0], rng[0] + take))
+                rng[0] += take
+        return [format_document_number(doc_type, year, n) for n in numbers]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_number_pool():
+    global _pool
+    size = getattr(settings, "DOCUMENT_NUMBER_POOL_SIZE", 0)
+    if size < 1:
+        return None
+    with _pool_lock:
+        if _pool is None or _pool.block_size != size:
+            _pool = DocumentNumberPool(size)
+        return _pool
+
+
+def next_document_numbers(doc_type: str, count: int) -> list:
+    """Punto de entrada único: respeta DOCUMENT_NUMBER_POOL_SIZE."""
+    pool = get_number_pool()
+    if pool is None:
+        return reserve_locked(doc_type, count)
+    return pool.take(doc_type, count)
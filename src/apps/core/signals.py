@@ -0,0 +1,94 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from apps.catalog.models import Product, Provider
+from apps.payments.models import PaymentOrder, PaymentOrderItem
+from apps.procurement.models import (
+    ComparativeItem,
+    ComparativePrice,
+    ComparativeQuote,
+    ComparativeQuoteAttachment,
+    ComparativeSupplier,
+    release_attachment_file,
+)
+
+from .counters import counters_deleted
+from .pdf import schedule_pdf
+from .permissions import clear_role_cache
+from .render_cache import bump_render_version
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def invalidate_role_cache(sender, instance, action, reverse, **kwargs):
+    # Solo nos interesan los cambios ya aplicados
+    if action not in {"post_add", "post_remove", "post_clear"}:
+        return
+
+    # user.groups.add(...) -> instance es el usuario
+    # group.user_set.add(...) -> instance es el grupo (los usuarios en memoria de
+    # otros requests se resuelven de nuevo en su próximo request)
+    if not reverse:
+        clear_role_cache(instance)
+
+
+@receiver(post_delete, sender=ComparativeQuote)
+@receiver(post_delete, sender=PaymentOrder)
+def discount_deleted_document(sender, instance, **kwargs):
+    # Cubre delete(), queryset.delete() y cascadas (el collector corre en una transacción)
+    counters_deleted(instance)
+
+
+@receiver(post_delete, sender=ComparativeQuoteAttachment)
+def release_attachment(sender, instance, **kwargs):
+    # El archivo se comparte entre adjuntos con el mismo contenido: se borra tras el commit
+    # y solo si ya no lo usa ninguna fila (también al borrar el CC en cascada)
+    name = instance.archivo.name
+    transaction.on_commit(lambda: release_attachment_file(name))
+
+
+# =========================
+# Caché de impresiones: cambios en las filas hijas o en el catálogo
+# (los saves del propio CC/OP ya incrementan render_version en RenderVersionMixin)
+# =========================
+@receiver(post_save, sender=ComparativeItem)
+@receiver(post_save, sender=ComparativeSupplier)
+@receiver(post_save, sender=ComparativePrice)
+@receiver(post_delete, sender=ComparativeItem)
+@receiver(post_delete, sender=ComparativeSupplier)
+@receiver(post_delete, sender=ComparativePrice)
+def invalidate_cc_print(sender, instance, **kwargs):
+    bump_render_version(ComparativeQuote, pk=instance.cuadro_id)
+
+
+@receiver(post_save, sender=PaymentOrderItem)
+@receiver(post_delete, sender=PaymentOrderItem)
+def invalidate_op_print(sender, instance, **kwargs):
+    bump_render_version(PaymentOrder, pk=instance.orden_id)
+
+
+@receiver(post_save, sender=Provider)
+def invalidate_provider_prints(sender, instance, created, **kwargs):
+    if created:
+        return
+    bump_render_version(PaymentOrder, proveedor=instance)
+    bump_render_version(ComparativeQuote, proveedores__proveedor=instance)
+
+
+@receiver(post_save, sender=Product)
+def invalidate_product_prints(sender, instance, created, **kwargs):
+    if created:
+        return
+    bump_render_version(PaymentOrder, items__producto=instance)
+    bump_render_version(ComparativeQuote, items__producto=instance)
+
+
+# =========================
+# PDF archivado: se (re)genera en segundo plano al quedar o guardarse en APROBADO
+# =========================
+@receiver(post_save, sender=ComparativeQuote)
+@receiver(post_save, sender=PaymentOrder)
+def archive_approved_pdf(sender, instance, **kwargs):
+    if instance.estado == sender.Status.APROBADO:
+        schedule_pdf(instance)
@@ -0,0 +1,167 @@
+"""
+Storages del proyecto.
+
+CompressedManifestStaticFilesStorage: estáticos para producción (collectstatic).
+- Nombres con hash del contenido (ManifestStaticFilesStorage): app.3f2a9c1b7d4e.css.
+  Como el nombre cambia si cambia el archivo, nginx los sirve con
+  Cache-Control: immutable y el navegador no vuelve a pedirlos.
+- Copias precomprimidas .gz (y .br si está instalado `brotli`) generadas una sola vez
+  en collectstatic; nginx las entrega tal cual (gzip_static / brotli_static).
+
+ContentAddressedStorage: archivos subidos guardados por contenido (SHA-256).
+- Cada contenido se guarda UNA vez en <prefijo>/ab/cd/<sha256>; subir el mismo PDF a otro CC
+  reutiliza el archivo. El nombre original lo guarda el modelo (p. ej. ComparativeQuoteAttachment.nombre).
+- Las referencias son las filas que apuntan al nombre: el archivo se borra con release() cuando
+  ya no queda ninguna (ver apps/core/signals.py).
+- Quien enlaza un archivo (adopt + INSERT de la fila) y quien lo borra (release, clean_media) se
+  serializan con blob_lock(nombre): el borrado revisa las referencias con el lock tomado, así que
+  ve la fila de una subida que ya enlazó el archivo, o la subida espera y lo vuelve a crear.
+"""
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.storage import FileSystemStorage
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+try:
+    import brotli
+except ImportError:  # opcional: sin el paquete solo se generan .gz
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = (".css", ".js", ".map", ".svg", ".json", ".txt", ".xml", ".html", ".ttf", ".eot")
+# Por debajo de esto la compresión no compensa
+MIN_COMPRESS_SIZE = 256
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        generated = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not isinstance(processed, Exception):
+                generated.add(name)
+                if hashed_name:
+                    generated.add(hashed_name)
+            yield name, hashed_name, processed
+
+        if dry_run:
+            return
+        for name in sorted(generated):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self._write_compressed(name)
+
+    def _write_compressed(self, name):
+        with self.open(name) as f:
+            data = f.read()
+
+        variants = [(".gz", lambda raw: gzip.compress(raw, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append((".br", lambda raw: brotli.compress(raw, quality=11)))
+
+        for suffix, compress in variants:
+            compressed = compress(data) if len(data) >= MIN_COMPRESS_SIZE else None
+            if compressed is None or len(compressed) >= len(data):
+                # que no quede una copia vieja de una versión anterior (nombres sin hash)
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                continue
+            with open(self.path(name + suffix), "wb") as out:
+                out.write(compressed)
+
+
+# Primera clave de pg_advisory_xact_lock(int, int) para los archivos de MEDIA ("MEDI")
+MEDIA_LOCK_NAMESPACE = 0x4D454449
+# Sin advisory locks (SQLite en desarrollo): locks por proceso, repartidos por nombre
+_local_locks = [threading.Lock() for _ in range(64)]
+
+
+@contextmanager
+def blob_lock(name: str, using=DEFAULT_DB_ALIAS):
+    """
+    Lock por archivo de MEDIA (`name` relativo a MEDIA_ROOT) entre procesos.
+    En PostgreSQL es pg_advisory_xact_lock: dura hasta el fin de la transacción EXTERNA. Hay que
+    tomarlo dentro de la transacción que inserta o consulta las filas que referencian el archivo,
+    para que el lock se suelte recién con el commit de esas filas.
+    """
+    with transaction.atomic(using=using):
+        conn = connections[using]
+        if conn.vendor == "postgresql":
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s, hashtext(%s))", [MEDIA_LOCK_NAMESPACE, name])
+            yield
+        else:
+            with _local_locks[hash(name) % len(_local_locks)]:
+                yield
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    # Un archivo reutilizado hace menos de esto no se borra aunque parezca sin referencias.
+    # Con PostgreSQL ya lo cubre blob_lock; queda para motores sin advisory locks (varios procesos).
+    RELEASE_GRACE_SECONDS = 300
+
+    def __init__(self, prefix="blobs", **kwargs):
+        super().__init__(**kwargs)
+        self.prefix = prefix.strip("/")
+
+    def blob_name(self, sha256: str) -> str:
+        return f"{self.prefix}/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+    def get_available_name(self, name, max_length=None):
+        # el nombre real sale del contenido en _save
+        return name
+
+    def _save(self, name, content):
+        tmp_dir = self.path(f"{self.prefix}/_tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False) as tmp:
+            if hasattr(content, "seek"):
+                content.seek(0)
+            for chunk in content.chunks():
+                tmp.write(chunk)
+                digest.update(chunk)
+        sha256 = digest.hexdigest()
+        try:
+            # model.save() dentro de transaction.atomic(): el lock se suelta con el commit de la fila
+            with blob_lock(self.blob_name(sha256)):
+                return self.adopt(tmp.name, sha256)
+        finally:
+            os.unlink(tmp.name)
+
+    def adopt(self, path: str, sha256: str) -> str:
+        """
+        Incorpora el archivo local `path` (ya hasheado) sin copiarlo: link al nombre por contenido.
+        Si ese contenido ya estaba guardado se reutiliza. `path` queda intacto (lo borra quien llama).
+        Llamar con blob_lock(blob_name(sha256)) tomado, en la transacción que crea la fila.
+        """
+        name = self.blob_name(sha256)
+        target = self.path(name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.link(path, target)
+            if self.file_permissions_mode is not None:
+                os.chmod(target, self.file_permissions_mode)
+        except FileExistsError:
+            os.utime(target)  # marca de uso reciente (ver RELEASE_GRACE_SECONDS)
+        return name
+
+    def release(self, name: str, still_referenced) -> bool:
+        """Borra el archivo si `still_referenced(name)` es False. Devuelve True si se borró."""
+        if not name:
+            return False
+        # referencias, mtime y borrado con el lock: nadie puede enlazarlo entre la revisión y el unlink
+        with blob_lock(name):
+            if still_referenced(name):
+                return False
+            try:
+                if time.time() - os.stat(self.path(name)).st_mtime < self.RELEASE_GRACE_SECONDS:
+                    return False
+            except FileNotFoundError:
+                return False
+            self.delete(name)
+        return True
@@ -1,3 +1,764 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import multiprocessing
+import os
+import shutil
+import signal
+import zipfile
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import Group, User
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import DatabaseError, InterfaceError, connection, transaction
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.core import events, exports, jobs, media_gc, pagination, pdf, sequences, views
+from apps.core.management.commands import runworker
+from apps.core.counters import compute_counters_from_source
+from apps.core.events import EventWatcher, WatcherBusy, watcher
+from apps.core.models import DocumentCounter, DocumentSequence, Export, Job, WorkflowEvent
+from apps.catalog.models import Provider
+from apps.core.pagination import encode_cursor
+from apps.payments.models import PaymentOrder
+from apps.procurement.models import ComparativeQuote, ComparativeQuoteAttachment
+
+
+class EventWatcherTests(SimpleTestCase):
+    def test_one_fetch_per_interval_regardless_of_waiters(self):
+        calls = []
+        current = {"id": 5}
+
+        def fetch():
+            calls.append(1)
+            return current["id"]
+
+        w = EventWatcher(fetch=fetch, interval=0.05)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(w.wait(5, timeout=5))) for _ in range(20)
+        ]
+        for t in threads:
+            t.start()
+        time.sleep(0.3)
+        current["id"] = 6
+        for t in threads:
+            t.join(5)
+
+        self.assertEqual(results, [True] * 20)
+        # ~0.35 s / 0.05 s de consultas; con una consulta por pestaña serían cientos
+        self.assertLess(len(calls), 20)
+        self.assertEqual(w.waiters, 0)
+
+    def test_publish_wakes_waiters_without_waiting_for_the_poll(self):
+        w = EventWatcher(fetch=lambda: 0, interval=60)
+        started = time.monotonic()
+        threading.Timer(0.1, w.publish, args=(3,)).start()
+
+        self.assertTrue(w.wait(0, timeout=5))
+        self.assertLess(time.monotonic() - started, 2)
+
+    def test_timeout_without_events(self):
+        w = EventWatcher(fetch=lambda: 7, interval=0.01)
+        self.assertFalse(w.wait(7, timeout=0.1))
+
+    def test_no_fetch_while_nobody_waits(self):
+        calls = []
+        w = EventWatcher(fetch=lambda: calls.append(1) or 1, interval=0.01)
+        w.wait(0, timeout=1)
+        time.sleep(0.1)
+        idle_calls = len(calls)
+        time.sleep(0.2)
+        self.assertLessEqual(len(calls), idle_calls + 1)
+
+    def test_waiter_cap_is_checked_under_the_lock(self):
+        w = EventWatcher(fetch=lambda: 0, interval=60)
+        waiting = threading.Thread(target=w.wait, args=(0, 1), kwargs={"max_waiters": 1})
+        waiting.start()
+        while w.waiters == 0:
+            time.sleep(0.01)
+
+        with self.assertRaises(WatcherBusy):
+            w.wait(0, timeout=1, max_waiters=1)
+        waiting.join(5)
+        self.assertEqual(w.waiters, 0)
+
+    def test_any_fetch_error_keeps_the_thread_alive(self):
+        results = iter([InterfaceError("conexión cerrada"), ValueError("otro error")])
+
+        def fetch():
+            error = next(results, None)
+            if error is not None:
+                raise error
+            return 4
+
+        w = EventWatcher(fetch=fetch, interval=0.01)
+        with mock.patch.object(events, "connection"), self.assertLogs(events.logger, "ERROR") as logs:
+            self.assertTrue(w.wait(3, timeout=2))
+        self.assertEqual(len(logs.records), 2)
+
+    def test_dead_thread_is_started_again(self):
+        current = {"id": 1}
+        w = EventWatcher(fetch=lambda: current["id"], interval=0.01)
+        # al quedar inactivo el hilo cierra la conexión; si eso falla, el hilo termina
+        with mock.patch.object(events, "connection") as conn, mock.patch("threading.excepthook"):
+            conn.close.side_effect = RuntimeError("falla")
+            self.assertTrue(w.wait(0, timeout=2))
+            deadline = time.monotonic() + 2
+            while w._thread is not None and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self.assertIsNone(w._thread)
+
+        current["id"] = 2
+        with mock.patch.object(events, "connection"):
+            self.assertTrue(w.wait(1, timeout=2))
+
+
+class LiveUpdatesViewTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("u1", password="x"))
+
+    def test_busy_process_answers_immediately_with_retry_after(self):
+        with mock.patch.object(views, "LIVE_UPDATES_MAX_WAITERS", 0):
+            data = self.client.get("/api/live-updates/?since=3").json()
+        self.assertEqual(data, {"last_event": 3, "changed": False, "retry_after": views.LIVE_UPDATES_BUSY_RETRY})
+
+    def test_waits_on_watcher_and_then_reads_events(self):
+        event = WorkflowEvent.objects.create(kind="cc", object_id=10, estado="EN_REVISION")
+        with mock.patch.object(watcher, "wait", return_value=True) as wait:
+            data = self.client.get(f"/api/live-updates/?since={event.pk - 1}&cc=10").json()
+
+        wait.assert_called_once_with(event.pk - 1, views.LIVE_UPDATES_TIMEOUT, max_waiters=views.LIVE_UPDATES_MAX_WAITERS)
+        self.assertTrue(data["changed"])
+        self.assertEqual(data["last_event"], event.pk)
+
+    def test_timeout_returns_unchanged(self):
+        with mock.patch.object(watcher, "wait", return_value=False):
+            data = self.client.get("/api/live-updates/?since=9").json()
+        self.assertEqual(data, {"last_event": 9, "changed": False})
+
+
+class MediaGCTests(TestCase):
+    DAY = 86400
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user("creador1", password="x")
+        self.cc = ComparativeQuote.objects.create(item_cotizado="X", proyecto="P", expresado_en="Bs", creado_por=self.user)
+
+    def write(self, name, age_days=3):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"x" * 10)
+        old = time.time() - age_days * self.DAY
+        os.utime(path, (old, old))
+        return path
+
+    def attach(self, content=b"%PDF-1.4\nadjunto"):
+        att = ComparativeQuoteAttachment(cuadro=self.cc, subido_por=self.user, nombre="a.pdf")
+        att.archivo.save("a.pdf", ContentFile(content), save=True)
+        old = time.time() - 3 * self.DAY
+        os.utime(att.archivo.path, (old, old))
+        return att
+
+    def collect(self, **kwargs):
+        return media_gc.collect_orphans(min_age=self.DAY, **kwargs)
+
+    def test_only_old_unreferenced_files_are_removed(self):
+        orphan = self.write("cc_cotizaciones/2020/huerfano.pdf")
+        recent = self.write("cc_cotizaciones/2020/reciente.pdf", age_days=0)
+        att = self.attach()
+
+        report = self.collect(action="delete", batch_size=1)
+
+        self.assertEqual((report.scanned, report.recent, report.orphans, report.removed), (3, 1, 1, 1))
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(recent))
+        self.assertTrue(os.path.exists(att.archivo.path))
+
+    def test_dry_run_changes_nothing(self):
+        orphan = self.write("cc_cotizaciones/2020/huerfano.pdf")
+        report = self.collect()
+        self.assertEqual((report.orphans, report.removed), (1, 0))
+        self.assertTrue(os.path.exists(orphan))
+
+    def test_blob_referenced_after_the_batch_query_is_kept(self):
+        att = self.attach()
+        real = media_gc.referenced
+        calls = []
+
+        def stale_batch(names, refs):
+            # la consulta del lote es anterior a que otra subida reutilizara el archivo
+            calls.append(names)
+            return set() if len(calls) == 1 else real(names, refs)
+
+        with mock.patch.object(media_gc, "referenced", side_effect=stale_batch):
+            report = self.collect(action="delete")
+
+        self.assertEqual((report.orphans, report.removed, report.kept), (1, 0, 1))
+        self.assertTrue(os.path.exists(att.archivo.path))
+
+    def test_blob_touched_after_the_scan_is_kept(self):
+        path = self.write("cc_cotizaciones/sha256/ab/cd/abcd")
+
+        def touched_meanwhile(names, refs):
+            os.utime(path)  # ContentAddressedStorage.adopt de un archivo que ya existía
+            return set()
+
+        with mock.patch.object(media_gc, "referenced", side_effect=touched_meanwhile):
+            report = self.collect(action="quarantine", quarantine=os.path.join(self.media_root, "_q"))
+
+        self.assertEqual((report.removed, report.kept), (0, 1))
+        self.assertTrue(os.path.exists(path))
+
+
+class FormulaEscapeTests(SimpleTestCase):
+    rows = [["=HYPERLINK(\"http://x\")", "+1", "-2", "@SUM(A1)", "Cemento", Decimal("-5.00")]]
+
+    def test_csv(self):
+        r = exports.csv_response("x", ["a"] * 6, iter(self.rows))
+        body = b"".join(r.streaming_content).decode("utf-8-sig")
+        row = list(csv.reader(io.StringIO(body)))[1]
+        self.assertEqual(row, ["'=HYPERLINK(\"http://x\")", "'+1", "'-2", "'@SUM(A1)", "Cemento", "-5.00"])
+
+    @skipUnless(exports.xlsxwriter is not None, "XlsxWriter no instalado")
+    def test_xlsx_writes_strings_not_formulas(self):
+        buf = io.BytesIO()
+        exports.write_xlsx(buf, ["a"] * 6, self.rows)
+        with zipfile.ZipFile(buf) as z:
+            sheet = z.read("xl/worksheets/sheet1.xml").decode()
+        self.assertNotIn("<f>", sheet)
+        self.assertIn("<v>-5</v>", sheet)  # los números siguen siendo números
+
+
+@skipUnless(exports.xlsxwriter is not None, "XlsxWriter no instalado")
+class XlsxExportTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user("creador1", password="x")
+        ComparativeQuote.objects.create(item_cotizado="=1+1", proyecto="P", expresado_en="Bs", creado_por=self.user)
+        self.client.force_login(self.user)
+
+    @mock.patch.object(exports, "EXPORT_QUEUE", True)
+    def test_request_only_enqueues_and_worker_builds_the_file(self):
+        r = self.client.get("/cuadros/exportar/?formato=xlsx&status=all")
+        export = Export.objects.get()
+        self.assertRedirects(r, f"/exportaciones/{export.pk}/", fetch_redirect_response=False)
+        self.assertEqual(export.estado, Export.Status.PENDIENTE)
+        self.assertEqual(export.params, {"status": "all"})
+        self.assertEqual(Job.objects.get().tarea, "apps.core.exports.build_xlsx_export")
+        self.assertEqual(self.client.get(f"/exportaciones/{export.pk}/descargar/").status_code, 404)
+
+        # lo que hace el worker; work() cerraría la conexión de la transacción del test
+        self.assertTrue(jobs.run(jobs.claim("w1")))
+
+        export.refresh_from_db()
+        self.assertEqual(export.estado, Export.Status.LISTO)
+        r = self.client.get(f"/exportaciones/{export.pk}/descargar/")
+        self.assertEqual(r["Content-Type"], exports.XLSX_CONTENT_TYPE)
+        self.assertTrue(r["Content-Disposition"].startswith("attachment"))
+        with zipfile.ZipFile(io.BytesIO(b"".join(r.streaming_content))) as z:
+            self.assertIn("<t>'=1+1</t>", z.read("xl/worksheets/sheet1.xml").decode())
+
+    def test_only_the_owner_sees_the_export(self):
+        self.client.get("/cuadros/exportar/?formato=xlsx")
+        export = Export.objects.get()
+        other = self.client_class()
+        other.force_login(User.objects.create_user("otro", password="x"))
+        self.assertEqual(other.get(f"/exportaciones/{export.pk}/").status_code, 404)
+        self.assertEqual(other.get(f"/exportaciones/{export.pk}/descargar/").status_code, 404)
+        self.assertEqual(self.client.get(f"/exportaciones/{export.pk}/descargar/").status_code, 200)
+
+    def test_old_exports_are_purged(self):
+        self.client.get("/cuadros/exportar/?formato=xlsx")
+        export = Export.objects.get()
+        path = export.archivo.path
+        Export.objects.filter(pk=export.pk).update(
+            creado_en=export.creado_en - datetime.timedelta(hours=exports.EXPORT_KEEP_HOURS + 1)
+        )
+
+        self.assertEqual(exports.purge_old_exports(), 1)
+        self.assertFalse(Export.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+
+class PdfResponseTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root, STORAGES=STATIC_STORAGES)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user("creador1", password="x")
+        self.cc = ComparativeQuote.objects.create(item_cotizado="X", proyecto="P", expresado_en="Bs", creado_por=self.user)
+        # sin save(): la señal programaría el PDF antes de que el test mockee nada
+        ComparativeQuote.objects.filter(pk=self.cc.pk).update(estado=ComparativeQuote.Status.APROBADO)
+        self.url = f"/cuadros/{self.cc.pk}/pdf/"
+        self.client.force_login(self.user)
+
+    def current_version(self):
+        return ComparativeQuote.objects.get(pk=self.cc.pk).render_version
+
+    @mock.patch.object(pdf, "PDF_QUEUE", True)
+    @mock.patch.object(pdf, "render_pdf_bytes")
+    def test_missing_pdf_is_enqueued_and_request_gets_202(self, render_pdf_bytes):
+        r = self.client.get(self.url)
+        self.assertEqual(r.status_code, 202)
+        self.assertContains(r, "Generando el PDF", status_code=202)
+        render_pdf_bytes.assert_not_called()
+        self.assertEqual(Job.objects.get().args, ["cc", self.cc.pk])
+
+        # recargar mientras tanto no encola otra
+        self.assertEqual(self.client.get(self.url).status_code, 202)
+        self.assertEqual(Job.objects.count(), 1)
+
+        render_pdf_bytes.return_value = b"%PDF-1.4 v1"
+        jobs.run(jobs.claim("w1"))
+        r = self.client.get(self.url)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(b"".join(r.streaming_content), b"%PDF-1.4 v1")
+        render_pdf_bytes.assert_called_once()
+
+    @mock.patch.object(pdf, "PDF_QUEUE", True)
+    @mock.patch.object(pdf, "render_pdf_bytes", return_value=b"%PDF-1.4 v1")
+    def test_archived_pdf_is_served_with_its_version_as_etag(self, render_pdf_bytes):
+        pdf.generate_pdf("cc", self.cc.pk)
+        etag = f'"cc-{self.cc.pk}-v{self.current_version()}"'
+
+        r = self.client.get(self.url)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r["ETag"], etag)
+        self.assertEqual(r["Content-Type"], "application/pdf")
+        self.assertEqual(b"".join(r.streaming_content), b"%PDF-1.4 v1")
+
+        r = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 304)
+        self.assertEqual(render_pdf_bytes.call_count, 1)
+        self.assertFalse(Job.objects.exists())
+
+    @mock.patch.object(pdf, "PDF_QUEUE", True)
+    @mock.patch.object(pdf, "render_pdf_bytes", return_value=b"%PDF-1.4 v1")
+    def test_stale_pdf_is_served_while_it_is_regenerated(self, render_pdf_bytes):
+        pdf.generate_pdf("cc", self.cc.pk)
+        old_etag = f'"cc-{self.cc.pk}-v{self.current_version()}"'
+        ComparativeQuote.objects.filter(pk=self.cc.pk).update(render_version=F("render_version") + 1)
+
+        r = self.client.get(self.url, HTTP_IF_NONE_MATCH=old_etag)
+        self.assertEqual(r.status_code, 304)
+        r = self.client.get(self.url)
+        self.assertEqual(r["ETag"], old_etag)
+        self.assertEqual(b"".join(r.streaming_content), b"%PDF-1.4 v1")
+        self.assertEqual(render_pdf_bytes.call_count, 1)
+        self.assertEqual(Job.objects.filter(estado=Job.Status.PENDIENTE).count(), 1)
+
+        render_pdf_bytes.return_value = b"%PDF-1.4 v2"
+        jobs.run(jobs.claim("w1"))
+        r = self.client.get(self.url, HTTP_IF_NONE_MATCH=old_etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r["ETag"], f'"cc-{self.cc.pk}-v{self.current_version()}"')
+        self.assertEqual(b"".join(r.streaming_content), b"%PDF-1.4 v2")
+
+    @mock.patch.object(pdf, "PDF_QUEUE", False)
+    @mock.patch.object(pdf, "PDF_WORKERS", 0)
+    @mock.patch.object(pdf, "render_pdf_bytes", return_value=b"%PDF-1.4 v1")
+    def test_without_workers_it_is_generated_when_the_request_commits(self, render_pdf_bytes):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(self.url)
+        r = self.client.get(self.url)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(b"".join(r.streaming_content), b"%PDF-1.4 v1")
+        self.assertFalse(Job.objects.exists())
+
+
+class SequenceTests(TransactionTestCase):
+    def tearDown(self):
+        sequences.close_sequence_connection()
+        super().tearDown()
+
+    def test_ranges_are_consecutive_and_do_not_overlap(self):
+        self.assertEqual(sequences.reserve_range("CC", 10, year=2030), (2030, 1, 10))
+        self.assertEqual(sequences.reserve_range("CC", 5, year=2030), (2030, 11, 15))
+        self.assertEqual(sequences.reserve_range("OP", 1, year=2030), (2030, 1, 1))
+        self.assertEqual(DocumentSequence.objects.get(doc_type="CC", year=2030).last_number, 15)
+
+    def test_range_survives_the_callers_rollback(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            sequences.reserve_range("CC", 3, year=2030)
+            raise RuntimeError
+        # hueco explícito: el bloque ya estaba confirmado en su propia conexión
+        self.assertEqual(sequences.reserve_range("CC", 1, year=2030), (2030, 4, 4))
+
+    def test_locked_numbers_go_back_on_rollback(self):
+        year = timezone.now().year
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.assertEqual(sequences.reserve_locked("CC", 2), [f"CC-{year}-000001", f"CC-{year}-000002"])
+            raise RuntimeError
+        self.assertEqual(sequences.reserve_locked("CC", 1), [f"CC-{year}-000001"])
+
+    def test_pool_hands_out_numbers_from_memory(self):
+        pool = sequences.DocumentNumberPool(block_size=5)
+        year = timezone.now().year
+        with mock.patch.object(sequences, "reserve_range", wraps=sequences.reserve_range) as reserve:
+            first = pool.take("OP", 3)
+            second = pool.take("OP", 3)  # 2 del bloque + un bloque nuevo
+            big = pool.take("OP", 12)  # más que un bloque: se reserva de una vez
+
+        self.assertEqual(reserve.call_count, 3)
+        numbers = [int(n.rsplit("-", 1)[1]) for n in first + second + big]
+        self.assertEqual(numbers, list(range(1, 19)))
+        self.assertTrue(first[0].startswith(f"OP-{year}-"))
+
+    def test_next_document_numbers_honours_the_pool_setting(self):
+        with override_settings(DOCUMENT_NUMBER_POOL_SIZE=0):
+            self.assertIsNone(sequences.get_number_pool())
+        with override_settings(DOCUMENT_NUMBER_POOL_SIZE=4):
+            self.assertEqual(sequences.get_number_pool().block_size, 4)
+            sequences.next_document_numbers("CC", 1)
+        self.assertEqual(DocumentSequence.objects.get(doc_type="CC").last_number, 4)
+
+
+@jobs.job
+def ok_job(value):
+    return {"value": value}
+
+
+@jobs.job
+def failing_job():
+    raise RuntimeError("falla")
+
+
+@jobs.job
+def slow_job():
+    # dura más que JOB_LOCK_TIMEOUT; otro worker pasa maintenance() mientras tanto
+    time.sleep(0.5)
+    jobs.maintenance()
+
+
+@jobs.job
+def requeued_job():
+    # maintenance() de otro worker la devolvió a la cola mientras corría
+    Job.objects.filter(estado=Job.Status.EN_CURSO).update(estado=Job.Status.PENDIENTE, tomado_por="")
+    return "tarde"
+
+
+# work() cierra conexiones como el worker real: sin la transacción de TestCase
+class JobQueueTests(TransactionTestCase):
+    def test_claim_takes_highest_priority_then_oldest(self):
+        low = jobs.enqueue(ok_job, 1)
+        high = jobs.enqueue(ok_job, 2, priority=5)
+        jobs.enqueue(ok_job, 3, priority=9, run_at=timezone.now() + datetime.timedelta(hours=1))
+        older = jobs.enqueue(ok_job, 4)
+        Job.objects.filter(pk=older.pk).update(ejecutar_desde=low.ejecutar_desde - datetime.timedelta(seconds=1))
+
+        claimed = [jobs.claim("w1").pk for _ in range(3)]
+
+        self.assertEqual(claimed, [high.pk, older.pk, low.pk])
+        self.assertIsNone(jobs.claim("w1"))  # la programada para después no está lista
+
+    def test_result_is_stored(self):
+        jobs.enqueue(ok_job, 7)
+        self.assertEqual(jobs.work(burst=True), 1)
+        row = Job.objects.get()
+        self.assertEqual((row.estado, row.resultado, row.intentos), (Job.Status.OK, {"value": 7}, 1))
+
+    def test_failures_are_retried_with_backoff_until_max_attempts(self):
+        row = jobs.enqueue(failing_job, max_attempts=3)
+        delays = []
+        for _ in range(3):
+            Job.objects.filter(pk=row.pk).update(ejecutar_desde=timezone.now())
+            claimed = jobs.claim("w1")
+            before = timezone.now()
+            with self.assertLogs(jobs.logger, "ERROR"):
+                self.assertFalse(jobs.run(claimed))
+            row.refresh_from_db()
+            delays.append(round((row.ejecutar_desde - before).total_seconds() / jobs.RETRY_DELAY))
+
+        self.assertEqual(row.estado, Job.Status.ERROR)
+        self.assertIn("RuntimeError: falla", row.error)
+        # 30 s y 60 s antes del 2º y 3º intento; el último ya no se reprograma
+        self.assertEqual(delays[:2], [1, 2])
+
+    def test_only_marked_functions_run(self):
+        with self.assertRaises(ValueError):
+            jobs.enqueue(print, "x")
+        Job.objects.create(tarea="builtins.print", ejecutar_desde=timezone.now(), max_intentos=1)
+        with self.assertLogs(jobs.logger, "ERROR"):
+            jobs.work(burst=True)
+        self.assertEqual(Job.objects.get().estado, Job.Status.ERROR)
+
+    def test_database_error_while_running_does_not_stop_the_worker(self):
+        jobs.enqueue(ok_job, 1)
+        second = jobs.enqueue(ok_job, 2)
+        real_run = jobs.run
+        calls = []
+
+        def flaky_run(job_row):
+            calls.append(job_row.pk)
+            if len(calls) == 1:
+                raise DatabaseError("la conexión se cerró")
+            return real_run(job_row)
+
+        with mock.patch.object(jobs, "run", side_effect=flaky_run), self.assertLogs(jobs.logger, "ERROR"):
+            self.assertEqual(jobs.work(burst=True, sleep=0), 1)
+
+        self.assertEqual(Job.objects.get(pk=second.pk).estado, Job.Status.OK)
+        # la que estaba en curso queda para maintenance()
+        self.assertEqual(Job.objects.get(pk=calls[0]).estado, Job.Status.EN_CURSO)
+
+    @mock.patch.object(jobs, "HEARTBEAT_INTERVAL", 0.05)
+    @mock.patch.object(jobs, "LOCK_TIMEOUT", 0.3)
+    def test_heartbeat_keeps_long_jobs_running(self):
+        row = jobs.enqueue(slow_job)
+        self.assertTrue(jobs.run(jobs.claim("w1")))
+        row.refresh_from_db()
+        self.assertEqual((row.estado, row.intentos), (Job.Status.OK, 1))
+
+    def test_result_is_dropped_when_the_row_was_requeued(self):
+        row = jobs.enqueue(requeued_job)
+        with self.assertLogs(jobs.logger, "WARNING") as logs:
+            self.assertFalse(jobs.run(jobs.claim("w1")))
+        self.assertIn("se descarta su resultado", logs.output[0])
+        row.refresh_from_db()
+        self.assertEqual((row.estado, row.resultado), (Job.Status.PENDIENTE, None))
+
+    def test_unique_reuses_the_pending_job(self):
+        first = jobs.enqueue(ok_job, 1, unique=True)
+        self.assertEqual(jobs.enqueue(ok_job, 1, unique=True).pk, first.pk)
+        self.assertNotEqual(jobs.enqueue(ok_job, 2, unique=True).pk, first.pk)
+
+    def test_stuck_jobs_go_back_to_the_queue(self):
+        row = jobs.enqueue(ok_job, 1)
+        jobs.claim("caido")
+        Job.objects.filter(pk=row.pk).update(
+            tomado_en=timezone.now() - datetime.timedelta(seconds=jobs.LOCK_TIMEOUT + 1)
+        )
+        with self.assertLogs(jobs.logger, "WARNING"):
+            jobs.maintenance()
+        row.refresh_from_db()
+        self.assertEqual(row.estado, Job.Status.PENDIENTE)
+
+
+class JobClaimConcurrencyTests(TransactionTestCase):
+    @skipUnless(connection.vendor == "postgresql", "SKIP LOCKED solo en PostgreSQL")
+    def test_locked_rows_are_skipped(self):
+        first = jobs.enqueue(ok_job, 1, priority=1)
+        second = jobs.enqueue(ok_job, 2)
+        locked = threading.Event()
+        release = threading.Event()
+
+        def other_worker():
+            try:
+                with transaction.atomic():
+                    # otro worker con la primera tarea tomada y su transacción todavía abierta
+                    list(Job.objects.select_for_update().filter(pk=first.pk))
+                    locked.set()
+                    release.wait(5)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=other_worker)
+        thread.start()
+        locked.wait(5)
+        started = time.monotonic()
+        claimed = jobs.claim("w2")
+        release.set()
+        thread.join()
+
+        self.assertEqual(claimed.pk, second.pk)
+        self.assertLess(time.monotonic() - started, 2)  # no esperó el lock del otro
+
+
+class CounterTests(TestCase):
+    def counters(self):
+        return {
+            (c.doc_type, c.estado, c.creado_por_id): c.total
+            for c in DocumentCounter.objects.exclude(total=0)
+        }
+
+    def test_stale_instance_moves_the_stored_state(self):
+        user = User.objects.create_user("creador1", password="x")
+        cc = ComparativeQuote.objects.create(item_cotizado="X", proyecto="P", expresado_en="Bs", creado_por=user)
+        stale = ComparativeQuote.objects.get(pk=cc.pk)
+
+        cc.estado = ComparativeQuote.Status.EN_REVISION
+        cc.save(update_fields=["estado"])
+        # la otra copia se cargó cuando aún era BORRADOR
+        stale.estado = ComparativeQuote.Status.RECHAZADO
+        stale.save(update_fields=["estado"])
+
+        self.assertEqual(self.counters(), compute_counters_from_source())
+        self.assertEqual(self.counters(), {("CC", ComparativeQuote.Status.RECHAZADO, user.pk): 1})
+
+    def test_fields_not_counted_do_not_touch_counters(self):
+        user = User.objects.create_user("creador1", password="x")
+        cc = ComparativeQuote.objects.create(item_cotizado="X", proyecto="P", expresado_en="Bs", creado_por=user)
+        cc.proyecto = "Q"
+        with CaptureQueriesContext(connection) as ctx:
+            cc.save(update_fields=["proyecto"])
+        sql = [q["sql"] for q in ctx.captured_queries]
+        self.assertFalse([q for q in sql if q.startswith("SELECT") or "documentcounter" in q], sql)
+
+
+class RunWorkerTests(SimpleTestCase):
+    def setUp(self):
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            self.addCleanup(signal.signal, signum, signal.getsignal(signum))
+        self.markers = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.markers, ignore_errors=True)
+
+    def test_children_that_die_are_respawned(self):
+        markers = self.markers
+
+        def crash_once(burst, sleep):
+            # cada hijo muere la primera vez (como con el OOM killer) y termina bien al reiniciarse
+            marker = os.path.join(markers, multiprocessing.current_process().name)
+            if not os.path.exists(marker):
+                open(marker, "w").close()
+                os._exit(1)
+
+        err = io.StringIO()
+        with mock.patch.object(runworker, "_child", crash_once), mock.patch.object(runworker, "RESPAWN_DELAY", 0):
+            call_command("runworker", processes=2, burst=True, stdout=io.StringIO(), stderr=err)
+
+        self.assertEqual(sorted(os.listdir(markers)), ["worker-0", "worker-1"])
+        self.assertEqual(err.getvalue().count("se reinicia"), 2)
+
+
+# Tablas grandes: ninguna consulta de los listados / bandeja / APIs debe recorrerlas enteras
+DOC_TABLES = ("procurement_comparativequote", "payments_paymentorder")
+STATIC_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+def make_user(username, *groups):
+    user = User.objects.create_user(username, password="x")
+    for name in groups:
+        user.groups.add(Group.objects.get_or_create(name=name)[0])
+    return user
+
+
+def seed_estado(n: int) -> str:
+    """Reparto de estados parecido al de producción: casi todo aprobado, poco en curso."""
+    Status = ComparativeQuote.Status
+    for limit, estado in ((80, Status.APROBADO), (85, Status.RECHAZADO), (93, Status.BORRADOR), (96, Status.EN_REVISION)):
+        if n % 100 < limit:
+            return estado
+    return Status.REVISADO
+
+
+@skipUnless(connection.vendor == "postgresql", "EXPLAIN de PostgreSQL")
+@override_settings(STORAGES=STATIC_STORAGES)
+@mock.patch.object(pagination, "LIST_PAGE_SIZE", 50)
+class IndexUsageTests(TestCase):
+    """
+    EXPLAIN de las consultas que ejecutan de verdad cc_list, op_list, la bandeja y las APIs, con
+    un volumen suficiente para que el planner elija solo (enable_seqscan sigue activo).
+    """
+    DOCS = 20000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reviewer = make_user("revisor1", "revisor")
+        cls.approver = make_user("aprobador1", "aprobador")
+        creators = [make_user(f"creador{n}", "creador") for n in range(40)]
+        cls.creator = creators[1]
+        proveedor = Provider.objects.create(nombre_empresa="Proveedor SA")
+
+        ComparativeQuote.objects.bulk_create(
+            (
+                ComparativeQuote(
+                    number=f"CC-T-{n}", item_cotizado="X", proyecto="P", expresado_en="Bs",
+                    creado_por=creators[n % len(creators)], estado=seed_estado(n),
+                )
+                for n in range(cls.DOCS)
+            ),
+            batch_size=2000,
+        )
+        cuadros = list(ComparativeQuote.objects.order_by("id").values_list("id", "creado_por_id", "estado"))
+        PaymentOrder.objects.bulk_create(
+            (
+                PaymentOrder(
+                    number=f"OP-T-{n}", cuadro_id=cc_id, proveedor=proveedor,
+                    creado_por_id=creado_por_id, estado=estado,
+                )
+                for n, (cc_id, creado_por_id, estado) in enumerate(cuadros)
+            ),
+            batch_size=2000,
+        )
+        with connection.cursor() as cursor:
+            for table in DOC_TABLES:
+                # bulk_create pone la misma fecha a todas: una por minuto hacia atrás
+                cursor.execute(f"UPDATE {table} SET creado_en = now() - id * interval '1 minute'")
+                cursor.execute(f"ANALYZE {table}")
+
+    def plans(self, user, url):
+        """EXPLAIN de cada consulta del request que lee CC u OP."""
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in ctx.captured_queries:
+                sql = query["sql"]
+                if sql.startswith("SELECT") and any(f'"{table}"' in sql for table in DOC_TABLES):
+                    cursor.execute(f"EXPLAIN {sql}")
+                    plans.append("\n".join(row[0] for row in cursor.fetchall()))
+        return plans
+
+    def assertUsesIndexes(self, user, url, *indexes):
+        plans = self.plans(user, url)
+        self.assertTrue(plans, f"{url} no consultó CC ni OP")
+        for plan in plans:
+            for table in DOC_TABLES:
+                self.assertNotIn(f"Seq Scan on {table}", plan, plan)
+        for index in indexes:
+            self.assertIn(index, "\n".join(plans))
+
+    def test_cc_list(self):
+        self.assertUsesIndexes(self.reviewer, "/cuadros/", "cc_creado_id_idx")
+        self.assertUsesIndexes(self.reviewer, "/cuadros/?status=pending", "cc_estado_creado_idx")
+        self.assertUsesIndexes(self.creator, "/cuadros/?status=draft", "cc_creador_estado_idx")
+
+    def test_cc_list_next_page(self):
+        cursor = encode_cursor(ComparativeQuote.objects.order_by("-creado_en", "-id")[500])
+        self.assertUsesIndexes(self.reviewer, f"/cuadros/?after={cursor}", "cc_creado_id_idx")
+
+    def test_op_list(self):
+        self.assertUsesIndexes(self.approver, "/ordenes/", "op_creado_id_idx")
+        self.assertUsesIndexes(self.approver, "/ordenes/?status=pending", "op_estado_creado_idx")
+        self.assertUsesIndexes(self.creator, "/ordenes/?status=draft", "op_creador_estado_idx")
+
+    def test_workbench(self):
+        self.assertUsesIndexes(self.reviewer, "/bandeja/", "cc_estado_creado_idx")
+        self.assertUsesIndexes(self.approver, "/bandeja/", "cc_estado_creado_idx")
+        self.assertUsesIndexes(self.creator, "/bandeja/", "cc_creador_estado_idx", "op_creador_estado_idx")
+
+    def test_live_status(self):
+        ids = ",".join(str(pk) for pk in ComparativeQuote.objects.order_by("-id").values_list("id", flat=True)[:20])
+        self.assertUsesIndexes(self.reviewer, f"/api/live-status/?kind=cc&ids={ids}", "procurement_comparativequote_pkey")
+
+    def test_pending_counts_do_not_read_the_documents(self):
+        # salen de DocumentCounter: ninguna consulta sobre CC u OP
+        self.assertEqual(self.plans(self.reviewer, "/api/pending-counts/"), [])
@@ -14,4 +14,9 @@ urlpatterns = [
     # APIs (si las estabas usando desde config)
     path("api/pending-counts/", views.api_pending_counts, name="api_pending_counts"),
     path("api/live-status/", views.api_live_status, name="api_live_status"),
+    path("api/live-updates/", views.api_live_updates, name="api_live_updates"),
+
+    # Exportaciones XLSX generadas en la cola
+    path("exportaciones/<int:pk>/", views.export_detail, name="export_detail"),
+    path("exportaciones/<int:pk>/descargar/", views.export_download, name="export_download"),
 ]
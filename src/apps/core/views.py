@@ -1,11 +1,24 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.db import connection
 from django.http import JsonResponse
-from django.shortcuts import render, redirect
+from django.shortcuts import get_object_or_404, render, redirect
 
+from apps.core.counters import counter_totals
+from apps.core.downloads import serve_file
+from apps.core.events import WatcherBusy, last_event_id, watcher
+from apps.core.exports import EXPORT_KEEP_HOURS, XLSX_CONTENT_TYPE
+from apps.core.models import Export, WorkflowEvent
 from apps.core.permissions import is_creator, is_reviewer, is_approver
 from apps.procurement.models import ComparativeQuote
 from apps.payments.models import PaymentOrder
 
+# Long-poll de /api/live-updates/: cuánto espera una respuesta y cuántos esperan a la vez por proceso
+LIVE_UPDATES_TIMEOUT = getattr(settings, "LIVE_UPDATES_TIMEOUT", 25)
+LIVE_UPDATES_MAX_WAITERS = getattr(settings, "LIVE_UPDATES_MAX_WAITERS", 6)
+# Segundos que el navegador espera antes de reintentar si el proceso ya tiene el máximo de esperas
+LIVE_UPDATES_BUSY_RETRY = 5
+
 
 @login_required
 def dashboard(request):
@@ -66,61 +79,41 @@ def _label_and_badge_for_estado(estado: str, *, Status, kind: str, is_rev: bool,
     return ("—", "badge-neutral")
 
 
-@login_required
-def api_pending_counts(request):
-    user = request.user
-    is_rev = is_reviewer(user)
-    is_app = is_approver(user)
+PENDING_ESTADOS = (ComparativeQuote.Status.EN_REVISION, ComparativeQuote.Status.REVISADO)
 
-    cc_pending = 0
-    op_pending = 0
 
+def _pending_counts(user, *, is_rev: bool, is_app: bool) -> dict:
+    # Leemos los contadores denormalizados (O(1) filas), no COUNT(*) sobre los documentos
     if user.is_superuser:
         # superuser: considera pending como "en cola" por flujo (revisión / aprobación)
-        cc_pending = ComparativeQuote.objects.filter(
-            estado__in=[ComparativeQuote.Status.EN_REVISION, ComparativeQuote.Status.REVISADO]
-        ).count()
-        op_pending = PaymentOrder.objects.filter(
-            estado__in=[PaymentOrder.Status.EN_REVISION, PaymentOrder.Status.REVISADO]
-        ).count()
-
+        estados = PENDING_ESTADOS
     elif is_rev and not is_app:
-        cc_pending = ComparativeQuote.objects.filter(estado=ComparativeQuote.Status.EN_REVISION).count()
-        op_pending = PaymentOrder.objects.filter(estado=PaymentOrder.Status.EN_REVISION).count()
-
+        estados = (ComparativeQuote.Status.EN_REVISION,)
     elif is_app and not is_rev:
-        cc_pending = ComparativeQuote.objects.filter(estado=ComparativeQuote.Status.REVISADO).count()
-        op_pending = PaymentOrder.objects.filter(estado=PaymentOrder.Status.REVISADO).count()
-
+        estados = (ComparativeQuote.Status.REVISADO,)
     else:
         # creador (sin rol revisor/aprobador): no mostramos “pendientes” en menú
-        cc_pending = 0
-        op_pending = 0
-
-    return JsonResponse(
-        {"cc_pending": cc_pending, "op_pending": op_pending},
-        json_dumps_params={"ensure_ascii": False},
-    )
+        return {"cc_pending": 0, "op_pending": 0}
 
+    totals = counter_totals(estados=estados)["all"]
+    return {
+        "cc_pending": sum(totals[("CC", e)] for e in estados),
+        "op_pending": sum(totals[("OP", e)] for e in estados),
+    }
 
-@login_required
-def api_live_status(request):
-    kind = (request.GET.get("kind") or "").strip()
-    ids_raw = (request.GET.get("ids") or "").strip()
 
+def _parse_ids(raw: str) -> list:
     ids = []
-    if ids_raw:
-        for part in ids_raw.split(","):
-            part = part.strip()
-            if part.isdigit():
-                ids.append(int(part))
+    for part in (raw or "").split(","):
+        part = part.strip()
+        if part.isdigit():
+            ids.append(int(part))
+    return ids
 
-    if kind not in {"cc", "op"} or not ids:
-        return JsonResponse({"items": []})
 
-    user = request.user
-    is_rev = is_reviewer(user)
-    is_app = is_approver(user)
+def _live_items(user, kind: str, ids, *, is_rev: bool, is_app: bool) -> list:
+    if kind not in {"cc", "op"} or not ids:
+        return []
 
     if kind == "cc":
         Model = ComparativeQuote
@@ -129,7 +122,7 @@ def api_live_status(request):
         Model = PaymentOrder
         Status = PaymentOrder.Status
 
-    qs = Model.objects.filter(id__in=ids)
+    qs = Model.objects.filter(id__in=ids).only("id", "estado", "creado_por_id")
 
     # Respeta visibilidad base: revisor/aprobador no ven BORRADOR ajeno; creador ve lo suyo.
     if not user.is_superuser:
@@ -154,6 +147,27 @@ def api_live_status(request):
                 "badge_class": badge_class,
             }
         )
+    return items
+
+
+@login_required
+def api_pending_counts(request):
+    user = request.user
+    counts = _pending_counts(user, is_rev=is_reviewer(user), is_app=is_approver(user))
+
+    return JsonResponse(
+        counts,
+        json_dumps_params={"ensure_ascii": False},
+    )
+
+
+@login_required
+def api_live_status(request):
+    kind = (request.GET.get("kind") or "").strip()
+    ids = _parse_ids(request.GET.get("ids"))
+
+    user = request.user
+    items = _live_items(user, kind, ids, is_rev=is_reviewer(user), is_app=is_approver(user))
 
     return JsonResponse(
         {"items": items},
@@ -161,6 +175,74 @@ def api_live_status(request):
     )
 
 
+@login_required
+def api_live_updates(request):
+    """
+    Long-poll: el navegador envía el último evento que conoce (?since=N) y los ids
+    visibles en pantalla (?cc=1,2&op=3). La respuesta se demora hasta que exista un
+    evento nuevo (o se cumpla el timeout) y solo entonces se calculan conteos/estados.
+    - Sin "since": sincronización inicial inmediata.
+    - La espera es en memoria (apps.core.events.watcher), sin consultas ni conexión a la BD.
+    - Si el proceso ya tiene LIVE_UPDATES_MAX_WAITERS esperando, responde al instante con
+      retry_after para no ocupar todos los hilos de gunicorn.
+    """
+    raw_since = (request.GET.get("since") or "").strip()
+    since = int(raw_since) if raw_since.isdigit() else None
+    watched = {
+        "cc": set(_parse_ids(request.GET.get("cc"))),
+        "op": set(_parse_ids(request.GET.get("op"))),
+    }
+
+    if since is None:
+        changed = {kind: ids for kind, ids in watched.items()}
+        last_id = last_event_id()
+    else:
+        # El hilo no retiene la conexión mientras espera (se reabre si hay cambios)
+        if not connection.in_atomic_block:
+            connection.close()
+        try:
+            has_events = watcher.wait(since, LIVE_UPDATES_TIMEOUT, max_waiters=LIVE_UPDATES_MAX_WAITERS)
+        except WatcherBusy:
+            return JsonResponse({"last_event": since, "changed": False, "retry_after": LIVE_UPDATES_BUSY_RETRY})
+        events = []
+        if has_events:
+            events = list(
+                WorkflowEvent.objects.filter(id__gt=since)
+                .order_by("id")
+                .values_list("id", "kind", "object_id")
+            )
+
+        if not events:
+            return JsonResponse({"last_event": since, "changed": False})
+
+        last_id = events[-1][0]
+        changed = {"cc": set(), "op": set()}
+        for _, kind, object_id in events:
+            if kind in changed and object_id in watched[kind]:
+                changed[kind].add(object_id)
+
+        # Si el historial se recortó después de "since", no sabemos qué se perdió: resync
+        if events[0][0] > since + 1 and not WorkflowEvent.objects.filter(id__lte=since).exists():
+            changed = {kind: ids for kind, ids in watched.items()}
+
+    user = request.user
+    is_rev = is_reviewer(user)
+    is_app = is_approver(user)
+
+    return JsonResponse(
+        {
+            "last_event": last_id,
+            "changed": True,
+            "counts": _pending_counts(user, is_rev=is_rev, is_app=is_app),
+            "items": {
+                kind: _live_items(user, kind, ids, is_rev=is_rev, is_app=is_app)
+                for kind, ids in changed.items()
+            },
+        },
+        json_dumps_params={"ensure_ascii": False},
+    )
+
+
 @login_required
 def workbench(request):
     user = request.user
@@ -173,7 +255,8 @@ def workbench(request):
     if is_rev:
         pending_cc_review = (
             ComparativeQuote.objects.select_related("creado_por")
-            .prefetch_related("ordenes_pago")
+            # Preferir OP en EN_REVISION (lo que el revisor debe atender)
+            .with_op_queue(PaymentOrder.Status.EN_REVISION)
             .filter(estado=ComparativeQuote.Status.EN_REVISION)
             .order_by("creado_en")
         )
@@ -183,7 +266,8 @@ def workbench(request):
     if is_app:
         pending_cc_approve = (
             ComparativeQuote.objects.select_related("creado_por")
-            .prefetch_related("ordenes_pago")
+            # Preferir OP en REVISADO (lo que el aprobador debe “ver” antes de aprobar en grupo)
+            .with_op_queue(PaymentOrder.Status.REVISADO)
             .filter(estado=ComparativeQuote.Status.REVISADO)
             .order_by("creado_en")
         )
@@ -234,32 +318,27 @@ def workbench(request):
     cc_next_op_review = {}   # {cc_id: op_id}
     cc_next_op_approve = {}  # {cc_id: op_id}
 
+    # (next_op_id viene anotado en SQL; evaluar aquí deja el resultado cacheado para el template)
     if is_rev:
-        for cc in pending_cc_review:
-            ops = list(getattr(cc, "ordenes_pago").all())
-            # Preferir OP en EN_REVISION (lo que el revisor debe atender)
-            ops_pending = [op for op in ops if op.estado == PaymentOrder.Status.EN_REVISION]
-            target = (sorted(ops_pending, key=lambda o: o.id) or sorted(ops, key=lambda o: o.id) or [None])[0]
-            if target:
-                cc_next_op_review[cc.id] = target.id
+        cc_next_op_review = {cc.id: cc.next_op_id for cc in pending_cc_review if cc.next_op_id}
 
     if is_app:
-        for cc in pending_cc_approve:
-            ops = list(getattr(cc, "ordenes_pago").all())
-            # Preferir OP en REVISADO (lo que el aprobador debe “ver” antes de aprobar en grupo)
-            ops_pending = [op for op in ops if op.estado == PaymentOrder.Status.REVISADO]
-            target = (sorted(ops_pending, key=lambda o: o.id) or sorted(ops, key=lambda o: o.id) or [None])[0]
-            if target:
-                cc_next_op_approve[cc.id] = target.id
+        cc_next_op_approve = {cc.id: cc.next_op_id for cc in pending_cc_approve if cc.next_op_id}
+
+    # Conteos desde DocumentCounter (una sola consulta)
+    totals = counter_totals(estados=PENDING_ESTADOS, user=user)
+    all_t, own_t = totals["all"], totals["own"]
+    Status = ComparativeQuote.Status
 
     summary = {
-        "cc_pending_review": pending_cc_review.count() if is_rev else 0,
-        "cc_pending_approve": pending_cc_approve.count() if is_app else 0,
+        "cc_pending_review": all_t[("CC", Status.EN_REVISION)] if is_rev else 0,
+        "cc_pending_approve": all_t[("CC", Status.REVISADO)] if is_app else 0,
+        # OP sueltas: el contador no distingue "sin cuadro", se cuentan directo
         "op_pending_review": pending_op_review.count() if is_rev else 0,
         "op_pending_approve": pending_op_approve.count() if is_app else 0,
-        "my_cc_drafts": my_cc_drafts.count() if is_cre else 0,
-        "my_op_drafts": my_op_drafts.count() if is_cre else 0,
-        "my_rejected": (my_cc_rejected.count() + my_op_rejected.count()) if is_cre else 0,
+        "my_cc_drafts": own_t[("CC", Status.BORRADOR)] if is_cre else 0,
+        "my_op_drafts": own_t[("OP", Status.BORRADOR)] if is_cre else 0,
+        "my_rejected": (own_t[("CC", Status.RECHAZADO)] + own_t[("OP", Status.RECHAZADO)]) if is_cre else 0,
     }
 
     return render(
@@ -289,6 +368,24 @@ def workbench(request):
     )
 
 
+@login_required
+def export_detail(request, pk: int):
+    """Estado de una exportación XLSX; la página se recarga sola mientras se prepara."""
+    export = get_object_or_404(Export, pk=pk, usuario=request.user)
+    return render(request, "core/export_detail.html", {"export": export, "keep_hours": EXPORT_KEEP_HOURS})
+
+
+@login_required
+def export_download(request, pk: int):
+    export = get_object_or_404(Export, pk=pk, usuario=request.user, estado=Export.Status.LISTO)
+    return serve_file(
+        request,
+        export.archivo,
+        filename=export.nombre,
+        content_type=XLSX_CONTENT_TYPE,
+        as_attachment=True,
+    )
+
 
 def home(request):
     """
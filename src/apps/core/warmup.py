@@ -0,0 +1,44 @@
+"""
+Precarga del proceso antes de atender requests (gunicorn preload_app, ver config/gunicorn.conf.py).
+
+Con preload_app el proceso maestro importa la app UNA vez y los workers la heredan al hacer
+fork: lo que se carga aquí (URLconf, vistas, templates compilados en el loader cacheado)
+no se repite en cada worker ni en el primer request de cada uno.
+"""
+import logging
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateSyntaxError, engines
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def _project_templates():
+    for engine in settings.TEMPLATES:
+        for directory in engine.get("DIRS", []):
+            root = Path(directory)
+            for path in sorted(root.rglob("*.html")):
+                yield path.relative_to(root).as_posix()
+
+
+def warm_up() -> int:
+    """Carga URLconf y templates del proyecto. Devuelve cuántos templates se compilaron."""
+    # URLconf: importa todas las vistas y arma los índices de reverse()
+    get_resolver().reverse_dict
+
+    # Templates: sin DEBUG el loader es el cacheado, así que quedan compilados en memoria
+    engine = engines["django"]
+    loaded = 0
+    for name in _project_templates():
+        try:
+            engine.get_template(name)
+            loaded += 1
+        except TemplateSyntaxError:
+            logger.exception("Template con error: %s", name)
+
+    # Ninguna conexión abierta en el maestro puede pasar a los workers
+    connections.close_all()
+    return loaded
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.7 on 2026-10-17 21:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_alter_provider_codigo'),
+        ('payments', '0008_paymentorder_rechazo_and_estado'),
+        ('procurement', '0007_estado_creado_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paymentorder',
+            index=models.Index(fields=['estado', 'creado_en'], name='op_estado_creado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentorder',
+            index=models.Index(fields=['creado_por', 'estado', '-creado_en'], name='op_creador_estado_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.7 on 2026-10-17 21:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_alter_provider_codigo'),
+        ('payments', '0009_estado_creado_indexes'),
+        ('procurement', '0008_keyset_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paymentorder',
+            index=models.Index(fields=['-creado_en', '-id'], name='op_creado_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-17 21:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0010_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentorder',
+            name='render_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
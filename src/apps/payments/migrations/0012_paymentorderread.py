@@ -0,0 +1,28 @@
+# Generated by Django 5.0.7 on 2026-10-17 22:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0011_render_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentOrderRead',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('visto_en', models.DateTimeField(auto_now_add=True)),
+                ('orden', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lecturas', to='payments.paymentorder')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'orden')},
+            },
+        ),
+    ]
@@ -4,10 +4,14 @@ from django.utils import timezone
 from decimal import Decimal
 
 from apps.catalog.models import Provider, Product
+from apps.core.counters import EstadoCounterMixin
+from apps.core.render_cache import RenderVersionMixin
 from apps.procurement.models import ComparativeQuote, next_document_number
 
 
-class PaymentOrder(models.Model):
+class PaymentOrder(EstadoCounterMixin, RenderVersionMixin, models.Model):
+    COUNTER_DOC_TYPE = "OP"
+
     class Status(models.TextChoices):
         BORRADOR = "BORRADOR", "Borrador"
         EN_REVISION = "EN_REVISION", "En revisión"
@@ -83,6 +87,16 @@ class PaymentOrder(models.Model):
     )
     rechazado_en = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Tabs de op_list / bandeja / api: filtro por estado, orden por fecha
+            models.Index(fields=["estado", "creado_en"], name="op_estado_creado_idx"),
+            # "Mis borradores/rechazados" y visibilidad del creador
+            models.Index(fields=["creado_por", "estado", "-creado_en"], name="op_creador_estado_idx"),
+            # Paginación por cursor (creado_en, id) del listado
+            models.Index(fields=["-creado_en", "-id"], name="op_creado_id_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.number:
             self.number = next_document_number("OP")
@@ -106,3 +120,31 @@ class PaymentOrderItem(models.Model):
 
     def __str__(self):
         return f"{self.orden.number} - {self.producto.nombre}"
+
+
+class PaymentOrderReadQuerySet(models.QuerySet):
+    def mark(self, user, op) -> None:
+        """Marca la OP como leída por `user`. Solo escribe la primera vez (INSERT ... ON CONFLICT DO NOTHING)."""
+        self.bulk_create([self.model(user=user, orden=op)], ignore_conflicts=True)
+
+    def seen_ids(self, user, op_ids) -> set:
+        """IDs (de `op_ids`) que `user` ya leyó, en una sola consulta."""
+        return set(self.filter(user=user, orden_id__in=op_ids).values_list("orden_id", flat=True))
+
+
+class PaymentOrderRead(models.Model):
+    """
+    Lectura de una OP por un aprobador (círculo de lectura desde el CC).
+    Antes era una lista en la sesión (cc_seen_ops_<cc_id>) que se reescribía en cada GET.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    orden = models.ForeignKey(PaymentOrder, on_delete=models.CASCADE, related_name="lecturas")
+    visto_en = models.DateTimeField(auto_now_add=True)
+
+    objects = PaymentOrderReadQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ("user", "orden")
+
+    def __str__(self):
+        return f"{self.orden_id} leída por {self.user_id}"
@@ -0,0 +1,22 @@
+from decimal import Decimal
+
+from apps.core.utils import monto_en_letras
+
+
+def op_print_context(op) -> dict:
+    """Contexto de payments/op_print.html (vista de impresión y PDF)."""
+    items = list(op.items.select_related("producto").all())
+
+    total = Decimal("0")
+    for it in items:
+        total += (it.cantidad or Decimal("0")) * (it.precio_unit or Decimal("0"))
+
+    monto_a_pagar = op.monto_manual if op.monto_manual is not None else total
+
+    return {
+        "op": op,
+        "items": items,
+        "total": total,
+        "monto_a_pagar": monto_a_pagar,
+        "monto_letras": monto_en_letras(monto_a_pagar),
+    }
@@ -1,3 +1,61 @@
-from django.test import TestCase
+from django.contrib.auth.models import Group, User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from apps.catalog.models import Provider
+from apps.core.permissions import ROLE_CACHE_ATTR, get_role_names, is_approver
+from apps.procurement.models import ComparativeQuote
+
+from .models import PaymentOrder
+
+STATIC_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+def make_user(username, *groups):
+    user = User.objects.create_user(username, password="x")
+    for name in groups:
+        user.groups.add(Group.objects.get_or_create(name=name)[0])
+    return user
+
+
+@override_settings(STORAGES=STATIC_STORAGES)
+class OpDetailQueryTests(TestCase):
+    def setUp(self):
+        creador = make_user("creador1", "creador")
+        self.cc = ComparativeQuote.objects.create(item_cotizado="X", proyecto="P", expresado_en="Bs", creado_por=creador)
+        self.op = PaymentOrder.objects.create(
+            cuadro=self.cc,
+            proveedor=Provider.objects.create(nombre_empresa="Proveedor SA"),
+            creado_por=creador,
+            estado=PaymentOrder.Status.EN_REVISION,
+        )
+        self.client.force_login(make_user("aprobador1", "aprobador"))
+
+    def get(self):
+        # desde el CC: la vista consulta los roles para la navegación, el permiso y la edición
+        return self.client.get(f"/ordenes/{self.op.pk}/?return_cc={self.cc.pk}")
+
+    def test_roles_are_read_once_per_request(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.get().status_code, 200)
+        self.assertEqual(sum('"auth_group"' in q["sql"] for q in ctx.captured_queries), 1)
+
+    def test_query_count(self):
+        # sesión, usuario, OP, CC, OPs del CC, roles (1), marca de leído, ítems, creador, perfil, proveedor
+        with self.assertNumQueries(11):
+            self.get()
+
+
+class RoleCacheTests(TestCase):
+    def test_group_changes_clear_the_cache(self):
+        user = make_user("u1")
+        self.assertFalse(is_approver(user))
+        self.assertEqual(get_role_names(user), frozenset())
+
+        user.groups.add(Group.objects.create(name="aprobador"))
+        self.assertFalse(hasattr(user, ROLE_CACHE_ATTR))
+        self.assertTrue(is_approver(user))
@@ -3,6 +3,7 @@ from . import views
 
 urlpatterns = [
     path("ordenes/", views.op_list, name="op_list"),
+    path("ordenes/exportar/", views.op_export, name="op_export"),
     path("ordenes/<int:pk>/", views.op_detail, name="op_detail"),
 
     # flujo
@@ -16,6 +17,7 @@ urlpatterns = [
 
     # imprimir
     path("ordenes/<int:pk>/imprimir/", views.op_print, name="op_print"),
+    path("ordenes/<int:pk>/pdf/", views.op_pdf, name="op_pdf"),
 
     # pago complementario (anticipo)
     path(
@@ -8,30 +8,35 @@ from django.http import HttpResponseForbidden, HttpResponseNotAllowed
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 from django.urls import reverse
+from urllib.parse import urlencode
+from apps.core.events import emit_state_change
+from apps.core.exports import CHUNK_SIZE as EXPORT_CHUNK_SIZE, FORMATS as EXPORT_FORMATS
+from apps.core.exports import csv_response, filter_created_range, money, start_xlsx_export
+from apps.core.pagination import keyset_paginate
 from apps.core.permissions import is_reviewer, is_approver
+from apps.core.pdf import pdf_response
+from apps.core.render_cache import cached_render
 from apps.core.utils import monto_en_letras
 
 from .forms import PaymentOrderForm
-from .models import PaymentOrder, PaymentOrderItem
+from .models import PaymentOrder, PaymentOrderItem, PaymentOrderRead
+from .printing import op_print_context
 
-@login_required
-def op_list(request):
-    qs = (
-        PaymentOrder.objects.select_related(
-            "creado_por", "revisado_por", "aprobado_por", "proveedor", "cuadro"
-        )
-        .prefetch_related("items__producto")
-        .order_by("-creado_en")
-    )
+# Estados en los que la OP ya no cambia (salvo superuser): su impresión se cachea
+PRINT_CACHED_OP_STATES = {
+    PaymentOrder.Status.REVISADO,
+    PaymentOrder.Status.APROBADO,
+    PaymentOrder.Status.RECHAZADO,
+}
 
-    is_rev = (request.user.is_superuser or is_reviewer(request.user))
-    is_app = (request.user.is_superuser or is_approver(request.user))
 
+def _filter_op_list(qs, user, params, is_rev: bool, is_app: bool):
+    """Visibilidad y tab (?status=) de op_list; las exportaciones aplican exactamente lo mismo."""
     # Visibilidad:
     # - Superuser: ve todo (incluye borradores de cualquiera)
     # - Revisor/Aprobador: ve todo EXCEPTO borradores ajenos (solo ve sus borradores)
     # - Creador sin rol: ve solo lo suyo
-    if request.user.is_superuser:
+    if user.is_superuser:
         pass
     elif is_rev or is_app:
         qs = qs.filter(
@@ -39,13 +44,13 @@ def op_list(request):
                 PaymentOrder.Status.EN_REVISION,
                 PaymentOrder.Status.REVISADO,
                 PaymentOrder.Status.APROBADO,
-            ]) | Q(creado_por=request.user)
+            ]) | Q(creado_por=user)
         )
     else:
-        qs = qs.filter(creado_por=request.user)
+        qs = qs.filter(creado_por=user)
 
     # Tabs (filtros)
-    status = (request.GET.get("status") or "all").lower()
+    status = (params.get("status") or "all").lower()
 
     if status in ("draft", "borrador"):
         # Para revisor/aprobador esto mostrará SOLO sus borradores (por la regla de visibilidad)
@@ -71,18 +76,102 @@ def op_list(request):
     else:
         status = "all"
 
+    return qs, status
+
+
+@login_required
+def op_list(request):
+    qs = (
+        PaymentOrder.objects.select_related(
+            "creado_por", "revisado_por", "aprobado_por", "proveedor", "cuadro"
+        )
+        .prefetch_related("items__producto")
+    )
+
+    is_rev = (request.user.is_superuser or is_reviewer(request.user))
+    is_app = (request.user.is_superuser or is_approver(request.user))
+
+    qs, status = _filter_op_list(qs, request.user, request.GET, is_rev, is_app)
+
+    # Solo la página actual (cursor sobre creado_en, id)
+    page = keyset_paginate(qs, request)
+
     return render(
         request,
         "payments/op_list.html",
         {
-            "ordenes": qs,
+            "ordenes": page.object_list,
+            "page": page,
             "is_reviewer": is_rev,
             "is_approver": is_app,
             "status": status,
+            "export_xlsx": "xlsx" in EXPORT_FORMATS,
         },
     )
 
 
+OP_EXPORT_HEADER = [
+    "N° OP", "Estado", "N° CC", "Proveedor", "NIT", "Proyecto", "Partida contable", "Fecha solicitud",
+    "Creador", "Aprobado en", "Parcial", "Producto", "Unidad", "Cantidad", "Precio unit.", "Subtotal",
+    "Total OP", "Monto a pagar",
+]
+
+
+def _op_export_rows(qs):
+    """Una fila por ítem de la OP (o una sola si no tiene ítems); total y monto como en la impresión."""
+    for op in qs.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        items = list(op.items.all())
+        total = sum((it.subtotal for it in items), Decimal("0"))
+        monto_a_pagar = op.monto_manual if op.monto_manual is not None else total
+
+        head = [
+            op.number,
+            op.get_estado_display(),
+            op.cuadro.number,
+            op.proveedor.nombre_empresa,
+            op.proveedor.nit,
+            op.proyecto,
+            op.partida_contable,
+            op.fecha_solicitud,
+            op.creado_por.get_full_name() or op.creado_por.username,
+            op.aprobado_en,
+            op.es_parcial,
+        ]
+        lines = [
+            (it.producto.nombre, it.unidad, it.cantidad, it.precio_unit, money(it.subtotal)) for it in items
+        ]
+        for line in lines or [("", "", None, None, None)]:
+            yield head + list(line) + [money(total), money(monto_a_pagar)]
+
+
+def op_export_data(user, params):
+    """(nombre, encabezado, filas) del listado de OP con los permisos y el tab de op_list. ValueError si una fecha es inválida."""
+    is_rev = (user.is_superuser or is_reviewer(user))
+    is_app = (user.is_superuser or is_approver(user))
+
+    qs = PaymentOrder.objects.select_related("creado_por", "proveedor", "cuadro")
+    qs, status = _filter_op_list(qs, user, params, is_rev, is_app)
+    qs = filter_created_range(qs, params)
+
+    qs = qs.prefetch_related("items__producto").order_by("creado_en", "id")
+    filename = f"ordenes_{status}_{timezone.localdate():%Y%m%d}"
+    return filename, OP_EXPORT_HEADER, _op_export_rows(qs)
+
+
+@login_required
+def op_export(request):
+    """Listado de OP en CSV (en streaming) o XLSX (generado en la cola, ver core.exports)."""
+    try:
+        filename, header, rows = op_export_data(request.user, request.GET)
+    except ValueError:
+        messages.error(request, "Fecha inválida: usa AAAA-MM-DD.")
+        return redirect(f"{reverse('op_list')}?{urlencode({'status': request.GET.get('status') or 'all'})}")
+
+    if request.GET.get("formato") == "xlsx" and "xlsx" in EXPORT_FORMATS:
+        return start_xlsx_export(request, "op", filename)
+    return csv_response(filename, header, rows)
+
+
 @login_required
 def op_detail(request, pk: int):
     op = get_object_or_404(PaymentOrder, pk=pk)
@@ -109,23 +198,9 @@ def op_detail(request, pk: int):
             except ValueError:
                 pass
 
-            # ✅ Círculo de lectura (APROBADOR):
-            # Guardamos en sesión una LISTA de OP IDs vistas (compatible con el boolean antiguo).
+            # ✅ Círculo de lectura (APROBADOR): marca persistente (solo escribe la primera vez)
             if (request.user.is_superuser or is_approver(request.user)) and not is_reviewer(request.user):
-                seen_key = f"cc_seen_ops_{return_cc_pk}"
-                seen_val = request.session.get(seen_key, [])
-
-                # compatibilidad: antes era True/False
-                if seen_val is True:
-                    seen_val = []
-                if not isinstance(seen_val, list):
-                    seen_val = []
-
-                if op.id not in seen_val:
-                    seen_val.append(op.id)
-
-                request.session[seen_key] = seen_val
-                request.session.modified = True
+                PaymentOrderRead.objects.mark(request.user, op)
         else:
             # si no coincide, ignoramos navegación
             return_cc_pk = None
@@ -211,22 +286,10 @@ def op_detail(request, pk: int):
             form.save()
             messages.success(request, "Orden de Pago actualizada.")
 
-            # ✅ Si estamos en círculo, mantenemos/actualizamos la marca de lectura
+            # ✅ Si estamos en círculo, mantenemos la marca de lectura
             if return_cc_pk and op.cuadro_id == return_cc_pk:
                 if (request.user.is_superuser or is_approver(request.user)) and not is_reviewer(request.user):
-                    seen_key = f"cc_seen_ops_{return_cc_pk}"
-                    seen_val = request.session.get(seen_key, [])
-
-                    if seen_val is True:
-                        seen_val = []
-                    if not isinstance(seen_val, list):
-                        seen_val = []
-
-                    if op.id not in seen_val:
-                        seen_val.append(op.id)
-
-                    request.session[seen_key] = seen_val
-                    request.session.modified = True
+                    PaymentOrderRead.objects.mark(request.user, op)
 
             # 1) Guardar y enviar a revisión (solo si NO estás en círculo)
             if action == "send_review":
@@ -359,6 +422,7 @@ def op_send_review(request, pk: int):
         "aprobado_por", "aprobado_en",
         "rechazado_por", "rechazado_en",
     ])
+    emit_state_change(op)
 
     messages.success(request, "OP enviada a revisión.")
 
@@ -388,6 +452,7 @@ def op_mark_reviewed(request, pk: int):
     op.revisado_por = request.user
     op.revisado_en = timezone.now()
     op.save(update_fields=["estado", "revisado_por", "revisado_en"])
+    emit_state_change(op)
 
     messages.success(request, "OP marcada como revisada.")
 
@@ -437,6 +502,7 @@ def op_approve(request, pk: int):
     op.aprobado_por = request.user
     op.aprobado_en = timezone.now()
     op.save(update_fields=["estado", "aprobado_por", "aprobado_en"])
+    emit_state_change(op)
 
     messages.success(request, "OP aprobada.")
     return redirect("op_detail", pk=pk)
@@ -468,6 +534,7 @@ def op_back_to_draft(request, pk: int):
     op.aprobado_por = None
     op.aprobado_en = None
     op.save(update_fields=["estado", "revisado_por", "revisado_en", "aprobado_por", "aprobado_en"])
+    emit_state_change(op)
 
     messages.success(request, "OP devuelta a borrador.")
     return redirect("op_detail", pk=pk)
@@ -490,26 +557,31 @@ def op_print(request, pk: int):
     ):
         return HttpResponseForbidden("No tienes permiso para ver esta Orden de Pago.")
 
-    items = list(op.items.select_related("producto").all())
+    def _render():
+        return render(request, "payments/op_print.html", op_print_context(op))
 
-    total = Decimal("0")
-    for it in items:
-        total += (it.cantidad or Decimal("0")) * (it.precio_unit or Decimal("0"))
+    # ✅ OP cerrada: la impresión se sirve desde caché (se invalida con render_version)
+    return cached_render(op, _render, enabled=op.estado in PRINT_CACHED_OP_STATES)
 
-    monto_a_pagar = op.monto_manual if op.monto_manual is not None else total
-    monto_letras = monto_en_letras(monto_a_pagar)
 
-    return render(
-        request,
-        "payments/op_print.html",
-        {
-            "op": op,
-            "items": items,
-            "total": total,
-            "monto_a_pagar": monto_a_pagar,
-            "monto_letras": monto_letras,
-        },
-    )
+@login_required
+def op_pdf(request, pk: int):
+    op = get_object_or_404(PaymentOrder, pk=pk)
+
+    # Mismo permiso que la impresión
+    if not (
+        request.user.is_superuser
+        or is_reviewer(request.user)
+        or is_approver(request.user)
+        or op.creado_por_id == request.user.id
+    ):
+        return HttpResponseForbidden("No tienes permiso para ver esta Orden de Pago.")
+
+    if op.estado != PaymentOrder.Status.APROBADO:
+        messages.error(request, "El PDF solo está disponible para órdenes aprobadas.")
+        return redirect("op_detail", pk=op.pk)
+
+    return pdf_response(request, op)
 
 @login_required
 def op_delete(request, pk: int):
@@ -634,6 +706,7 @@ def op_back_to_review(request, pk):
     op.aprobado_por = None
     op.aprobado_en = None
     op.save(update_fields=["estado", "aprobado_por", "aprobado_en"])
+    emit_state_change(op)
 
     messages.success(request, "OP devuelta a revisión.")
     return redirect("op_detail", pk=op.pk)
@@ -663,6 +736,7 @@ def op_reject(request, pk):
     op.aprobado_por = None
     op.aprobado_en = None
     op.save(update_fields=["estado", "rechazado_por", "rechazado_en", "aprobado_por", "aprobado_en"])
+    emit_state_change(op)
 
     messages.success(request, "OP rechazada.")
     return redirect("op_detail", pk=op.pk)
@@ -1,6 +1,7 @@
 from django import forms
 from .models import ComparativeQuote, ComparativeItem, ComparativeSupplier, ComparativeQuoteAttachment
-from apps.catalog.models import Product
+from apps.catalog.models import Product, Provider
+from apps.catalog.widgets import AutocompleteInput
 
 def _add_control(form: forms.Form):
     for field in form.fields.values():
@@ -11,6 +12,17 @@ def _add_control(form: forms.Form):
         w.attrs["class"] = (existing + " control").strip()
 
 
+def _catalog_label(model, attr):
+    """Texto visible del valor actual de un typeahead: una consulta por pk, solo si hay valor."""
+    def label_for(value):
+        try:
+            entry = model.objects.only(attr).in_bulk([int(value)]).get(int(value))
+        except (TypeError, ValueError):
+            return ""
+        return getattr(entry, attr) if entry else ""
+    return label_for
+
+
 class ComparativeQuoteForm(forms.ModelForm):
     class Meta:
         model = ComparativeQuote
@@ -25,18 +37,34 @@ class ComparativeItemForm(forms.ModelForm):
     class Meta:
         model = ComparativeItem
         fields = ["producto", "unidad", "cantidad"]
+        widgets = {
+            # ✅ Typeahead (api_product_search): no se renderiza el catálogo entero como <option>
+            "producto": AutocompleteInput(
+                "api_product_search",
+                _catalog_label(Product, "nombre"),
+                placeholder="Buscar y seleccionar producto…",
+            ),
+        }
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         _add_control(self)
 
-        # ✅ Solo productos activos
-        self.fields["producto"].queryset = Product.objects.filter(activo=True).order_by("nombre")
+        # ✅ Solo productos activos (la búsqueda también filtra activos; esto valida el POST)
+        self.fields["producto"].queryset = Product.objects.filter(activo=True)
 
 class ComparativeSupplierForm(forms.ModelForm):
     class Meta:
         model = ComparativeSupplier
         fields = ["proveedor", "detalle"]
+        widgets = {
+            # ✅ Typeahead por nombre, NIT o código (api_provider_search)
+            "proveedor": AutocompleteInput(
+                "api_provider_search",
+                _catalog_label(Provider, "nombre_empresa"),
+                placeholder="Buscar proveedor por nombre, NIT o código…",
+            ),
+        }
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
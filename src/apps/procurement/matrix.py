@@ -0,0 +1,149 @@
+"""
+Matriz de comparación de un cuadro (proveedores × productos).
+
+Se carga en 3 consultas (ítems, proveedores, precios) y se recorre UNA sola vez:
+totales por proveedor, celdas faltantes, proveedor más barato por producto y
+cobertura por proveedor. Las vistas (detalle, impresión, envío a revisión,
+generación de OPs, edición de precios) comparten este objeto en vez de rehacer
+los bucles cada una.
+"""
+from decimal import Decimal
+
+
+class ComparisonMatrix:
+    def __init__(self, items, proveedores, price_rows):
+        self.items = items
+        self.proveedores = proveedores
+
+        self._item_idx = {it.producto_id: i for i, it in enumerate(items)}
+        self._prov_idx = {ps.proveedor_id: j for j, ps in enumerate(proveedores)}
+
+        # Precios en un arreglo plano: celda (proveedor j, producto i) -> j * n_items + i
+        n_items = len(items)
+        self._n_items = n_items
+        self._prices = [None] * (len(proveedores) * n_items)
+        for proveedor_id, producto_id, precio_unit in price_rows:
+            i = self._item_idx.get(producto_id)
+            j = self._prov_idx.get(proveedor_id)
+            if i is not None and j is not None:
+                self._prices[j * n_items + i] = precio_unit
+
+        self._compute()
+
+    @classmethod
+    def for_quote(cls, cc):
+        return cls(
+            list(cc.items.select_related("producto").all()),
+            list(cc.proveedores.select_related("proveedor").all()),
+            cc.precios.values_list("proveedor_id", "producto_id", "precio_unit"),
+        )
+
+    def _compute(self):
+        n_items = self._n_items
+        zero = Decimal("0")
+
+        self._subtotals = [None] * len(self._prices)
+        self._totals = [zero] * len(self.proveedores)
+        self._coverage = [0] * len(self.proveedores)
+        self._cheapest = [None] * n_items  # índice del proveedor más barato por producto
+        self._missing = []
+
+        for j in range(len(self.proveedores)):
+            base = j * n_items
+            total = zero
+            priced = 0
+            for i, it in enumerate(self.items):
+                pu = self._prices[base + i]
+                if pu is None:
+                    self._missing.append((j, i))
+                    continue
+                sub = it.cantidad * pu
+                self._subtotals[base + i] = sub
+                total += sub
+                priced += 1
+
+                best = self._cheapest[i]
+                if best is None or pu < self._prices[best * n_items + i]:
+                    self._cheapest[i] = j
+            self._totals[j] = total
+            self._coverage[j] = priced
+
+        self.total_general = sum(self._totals, zero)
+
+    # =========================
+    # Consultas puntuales
+    # =========================
+    def price(self, proveedor_id, producto_id):
+        i = self._item_idx.get(producto_id)
+        j = self._prov_idx.get(proveedor_id)
+        if i is None or j is None:
+            return None
+        return self._prices[j * self._n_items + i]
+
+    @property
+    def is_complete(self) -> bool:
+        return bool(self.items) and bool(self.proveedores) and not self._missing
+
+    @property
+    def missing(self) -> list:
+        """Celdas sin precio: [(ComparativeSupplier, ComparativeItem)]"""
+        return [(self.proveedores[j], self.items[i]) for j, i in self._missing]
+
+    @property
+    def totals(self) -> dict:
+        """{proveedor_id: total}"""
+        return {ps.proveedor_id: self._totals[j] for j, ps in enumerate(self.proveedores)}
+
+    @property
+    def supplier_totals(self) -> list:
+        """[(ComparativeSupplier, total)] en el orden de las columnas."""
+        return list(zip(self.proveedores, self._totals))
+
+    @property
+    def cheapest_by_item(self) -> dict:
+        """{producto_id: ComparativeSupplier | None}"""
+        return {
+            it.producto_id: (self.proveedores[j] if j is not None else None)
+            for it, j in zip(self.items, self._cheapest)
+        }
+
+    @property
+    def coverage(self) -> dict:
+        """{proveedor_id: productos con precio}"""
+        return {ps.proveedor_id: self._coverage[j] for j, ps in enumerate(self.proveedores)}
+
+    # =========================
+    # Estructuras para templates
+    # =========================
+    def rows(self) -> list:
+        """Una fila por producto con sus celdas en el orden de los proveedores."""
+        n_items = self._n_items
+        return [
+            {
+                "item": it,
+                "celdas": [
+                    {
+                        "proveedor_id": ps.proveedor_id,
+                        "precio_unit": self._prices[j * n_items + i],
+                        "subtotal": self._subtotals[j * n_items + i],
+                        "es_minimo": self._cheapest[i] == j,
+                    }
+                    for j, ps in enumerate(self.proveedores)
+                ],
+            }
+            for i, it in enumerate(self.items)
+        ]
+
+    def by_supplier(self) -> list:
+        """Un bloque por proveedor con sus celdas en el orden de los productos."""
+        n_items = self._n_items
+        return [
+            {
+                "proveedor": ps,
+                "celdas": [
+                    {"item": it, "precio_unit": self._prices[j * n_items + i]}
+                    for i, it in enumerate(self.items)
+                ],
+            }
+            for j, ps in enumerate(self.proveedores)
+        ]
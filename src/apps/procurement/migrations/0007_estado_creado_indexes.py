@@ -0,0 +1,28 @@
+# Generated by Django 5.0.7 on 2026-10-17 21:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurement', '0006_add_rechazo_fields'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comparativequote',
+            name='estado',
+            field=models.CharField(choices=[('BORRADOR', 'Borrador'), ('EN_REVISION', 'En revisión'), ('REVISADO', 'Revisado'), ('APROBADO', 'Aprobado'), ('RECHAZADO', 'Rechazado')], default='BORRADOR', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='comparativequote',
+            index=models.Index(fields=['estado', 'creado_en'], name='cc_estado_creado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comparativequote',
+            index=models.Index(fields=['creado_por', 'estado', '-creado_en'], name='cc_creador_estado_idx'),
+        ),
+    ]
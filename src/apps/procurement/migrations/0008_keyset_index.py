@@ -0,0 +1,19 @@
+# Generated by Django 5.0.7 on 2026-10-17 21:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurement', '0007_estado_creado_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comparativequote',
+            index=models.Index(fields=['-creado_en', '-id'], name='cc_creado_id_idx'),
+        ),
+    ]
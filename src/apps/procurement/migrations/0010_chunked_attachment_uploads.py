@@ -0,0 +1,54 @@
+# Generated by Django 5.0.7 on 2026-10-17 22:15
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def backfill_tamano(apps, schema_editor):
+    # Para la cuota por CC: tamaño de los adjuntos que ya existen
+    Attachment = apps.get_model("procurement", "ComparativeQuoteAttachment")
+    for att in Attachment.objects.filter(tamano__isnull=True).only("id", "archivo").iterator():
+        try:
+            size = default_storage.size(att.archivo.name)
+        except OSError:
+            continue
+        Attachment.objects.filter(pk=att.pk).update(tamano=size)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurement', '0009_render_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comparativequoteattachment',
+            name='sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='comparativequoteattachment',
+            name='tamano',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ComparativeAttachmentUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nombre', models.CharField(max_length=255)),
+                ('tamano', models.BigIntegerField()),
+                ('recibido', models.BigIntegerField(default=0)),
+                ('archivo_parcial', models.CharField(max_length=255)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('cuadro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subidas', to='procurement.comparativequote')),
+                ('subido_por', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(backfill_tamano, migrations.RunPython.noop),
+    ]
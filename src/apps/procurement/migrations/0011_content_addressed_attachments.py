@@ -0,0 +1,72 @@
+# Generated by Django 5.0.7 on 2026-10-17 22:22
+
+import hashlib
+import os
+
+import apps.procurement.models
+from django.conf import settings
+from django.db import migrations, models, transaction
+
+
+def deduplicate_files(apps, schema_editor):
+    """
+    Pasa los adjuntos existentes a nombres por contenido: un archivo por SHA-256.
+    Los archivos viejos se borran recién tras el commit de la migración.
+    """
+    Attachment = apps.get_model("procurement", "ComparativeQuoteAttachment")
+    storage = Attachment._meta.get_field("archivo").storage
+    old_paths = set()
+
+    for att in Attachment.objects.only("id", "archivo", "sha256", "tamano").iterator():
+        name = att.archivo.name
+        if not name or name.startswith(storage.prefix + "/"):
+            continue
+        path = storage.path(name)
+        if not os.path.exists(path):
+            continue
+
+        sha256 = att.sha256
+        if not sha256:
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+            sha256 = digest.hexdigest()
+
+        Attachment.objects.filter(pk=att.pk).update(
+            archivo=storage.adopt(path, sha256),
+            sha256=sha256,
+            tamano=att.tamano if att.tamano is not None else os.path.getsize(path),
+        )
+        old_paths.add(path)
+
+    def _remove_old():
+        for path in old_paths:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    transaction.on_commit(_remove_old, using=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurement', '0010_chunked_attachment_uploads'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comparativequoteattachment',
+            name='archivo',
+            field=models.FileField(max_length=255, storage=apps.procurement.models.attachment_storage, upload_to='cc_cotizaciones/'),
+        ),
+        migrations.AddIndex(
+            model_name='comparativequoteattachment',
+            index=models.Index(fields=['archivo'], name='cc_adjunto_archivo_idx'),
+        ),
+        # los nombres viejos siguen siendo válidos: no hace falta revertir los archivos
+        migrations.RunPython(deduplicate_files, migrations.RunPython.noop),
+    ]
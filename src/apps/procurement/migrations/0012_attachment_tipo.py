@@ -0,0 +1,35 @@
+# Generated by Django 5.0.7 on 2026-10-17 22:41
+
+from django.db import migrations, models
+
+from apps.procurement.uploads import HEAD_SIZE, sniff_type
+
+
+def detect_types(apps, schema_editor):
+    """Tipo de los adjuntos existentes según sus primeros bytes (sin firma conocida queda vacío)."""
+    Attachment = apps.get_model("procurement", "ComparativeQuoteAttachment")
+    storage = Attachment._meta.get_field("archivo").storage
+    for att in Attachment.objects.only("id", "archivo").iterator():
+        try:
+            with open(storage.path(att.archivo.name), "rb") as f:
+                kind = sniff_type(f.read(HEAD_SIZE))
+        except (FileNotFoundError, IsADirectoryError, ValueError):
+            continue
+        if kind:
+            Attachment.objects.filter(pk=att.pk).update(tipo=kind)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurement', '0011_content_addressed_attachments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comparativequoteattachment',
+            name='tipo',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+        migrations.RunPython(detect_types, migrations.RunPython.noop),
+    ]
@@ -1,25 +1,61 @@
-from django.db import models, transaction
+import uuid
+
+from django.db import models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.conf import settings
-from django.utils import timezone
 
-from apps.core.models import DocumentSequence
+from apps.core.counters import EstadoCounterMixin
+from apps.core.render_cache import RenderVersionMixin
+from apps.core.storage import ContentAddressedStorage
+from apps.core import sequences
 from apps.catalog.models import Provider, Product
 
 
+def next_document_numbers(doc_type: str, count: int) -> list:
+    """
+    Reserva `count` números consecutivos de una vez.
+    (modo bloqueado o por rangos/pool según settings; ver apps.core.sequences)
+    """
+    return sequences.next_document_numbers(doc_type, count)
+
+
 def next_document_number(doc_type: str) -> str:
-    year = timezone.now().year
-    with transaction.atomic():
-        seq, _ = DocumentSequence.objects.select_for_update().get_or_create(
-            doc_type=doc_type,
-            year=year,
-            defaults={"last_number": 0},
+    return next_document_numbers(doc_type, 1)[0]
+
+
+class ComparativeQuoteQuerySet(models.QuerySet):
+    def with_op_queue(self, prefer_estado=None):
+        """
+        Anota la "cola de trabajo" de OPs de cada CC, todo en SQL:
+        - ops_total / ops_reviewed_count / ops_pending_count
+        - next_op_id: primera OP (por id) en `prefer_estado`; si no hay, la primera OP.
+        """
+        PaymentOrder = self.model._meta.get_field("ordenes_pago").related_model
+        Status = PaymentOrder.Status
+
+        ops = PaymentOrder.objects.filter(cuadro=OuterRef("pk")).order_by("id").values("id")
+        next_op = Subquery(ops[:1])
+        if prefer_estado:
+            next_op = Coalesce(Subquery(ops.filter(estado=prefer_estado)[:1]), next_op)
+
+        # Conteos como subconsultas por fila (índice cuadro_id), no JOIN + GROUP BY: así el listado
+        # sigue el índice (creado_en, id) y se detiene en la página, sin agrupar todos los CCs visibles
+        def count_ops(*filters):
+            counted = ops.filter(*filters).order_by().values("cuadro").annotate(n=Count("id")).values("n")
+            return Coalesce(Subquery(counted, output_field=models.IntegerField()), 0)
+
+        return self.annotate(
+            ops_total=count_ops(),
+            ops_reviewed_count=count_ops(Q(estado=Status.REVISADO)),
+            ops_pending_count=count_ops(Q(estado=Status.EN_REVISION)),
+            next_op_id=next_op,
         )
-        seq.last_number += 1
-        seq.save()
-        return f"{doc_type}-{year}-{seq.last_number:06d}"
 
 
-class ComparativeQuote(models.Model):
+class ComparativeQuote(EstadoCounterMixin, RenderVersionMixin, models.Model):
+    COUNTER_DOC_TYPE = "CC"
+
     number = models.CharField(max_length=20, unique=True, blank=True)
     item_cotizado = models.CharField(max_length=200)
     proyecto = models.CharField(max_length=200)
@@ -81,6 +117,18 @@ class ComparativeQuote(models.Model):
 
     motivo_seleccion = models.TextField(blank=True)
 
+    objects = ComparativeQuoteQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Tabs de cc_list / bandeja / api: filtro por estado, orden por fecha
+            models.Index(fields=["estado", "creado_en"], name="cc_estado_creado_idx"),
+            # "Mis borradores/rechazados" y visibilidad del creador
+            models.Index(fields=["creado_por", "estado", "-creado_en"], name="cc_creador_estado_idx"),
+            # Paginación por cursor (creado_en, id) del listado
+            models.Index(fields=["-creado_en", "-id"], name="cc_creado_id_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.number:
             self.number = next_document_number("CC")
@@ -128,6 +176,11 @@ class ComparativePrice(models.Model):
         return f"{self.cuadro.number} - {self.proveedor} - {self.producto}"
 
 
+def attachment_storage():
+    # Adjuntos guardados por contenido: el mismo PDF en varios CC ocupa un solo archivo
+    return ContentAddressedStorage(prefix="cc_cotizaciones/sha256")
+
+
 class ComparativeQuoteAttachment(models.Model):
     """
     Adjuntos (cotizaciones) del Cuadro Comparativo.
@@ -139,7 +192,8 @@ class ComparativeQuoteAttachment(models.Model):
         on_delete=models.CASCADE,
         related_name="adjuntos",
     )
-    archivo = models.FileField(upload_to="cc_cotizaciones/%Y/%m/%d/")
+    # Nombre por contenido (cc_cotizaciones/sha256/ab/cd/<sha256>); el original va en `nombre`
+    archivo = models.FileField(upload_to="cc_cotizaciones/", storage=attachment_storage, max_length=255)
     nombre = models.CharField(max_length=255, blank=True)
 
     subido_por = models.ForeignKey(
@@ -149,6 +203,18 @@ class ComparativeQuoteAttachment(models.Model):
     )
     subido_en = models.DateTimeField(auto_now_add=True)
 
+    # Tamaño (bytes) y SHA-256 del contenido, calculados al subir (ver apps.procurement.uploads)
+    tamano = models.BigIntegerField(null=True, blank=True)
+    sha256 = models.CharField(max_length=64, blank=True)
+    # Tipo detectado por la firma del contenido (pdf, png, zip...): decide el Content-Type al descargar
+    tipo = models.CharField(max_length=10, blank=True)
+
+    class Meta:
+        indexes = [
+            # referencias a un mismo archivo (ver attachment_storage / release_attachment_file)
+            models.Index(fields=["archivo"], name="cc_adjunto_archivo_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.nombre and self.archivo:
             self.nombre = (getattr(self.archivo, "name", "") or "").split("/")[-1]
@@ -156,3 +222,30 @@ class ComparativeQuoteAttachment(models.Model):
 
     def __str__(self):
         return f"{self.cuadro.number} - {self.nombre or 'adjunto'}"
+
+
+def release_attachment_file(name: str) -> bool:
+    """Borra el archivo del adjunto si ninguna otra fila lo usa (se llama tras borrar la fila)."""
+    return ComparativeQuoteAttachment._meta.get_field("archivo").storage.release(
+        name, lambda n: ComparativeQuoteAttachment.objects.filter(archivo=n).exists()
+    )
+
+
+class ComparativeAttachmentUpload(models.Model):
+    """
+    Subida por partes (reanudable) de un adjunto del CC, en curso.
+    Las partes se escriben directo en MEDIA (archivo_parcial); al completarse se crea el
+    ComparativeQuoteAttachment y esta fila se borra. Ver apps.procurement.uploads.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    cuadro = models.ForeignKey(ComparativeQuote, on_delete=models.CASCADE, related_name="subidas")
+    subido_por = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    nombre = models.CharField(max_length=255)
+    tamano = models.BigIntegerField()
+    recibido = models.BigIntegerField(default=0)
+    archivo_parcial = models.CharField(max_length=255)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.nombre} ({self.recibido}/{self.tamano})"
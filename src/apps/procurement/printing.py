@@ -0,0 +1,14 @@
+from .matrix import ComparisonMatrix
+
+
+def cc_print_context(cc) -> dict:
+    """Contexto de procurement/cc_print.html (vista de impresión y PDF)."""
+    matrix = ComparisonMatrix.for_quote(cc)
+    return {
+        "cc": cc,
+        "items": matrix.items,
+        "proveedores": matrix.proveedores,
+        "matriz": matrix.rows(),
+        "totales_proveedores": matrix.supplier_totals,
+        "total_general": matrix.total_general,
+    }
@@ -1,3 +1,437 @@
-from django.test import TestCase
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import Group, User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from apps.core.storage import ContentAddressedStorage, blob_lock
+
+from . import uploads
+from .models import (
+    ComparativeAttachmentUpload,
+    ComparativeQuote,
+    ComparativeQuoteAttachment,
+    release_attachment_file,
+)
+
+
+class MediaRootMixin:
+    """MEDIA_ROOT en un directorio temporal por clase."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._media_root = tempfile.mkdtemp()
+        cls._media_override = override_settings(MEDIA_ROOT=cls._media_root)
+        cls._media_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._media_override.disable()
+        shutil.rmtree(cls._media_root, ignore_errors=True)
+
+
+class MediaTestCase(MediaRootMixin, TestCase):
+    pass
+
+
+# Páginas completas sin collectstatic (el manifest solo existe en el build)
+STATIC_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+def group_queries(ctx):
+    return [q["sql"] for q in ctx.captured_queries if '"auth_group"' in q["sql"]]
+
+
+def make_user(username, *groups):
+    user = User.objects.create_user(username, password="x")
+    for name in groups:
+        user.groups.add(Group.objects.get_or_create(name=name)[0])
+    return user
+
+
+class AttachmentDownloadTests(MediaTestCase):
+    def setUp(self):
+        self.creador = make_user("creador1", "creador")
+        self.cc = ComparativeQuote.objects.create(
+            item_cotizado="Cemento", proyecto="P", expresado_en="Bs", creado_por=self.creador
+        )
+        self.client.force_login(self.creador)
+
+    def upload(self, name, content):
+        self.client.post(
+            f"/cuadros/{self.cc.pk}/adjuntos/upload/",
+            {"archivo": SimpleUploadedFile(name, content)},
+        )
+        return ComparativeQuoteAttachment.objects.filter(cuadro=self.cc).latest("id")
+
+    def download(self, att, client=None):
+        return (client or self.client).get(f"/cuadros/{self.cc.pk}/adjuntos/{att.pk}/")
+
+    def test_content_type_comes_from_sniffed_type_not_from_name(self):
+        att = self.upload("x.html", b"%PDF-1.4\n<html><script>alert(document.cookie)</script></html>")
+        self.assertEqual(att.tipo, "pdf")
+
+        r = self.download(att)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r["Content-Type"], "application/pdf")
+        self.assertEqual(r["Content-Security-Policy"], "sandbox")
+        self.assertEqual(r["X-Content-Type-Options"], "nosniff")
+
+    def test_non_inline_types_are_always_downloaded(self):
+        att = self.upload("cotizacion.pdf", b"PK\x03\x04" + b"\0" * 40)
+        self.assertEqual(att.tipo, "zip")
+
+        r = self.download(att)
+        self.assertEqual(r["Content-Type"], "application/zip")
+        self.assertTrue(r["Content-Disposition"].startswith("attachment"))
+
+    def test_attachment_without_type_is_octet_stream(self):
+        att = self.upload("foto.png", b"\x89PNG\r\n\x1a\n" + b"1" * 40)
+        ComparativeQuoteAttachment.objects.filter(pk=att.pk).update(tipo="")
+
+        r = self.download(att)
+        self.assertEqual(r["Content-Type"], "application/octet-stream")
+        self.assertTrue(r["Content-Disposition"].startswith("attachment"))
+
+    def test_images_and_pdfs_are_inline(self):
+        att = self.upload("foto.html", b"\x89PNG\r\n\x1a\n" + b"1" * 40)
+        r = self.download(att)
+        self.assertEqual(r["Content-Type"], "image/png")
+        self.assertTrue(r["Content-Disposition"].startswith("inline"))
+
+    def test_same_read_permissions_as_cc_detail(self):
+        att = self.upload("a.pdf", b"%PDF-1.4\n")
+        other = self.client_class()
+        other.force_login(make_user("otro"))
+        reviewer = self.client_class()
+        reviewer.force_login(make_user("revisor1", "revisor"))
+
+        # borrador ajeno: vuelve al listado
+        self.assertRedirects(self.download(att, other), "/cuadros/", fetch_redirect_response=False)
+        self.assertRedirects(self.download(att, reviewer), "/cuadros/", fetch_redirect_response=False)
+
+        ComparativeQuote.objects.filter(pk=self.cc.pk).update(estado=ComparativeQuote.Status.EN_REVISION)
+        self.assertEqual(self.download(att, other).status_code, 403)
+        self.assertEqual(self.download(att, reviewer).status_code, 200)
+        self.assertEqual(other.get(f"/cuadros/{self.cc.pk}/").status_code, 403)
+
+
+@override_settings(STORAGES=STATIC_STORAGES)
+class CcDetailQueryTests(TestCase):
+    def setUp(self):
+        self.creador = make_user("creador1", "creador")
+        self.cc = ComparativeQuote.objects.create(
+            item_cotizado="Cemento", proyecto="P", expresado_en="Bs", creado_por=self.creador,
+            estado=ComparativeQuote.Status.EN_REVISION,
+        )
+        # revisor y aprobador a la vez: la vista y la plantilla preguntan por ambos roles varias veces
+        self.client.force_login(make_user("revisor1", "revisor", "aprobador"))
+
+    def get(self):
+        return self.client.get(f"/cuadros/{self.cc.pk}/")
+
+    def test_roles_are_read_once_per_request(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.get().status_code, 200)
+        self.assertEqual(len(group_queries(ctx)), 1)
+
+    def test_query_count(self):
+        # sesión, usuario, CC, roles (1), ítems, proveedores, precios, adjuntos, OPs (2), creador
+        with self.assertNumQueries(11):
+            self.get()
+
+
+class ChunkedUploadTests(MediaTestCase):
+    data = b"%PDF-1.4\n" + b"0123456789" * 5
+
+    def setUp(self):
+        self.creador = make_user("creador1", "creador")
+        self.cc = ComparativeQuote.objects.create(item_cotizado="X", proyecto="P", expresado_en="Bs", creado_por=self.creador)
+        self.client.force_login(self.creador)
+
+    def start(self, size=None, nombre="cot.pdf"):
+        return self.client.post(
+            f"/cuadros/{self.cc.pk}/adjuntos/subidas/",
+            {"nombre": nombre, "tamano": len(self.data) if size is None else size},
+        )
+
+    def put(self, url, offset, chunk):
+        return self.client.put(url, chunk, content_type="application/octet-stream", HTTP_UPLOAD_OFFSET=str(offset))
+
+    def test_resume_from_the_server_offset(self):
+        state = self.start().json()
+        url = state["url"]
+        self.assertEqual(state["offset"], 0)
+
+        self.assertEqual(self.put(url, 0, self.data[:20]).json()["offset"], 20)
+        # el cliente perdió la respuesta y reenvía desde un offset viejo
+        r = self.put(url, 10, self.data[10:30])
+        self.assertEqual(r.status_code, 409)
+        self.assertEqual(r.json()["offset"], 20)
+
+        offset = self.client.get(url).json()["offset"]
+        self.assertEqual(self.put(url, offset, self.data[offset:40]).json()["offset"], 40)
+        done = self.put(url, 40, self.data[40:]).json()
+
+        self.assertTrue(done["done"])
+        att = ComparativeQuoteAttachment.objects.get(pk=done["attachment_id"])
+        self.assertEqual((att.nombre, att.tamano, att.tipo), ("cot.pdf", len(self.data), "pdf"))
+        self.assertEqual(att.sha256, hashlib.sha256(self.data).hexdigest())
+        with att.archivo.open("rb") as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertFalse(ComparativeAttachmentUpload.objects.exists())
+
+    def test_partial_is_removed_only_after_commit(self):
+        url = self.start().json()["url"]
+        partial = os.path.join(self._media_root, ComparativeAttachmentUpload.objects.get().archivo_parcial)
+        self.put(url, 0, self.data[:30])
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.put(url, 30, self.data[30:])
+            self.assertTrue(os.path.exists(partial))
+        for callback in callbacks:
+            callback()
+        self.assertFalse(os.path.exists(partial))
+
+    def test_failed_attachment_insert_keeps_the_upload_resumable(self):
+        url = self.start().json()["url"]
+        partial = os.path.join(self._media_root, ComparativeAttachmentUpload.objects.get().archivo_parcial)
+        self.put(url, 0, self.data[:30])
+
+        with mock.patch.object(ComparativeQuoteAttachment.objects, "create", side_effect=DatabaseError("caída")):
+            with self.assertRaises(DatabaseError), self.captureOnCommitCallbacks(execute=True):
+                self.put(url, 30, self.data[30:])
+
+        self.assertTrue(os.path.exists(partial))
+        self.assertEqual(self.client.get(url).json()["offset"], 30)
+        self.assertTrue(self.put(url, 30, self.data[30:]).json()["done"])
+
+    def test_resume_in_another_process_rebuilds_the_hash(self):
+        url = self.start().json()["url"]
+        self.put(url, 0, self.data[:25])
+        uploads._hashers.clear()  # la siguiente parte llega a otro proceso
+        done = self.put(url, 25, self.data[25:]).json()
+        att = ComparativeQuoteAttachment.objects.get(pk=done["attachment_id"])
+        self.assertEqual(att.sha256, hashlib.sha256(self.data).hexdigest())
+
+    def test_disallowed_type_is_rejected_with_the_first_chunk(self):
+        url = self.start(nombre="cot.pdf").json()["url"]
+        upload = ComparativeAttachmentUpload.objects.get()
+        partial = os.path.join(self._media_root, upload.archivo_parcial)
+
+        r = self.put(url, 0, b"<html><script>alert(1)</script>" + b" " * 28)
+
+        self.assertEqual(r.status_code, 415)
+        self.assertFalse(ComparativeAttachmentUpload.objects.exists())
+        self.assertFalse(os.path.exists(partial))
+
+    def test_quota_is_checked_before_receiving_bytes(self):
+        with mock.patch.object(uploads, "MAX_CC_SIZE", 100):
+            self.assertEqual(self.start(size=60).status_code, 201)
+            # la subida en curso ya reserva su tamaño
+            r = self.start(size=60)
+        self.assertEqual(r.status_code, 413)
+        self.assertEqual(ComparativeAttachmentUpload.objects.count(), 1)
+
+    def test_chunk_larger_than_declared_size_is_rejected(self):
+        url = self.start(size=10).json()["url"]
+        self.assertEqual(self.put(url, 0, self.data[:20]).status_code, 400)
+
+
+class ClassicUploadTests(MediaTestCase):
+    def setUp(self):
+        self.creador = make_user("creador1", "creador")
+        self.cc = ComparativeQuote.objects.create(item_cotizado="X", proyecto="P", expresado_en="Bs", creado_por=self.creador)
+        self.client.force_login(self.creador)
+
+    def upload(self, content):
+        return self.client.post(
+            f"/cuadros/{self.cc.pk}/adjuntos/upload/",
+            {"archivo": SimpleUploadedFile("cot.pdf", content)},
+        )
+
+    def test_quota_is_checked_under_the_cc_lock(self):
+        with mock.patch.object(uploads, "lock_for_quota", wraps=uploads.lock_for_quota) as lock:
+            self.upload(b"%PDF-1.4\nuno")
+        lock.assert_called_once_with(self.cc)
+
+    def test_uploads_in_progress_count_against_the_quota(self):
+        ComparativeAttachmentUpload.objects.create(
+            cuadro=self.cc, subido_por=self.creador, nombre="grande.pdf", tamano=90, archivo_parcial="x.part"
+        )
+        with mock.patch.object(uploads, "MAX_CC_SIZE", 100):
+            self.upload(b"%PDF-1.4\n" + b"x" * 20)
+        self.assertFalse(ComparativeQuoteAttachment.objects.exists())
+
+
+def attachment_storage():
+    return ComparativeQuoteAttachment._meta.get_field("archivo").storage
+
+
+@mock.patch.object(ContentAddressedStorage, "RELEASE_GRACE_SECONDS", 0)
+class SharedBlobTests(MediaTestCase):
+    data = b"%PDF-1.4\ncotizacion compartida"
+
+    def setUp(self):
+        self.creador = make_user("creador1", "creador")
+        self.client.force_login(self.creador)
+        self.cc1 = self.make_cc()
+        self.cc2 = self.make_cc()
+
+    def make_cc(self):
+        return ComparativeQuote.objects.create(item_cotizado="X", proyecto="P", expresado_en="Bs", creado_por=self.creador)
+
+    def upload(self, cc, name="cot.pdf", content=None):
+        self.client.post(
+            f"/cuadros/{cc.pk}/adjuntos/upload/",
+            {"archivo": SimpleUploadedFile(name, content or self.data)},
+        )
+        return ComparativeQuoteAttachment.objects.filter(cuadro=cc).latest("id")
+
+    def test_same_content_is_stored_once(self):
+        a1 = self.upload(self.cc1, "a.pdf")
+        a2 = self.upload(self.cc2, "b.pdf")
+        sha = hashlib.sha256(self.data).hexdigest()
+
+        self.assertEqual(a1.archivo.name, a2.archivo.name)
+        self.assertEqual(a1.archivo.name, attachment_storage().blob_name(sha))
+        self.assertEqual((a1.nombre, a2.nombre), ("a.pdf", "b.pdf"))
+
+    def test_shared_blob_survives_until_last_reference(self):
+        a1 = self.upload(self.cc1)
+        a2 = self.upload(self.cc2)
+        path = a1.archivo.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/cuadros/{self.cc1.pk}/adjuntos/{a1.pk}/eliminar/")
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/cuadros/{self.cc2.pk}/adjuntos/{a2.pk}/eliminar/")
+        self.assertFalse(os.path.exists(path))
+
+    def test_cc_cascade_delete_releases_only_unshared_blobs(self):
+        shared = self.upload(self.cc1)
+        self.upload(self.cc1, "copia.pdf")
+        own = self.upload(self.cc1, "propio.png", b"\x89PNG\r\n\x1a\n" + b"2" * 20)
+        self.upload(self.cc2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cc1.delete()
+
+        self.assertTrue(os.path.exists(shared.archivo.path))
+        self.assertFalse(os.path.exists(own.archivo.path))
+        self.assertEqual(ComparativeQuoteAttachment.objects.filter(archivo=shared.archivo.name).count(), 1)
+
+    def test_recently_adopted_blob_is_kept(self):
+        a1 = self.upload(self.cc1)
+        ComparativeQuoteAttachment.objects.filter(pk=a1.pk).delete()
+        with mock.patch.object(ContentAddressedStorage, "RELEASE_GRACE_SECONDS", 300):
+            self.assertFalse(release_attachment_file(a1.archivo.name))
+        self.assertTrue(os.path.exists(a1.archivo.path))
+
+
+class BlobLockTests(MediaRootMixin, TransactionTestCase):
+    @skipUnless(connection.vendor == "postgresql", "pg_advisory_xact_lock solo en PostgreSQL")
+    @mock.patch.object(ContentAddressedStorage, "RELEASE_GRACE_SECONDS", 0)
+    def test_release_waits_for_the_adopting_transaction(self):
+        user = make_user("creador1")
+        cc = ComparativeQuote.objects.create(item_cotizado="X", proyecto="P", expresado_en="Bs", creado_por=user)
+        storage = attachment_storage()
+        data = b"%PDF-1.4\ncarrera"
+        sha = hashlib.sha256(data).hexdigest()
+        name = storage.blob_name(sha)
+        # el blob existe sin filas (como justo después de borrar su último adjunto)
+        storage.save("x.pdf", SimpleUploadedFile("x.pdf", data))
+        source = os.path.join(self._media_root, "fuente.pdf")
+        with open(source, "wb") as f:
+            f.write(data)
+
+        adopted = threading.Event()
+
+        def adopter():
+            try:
+                with transaction.atomic(), blob_lock(name):
+                    storage.adopt(source, sha)
+                    adopted.set()
+                    time.sleep(0.5)
+                    ComparativeQuoteAttachment.objects.create(cuadro=cc, subido_por=user, archivo=name, sha256=sha)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=adopter)
+        thread.start()
+        adopted.wait(5)
+        released = release_attachment_file(name)
+        thread.join()
+
+        self.assertFalse(released)
+        self.assertTrue(os.path.exists(storage.path(name)))
+
+
+class ContentAddressedMigrationTests(MediaRootMixin, TransactionTestCase):
+    before = [("procurement", "0010_chunked_attachment_uploads")]
+    after = [("procurement", "0011_content_addressed_attachments")]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def write(self, name, content):
+        path = os.path.join(self._media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_duplicate_files_are_merged(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        old_apps = executor.loader.project_state(self.before).apps
+        User_ = old_apps.get_model("auth", "User")
+        Quote = old_apps.get_model("procurement", "ComparativeQuote")
+        Attachment = old_apps.get_model("procurement", "ComparativeQuoteAttachment")
+
+        user = User_.objects.create(username="creador1")
+        cc = Quote.objects.create(number="CC-T-1", item_cotizado="X", proyecto="P", creado_por=user)
+        same = b"%PDF-1.4\nduplicado"
+        other = b"%PDF-1.4\notro"
+        paths = [
+            self.write("cc_cotizaciones/2025/01/a.pdf", same),
+            self.write("cc_cotizaciones/2025/02/b.pdf", same),
+            self.write("cc_cotizaciones/2025/02/c.pdf", other),
+        ]
+        for path in paths:
+            Attachment.objects.create(
+                cuadro=cc, subido_por=user, archivo=os.path.relpath(path, self._media_root), nombre=os.path.basename(path)
+            )
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nombre, archivo, sha256, tamano FROM procurement_comparativequoteattachment")
+            rows = {nombre: (archivo, sha, size) for nombre, archivo, sha, size in cursor.fetchall()}
+        sha = hashlib.sha256(same).hexdigest()
+        self.assertEqual(rows["a.pdf"], (f"cc_cotizaciones/sha256/{sha[:2]}/{sha[2:4]}/{sha}", sha, len(same)))
+        self.assertEqual(rows["b.pdf"], rows["a.pdf"])
+        self.assertNotEqual(rows["c.pdf"][0], rows["a.pdf"][0])
+        # un solo archivo por contenido; los nombres viejos se borran tras el commit
+        self.assertFalse(any(os.path.exists(p) for p in paths))
+        with open(os.path.join(self._media_root, rows["a.pdf"][0]), "rb") as f:
+            self.assertEqual(f.read(), same)
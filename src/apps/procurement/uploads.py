@@ -0,0 +1,295 @@
+"""
+Adjuntos del CC: validación y subida por partes (reanudable).
+
+- Tipo: se decide por los primeros bytes (firma), no por la extensión; un tipo no permitido
+  se rechaza con la primera parte, antes de recibir el resto. El tipo detectado se guarda en
+  el adjunto (`tipo`) y es lo único que decide el Content-Type al descargarlo.
+- Cuotas: tamaño máximo por archivo (ATTACHMENT_MAX_FILE_SIZE) y por CC
+  (ATTACHMENT_MAX_CC_SIZE, suma de adjuntos + subidas en curso).
+- Subida por partes: cada parte (≤ ATTACHMENT_CHUNK_SIZE) es un request corto que se copia
+  por bloques directo al archivo parcial en MEDIA mientras se calcula el SHA-256; al llegar
+  el último byte el parcial se enlaza con su nombre por contenido (sin copiar; si ese contenido
+  ya estaba guardado se reutiliza) y se crea el adjunto.
+  Si se corta, el cliente pregunta el offset y sigue desde ahí.
+
+Escribe en disco con rutas locales: requiere FileSystemStorage (el de MEDIA_ROOT).
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Sum
+
+from apps.core.storage import blob_lock
+
+from .models import ComparativeAttachmentUpload, ComparativeQuote, ComparativeQuoteAttachment
+
+MAX_FILE_SIZE = getattr(settings, "ATTACHMENT_MAX_FILE_SIZE", 500 * 1024 * 1024)
+MAX_CC_SIZE = getattr(settings, "ATTACHMENT_MAX_CC_SIZE", 2 * 1024 * 1024 * 1024)
+CHUNK_SIZE = getattr(settings, "ATTACHMENT_CHUNK_SIZE", 8 * 1024 * 1024)
+
+READ_BLOCK = 64 * 1024
+# Bytes necesarios para reconocer cualquiera de las firmas
+HEAD_SIZE = 16
+
+PARTIAL_DIR = "cc_cotizaciones/_parcial"
+
+# Firmas permitidas: cotizaciones escaneadas (PDF/imagen) y paquetes ZIP (también docx/xlsx)
+SIGNATURES = (
+    (b"%PDF-", "pdf"),
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+    (b"PK\x03\x04", "zip"),
+)
+
+
+# tipo detectado -> Content-Type con el que se entrega (nunca a partir del nombre del archivo)
+CONTENT_TYPES = {
+    "pdf": "application/pdf",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "gif": "image/gif",
+    "tiff": "image/tiff",
+    "webp": "image/webp",
+    "zip": "application/zip",
+}
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.extra = extra
+
+
+def sniff_type(head: bytes):
+    for signature, kind in SIGNATURES:
+        if head.startswith(signature):
+            return kind
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def check_type(head: bytes) -> str:
+    kind = sniff_type(head)
+    if kind is None:
+        raise UploadError("Tipo de archivo no permitido: solo PDF, imágenes (JPG/PNG/TIFF/WebP/GIF) o ZIP.", 415)
+    return kind
+
+
+def content_type_for(kind: str) -> str:
+    return CONTENT_TYPES.get(kind, "application/octet-stream")
+
+
+def cc_usage(cc) -> int:
+    """Bytes ocupados por el CC: adjuntos + subidas en curso."""
+    adjuntos = cc.adjuntos.aggregate(t=Sum("tamano"))["t"] or 0
+    en_curso = cc.subidas.aggregate(t=Sum("tamano"))["t"] or 0
+    return adjuntos + en_curso
+
+
+def check_quota(cc, size: int) -> None:
+    if size <= 0:
+        raise UploadError("El archivo está vacío.")
+    if size > MAX_FILE_SIZE:
+        raise UploadError(f"El archivo supera el máximo de {MAX_FILE_SIZE // (1024 * 1024)} MB.", 413)
+    if cc_usage(cc) + size > MAX_CC_SIZE:
+        raise UploadError(
+            f"El cuadro superaría su cuota de adjuntos ({MAX_CC_SIZE // (1024 * 1024)} MB).", 413
+        )
+
+
+def lock_for_quota(cc) -> None:
+    """
+    Bloquea la fila del CC hasta el fin de la transacción actual: serializa las subidas del
+    mismo CC para que la cuota no se pase entre dos requests. Llamar antes de check_quota.
+    """
+    ComparativeQuote.objects.select_for_update().only("id").get(pk=cc.pk)
+
+
+def inspect_uploaded_file(cc, uploaded):
+    """
+    Subida clásica (formulario): valida tipo y cuotas. Devuelve (SHA-256, tipo).
+    La cuota se vuelve a revisar con lock_for_quota al guardar el adjunto.
+    """
+    check_quota(cc, uploaded.size)
+    uploaded.seek(0)
+    kind = check_type(uploaded.read(HEAD_SIZE))
+    uploaded.seek(0)
+    digest = hashlib.sha256()
+    for chunk in uploaded.chunks():
+        digest.update(chunk)
+    uploaded.seek(0)
+    return digest.hexdigest(), kind
+
+
+# =========================
+# Subida por partes
+# =========================
+def start_upload(cc, user, nombre: str, size: int) -> ComparativeAttachmentUpload:
+    nombre = os.path.basename((nombre or "").replace("\\", "/")).strip()[:255] or "documento"
+    with transaction.atomic():
+        lock_for_quota(cc)
+        check_quota(cc, size)
+        upload = ComparativeAttachmentUpload(cuadro=cc, subido_por=user, nombre=nombre, tamano=size)
+        upload.archivo_parcial = f"{PARTIAL_DIR}/{upload.id}.part"
+        path = default_storage.path(upload.archivo_parcial)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "wb").close()
+        upload.save()
+    return upload
+
+
+# Hash en curso por subida, para no releer el parcial en cada parte.
+# Si la siguiente parte llega a otro proceso (o tras reiniciar) se reconstruye leyendo el parcial.
+_hashers = OrderedDict()
+_hashers_lock = threading.Lock()
+_HASHERS_MAX = 64
+
+
+def _take_hasher(upload, path):
+    with _hashers_lock:
+        cached = _hashers.pop(upload.pk, None)
+    if cached is not None and cached[0] == upload.recibido:
+        return cached[1]
+
+    digest = hashlib.sha256()
+    remaining = upload.recibido
+    with open(path, "rb") as f:
+        while remaining > 0:
+            block = f.read(min(READ_BLOCK * 16, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest
+
+
+def _keep_hasher(upload, digest):
+    with _hashers_lock:
+        _hashers[upload.pk] = (upload.recibido, digest)
+        while len(_hashers) > _HASHERS_MAX:
+            _hashers.popitem(last=False)
+
+
+def _read_head(stream, length):
+    head = b""
+    while len(head) < min(HEAD_SIZE, length):
+        block = stream.read(min(READ_BLOCK, length) - len(head))
+        if not block:
+            break
+        head += block
+    return head
+
+
+def append_chunk(upload_id, offset: int, stream, length: int):
+    """
+    Agrega una parte leída de `stream` (el cuerpo del request, sin cargarlo entero en memoria).
+    Devuelve (upload, adjunto); adjunto es None hasta que llega la última parte.
+    """
+    if length <= 0:
+        raise UploadError("Parte vacía.")
+    if length > CHUNK_SIZE:
+        raise UploadError(f"Cada parte puede tener como máximo {CHUNK_SIZE // (1024 * 1024)} MB.", 413)
+
+    with transaction.atomic():
+        upload = ComparativeAttachmentUpload.objects.select_for_update().filter(pk=upload_id).first()
+        if upload is None:
+            raise UploadError("La subida no existe o ya terminó.", 404)
+        if offset != upload.recibido:
+            raise UploadError("El offset no coincide.", 409, offset=upload.recibido)
+        if offset + length > upload.tamano:
+            raise UploadError("La parte excede el tamaño declarado del archivo.", 400)
+
+        path = default_storage.path(upload.archivo_parcial)
+        digest = _take_hasher(upload, path)
+        written = 0
+        with open(path, "r+b") as f:
+            f.seek(offset)
+            f.truncate()  # restos de una parte anterior que se cortó
+            try:
+                if offset == 0:
+                    head = _read_head(stream, length)
+                    check_type(head)
+                    f.write(head)
+                    digest.update(head)
+                    written = len(head)
+                while written < length:
+                    block = stream.read(min(READ_BLOCK, length - written))
+                    if not block:
+                        break
+                    f.write(block)
+                    digest.update(block)
+                    written += len(block)
+            finally:
+                if written != length:
+                    f.truncate(offset)
+        if written != length:
+            raise UploadError("La parte llegó incompleta; reintenta desde el offset.", 400, offset=offset)
+
+        upload.recibido = offset + written
+        upload.save(update_fields=["recibido", "actualizado_en"])
+
+        if upload.recibido < upload.tamano:
+            _keep_hasher(upload, digest)
+            return upload, None
+        return upload, _finish(upload, digest.hexdigest())
+
+
+def _finish(upload, sha256: str) -> ComparativeQuoteAttachment:
+    partial = default_storage.path(upload.archivo_parcial)
+    with open(partial, "rb") as f:
+        kind = check_type(f.read(HEAD_SIZE))  # ya validado con la primera parte
+    storage = ComparativeQuoteAttachment._meta.get_field("archivo").storage
+    # Estamos en la transacción de append_chunk: el lock se suelta con el commit del adjunto
+    with blob_lock(storage.blob_name(sha256)):
+        name = storage.adopt(partial, sha256)
+        attachment = ComparativeQuoteAttachment.objects.create(
+            cuadro_id=upload.cuadro_id,
+            subido_por_id=upload.subido_por_id,
+            archivo=name,
+            nombre=upload.nombre,
+            tamano=upload.tamano,
+            sha256=sha256,
+            tipo=kind,
+        )
+    upload.delete()
+    # el parcial se borra recién con el commit: si la transacción falla, la subida sigue en la BD
+    # (con el offset anterior) y su archivo sigue en disco, así que la última parte se puede reintentar
+    transaction.on_commit(lambda: _remove_partial(partial))
+    return attachment
+
+
+def _remove_partial(path) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def abort_upload(upload) -> None:
+    with _hashers_lock:
+        _hashers.pop(upload.pk, None)
+    if default_storage.exists(upload.archivo_parcial):
+        default_storage.delete(upload.archivo_parcial)
+    upload.delete()
+
+
+def purge_stale_uploads(older_than) -> int:
+    """Cancela las subidas sin partes nuevas desde `older_than` (datetime). Devuelve cuántas."""
+    stale = ComparativeAttachmentUpload.objects.filter(actualizado_en__lt=older_than)
+    count = 0
+    for upload in stale.iterator():
+        abort_upload(upload)
+        count += 1
+    return count
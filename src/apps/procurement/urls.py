@@ -2,6 +2,7 @@ from django.urls import path
 
 from apps.procurement.views import (
     cc_list,
+    cc_export,
     cc_create,
     cc_detail,
     cc_add_item,
@@ -20,6 +21,7 @@ from apps.procurement.views import (
     # ops / print
     cc_generate_ops,
     cc_print,
+    cc_pdf,
 
     # editar/eliminar
     cc_edit_item,
@@ -35,11 +37,15 @@ from apps.procurement.views import (
 
     # adjuntos
     cc_attachment_upload,
+    cc_attachment_download,
     cc_attachment_delete,
+    cc_upload_start,
+    cc_upload_chunk,
 )
 
 urlpatterns = [
     path("cuadros/", cc_list, name="cc_list"),
+    path("cuadros/exportar/", cc_export, name="cc_export"),
     path("cuadros/nuevo/", cc_create, name="cc_create"),
     path("cuadros/<int:pk>/", cc_detail, name="cc_detail"),
 
@@ -61,7 +67,11 @@ urlpatterns = [
 
     # adjuntos (cotizaciones)
     path("cuadros/<int:pk>/adjuntos/upload/", cc_attachment_upload, name="cc_attachment_upload"),
+    path("cuadros/<int:pk>/adjuntos/<int:att_id>/", cc_attachment_download, name="cc_attachment_download"),
     path("cuadros/<int:pk>/adjuntos/<int:att_id>/eliminar/", cc_attachment_delete, name="cc_attachment_delete"),
+    # subida por partes (reanudable)
+    path("cuadros/<int:pk>/adjuntos/subidas/", cc_upload_start, name="cc_upload_start"),
+    path("cuadros/<int:pk>/adjuntos/subidas/<uuid:upload_id>/", cc_upload_chunk, name="cc_upload_chunk"),
 
     # flujo
     path("cuadros/<int:pk>/enviar-revision/", cc_send_review, name="cc_send_review"),
@@ -84,4 +94,5 @@ urlpatterns = [
 
     # imprimir
     path("cuadros/<int:pk>/imprimir/", cc_print, name="cc_print"),
+    path("cuadros/<int:pk>/pdf/", cc_pdf, name="cc_pdf"),
 ]
@@ -1,16 +1,26 @@
+import os
 from collections import defaultdict
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from django.core.exceptions import ValidationError
 from django.db.models import Q
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
-from django.http import HttpResponseForbidden, HttpResponseNotAllowed
+from django.http import HttpResponseForbidden, HttpResponseNotAllowed, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 
 from apps.catalog.models import Provider
+from apps.core.counters import counters_bulk_created
+from apps.core.events import emit_state_change
+from apps.core.downloads import serve_file
+from apps.core.exports import CHUNK_SIZE as EXPORT_CHUNK_SIZE, FORMATS as EXPORT_FORMATS
+from apps.core.exports import csv_response, filter_created_range, money, start_xlsx_export
+from apps.core.pagination import keyset_paginate
 from apps.core.permissions import is_creator, is_reviewer, is_approver
-from apps.payments.models import PaymentOrder, PaymentOrderItem
+from apps.core.pdf import pdf_response
+from apps.core.render_cache import bump_render_version, cached_render
+from apps.payments.models import PaymentOrder, PaymentOrderItem, PaymentOrderRead
 from django.db.models.deletion import ProtectedError
 
 from .forms import (
@@ -20,7 +30,16 @@ from .forms import (
     ComparativeSupplierForm,
     ComparativeAttachmentForm,
 )
-from .models import ComparativeQuote, ComparativeQuoteAttachment
+from . import uploads
+from .matrix import ComparisonMatrix
+from .printing import cc_print_context
+from .models import (
+    ComparativeAttachmentUpload,
+    ComparativePrice,
+    ComparativeQuote,
+    ComparativeQuoteAttachment,
+    next_document_numbers,
+)
 from django.urls import reverse
 from urllib.parse import urlencode
 
@@ -50,15 +69,9 @@ def _op_is_complete(op: PaymentOrder) -> bool:
 
     return True
 
-@login_required
-def cc_list(request):
-    qs = ComparativeQuote.objects.select_related(
-        "creado_por", "revisado_por", "aprobado_por"
-    ).prefetch_related("ordenes_pago").order_by("-creado_en")
-
-    is_rev = (request.user.is_superuser or is_reviewer(request.user))
-    is_app = (request.user.is_superuser or is_approver(request.user))
 
+def _filter_cc_list(qs, user, params, is_rev: bool, is_app: bool):
+    """Visibilidad y tab (?status=) de cc_list; las exportaciones aplican exactamente lo mismo."""
     # Visibilidad:
     # - Revisor/Aprobador/Superuser: ven todo EXCEPTO BORRADORES de otros usuarios.
     # - Creador (sin rol): ve solo lo suyo.
@@ -68,13 +81,13 @@ def cc_list(request):
                 ComparativeQuote.Status.EN_REVISION,
                 ComparativeQuote.Status.REVISADO,
                 ComparativeQuote.Status.APROBADO,
-            ]) | Q(creado_por=request.user)
+            ]) | Q(creado_por=user)
         )
     else:
-        qs = qs.filter(creado_por=request.user)
+        qs = qs.filter(creado_por=user)
 
     # Tabs (filtros)
-    status = (request.GET.get("status") or "all").lower()
+    status = (params.get("status") or "all").lower()
 
     if status in ("draft", "borrador"):
         qs = qs.filter(estado=ComparativeQuote.Status.BORRADOR)
@@ -99,49 +112,111 @@ def cc_list(request):
     else:
         status = "all"
 
-    cuadros = list(qs)
-
-    # =========================
-    # ✅ "Cola de trabajo" por CC (para círculo)
-    # =========================
-    for cc in cuadros:
-        ops = sorted(list(cc.ordenes_pago.all()), key=lambda x: x.id)
+    return qs, status
 
-        cc.ops_total = len(ops)
 
-        # ✅ Conteos reales por estado (sin suposiciones)
-        cc.ops_reviewed_count = sum(1 for op in ops if op.estado == PaymentOrder.Status.REVISADO)
-        cc.ops_pending_count = sum(1 for op in ops if op.estado == PaymentOrder.Status.EN_REVISION)
+@login_required
+def cc_list(request):
+    is_rev = (request.user.is_superuser or is_reviewer(request.user))
+    is_app = (request.user.is_superuser or is_approver(request.user))
 
-        # ✅ next_op_id:
-        # - Revisor: prioriza OP EN_REVISION, si no hay, primera OP
-        # - Aprobador: prioriza OP REVISADO (lo que debe “ver”), si no hay, primera OP
-        cc.next_op_id = None
-        if ops:
-            if is_rev and not is_app:
-                target = next((op for op in ops if op.estado == PaymentOrder.Status.EN_REVISION), None) or ops[0]
-                cc.next_op_id = target.id
+    # ✅ "Cola de trabajo" por CC (para círculo), calculada en SQL:
+    # - Revisor: prioriza OP EN_REVISION, si no hay, primera OP
+    # - Aprobador: prioriza OP REVISADO (lo que debe “ver”), si no hay, primera OP
+    # - Ambos roles: primera OP
+    prefer_estado = None
+    if is_rev and not is_app:
+        prefer_estado = PaymentOrder.Status.EN_REVISION
+    elif is_app and not is_rev:
+        prefer_estado = PaymentOrder.Status.REVISADO
 
-            elif is_app and not is_rev:
-                target = next((op for op in ops if op.estado == PaymentOrder.Status.REVISADO), None) or ops[0]
-                cc.next_op_id = target.id
+    qs = ComparativeQuote.objects.select_related(
+        "creado_por", "revisado_por", "aprobado_por"
+    ).with_op_queue(prefer_estado)
 
-            else:
-                # fallback (si tuviera ambos roles): llévalo a la primera
-                cc.next_op_id = ops[0].id
+    qs, status = _filter_cc_list(qs, request.user, request.GET, is_rev, is_app)
 
+    # Solo la página actual (cursor sobre creado_en, id)
+    page = keyset_paginate(qs, request)
+    cuadros = page.object_list
 
     return render(
         request,
         "procurement/cc_list.html",
         {
             "cuadros": cuadros,
+            "page": page,
             "is_reviewer": is_rev,
             "is_approver": is_app,
             "status": status,
+            "export_xlsx": "xlsx" in EXPORT_FORMATS,
         },
     )
 
+
+CC_EXPORT_HEADER = [
+    "N° CC", "Estado", "Artículo", "Proyecto", "Expresado en", "Creador", "Fecha", "Aprobado en",
+    "Proveedor seleccionado", "NIT", "Producto", "Unidad", "Cantidad", "Precio unit.", "Subtotal", "Total CC",
+]
+
+
+def _cc_export_rows(qs):
+    """Una fila por ítem del cuadro (o una sola si no tiene ítems), con el precio del proveedor seleccionado."""
+    for cc in qs.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        sel = cc.proveedor_seleccionado.proveedor if cc.proveedor_seleccionado_id else None
+        precios = {p.producto_id: p.precio_unit for p in cc.precios.all() if sel and p.proveedor_id == sel.id}
+
+        lines = []
+        total = Decimal("0")
+        for it in cc.items.all():
+            precio = precios.get(it.producto_id)
+            subtotal = it.cantidad * precio if precio is not None else None
+            total += subtotal or 0
+            lines.append((it.producto.nombre, it.unidad, it.cantidad, precio, money(subtotal)))
+
+        head = [
+            cc.number,
+            cc.get_estado_display(),
+            cc.item_cotizado,
+            cc.proyecto,
+            cc.expresado_en,
+            cc.creado_por.get_full_name() or cc.creado_por.username,
+            cc.creado_en,
+            cc.aprobado_en,
+            sel.nombre_empresa if sel else "",
+            sel.nit if sel else "",
+        ]
+        for line in lines or [("", "", None, None, None)]:
+            yield head + list(line) + [money(total) if sel else None]
+
+
+def cc_export_data(user, params):
+    """(nombre, encabezado, filas) del listado de CC con los permisos y el tab de cc_list. ValueError si una fecha es inválida."""
+    is_rev = (user.is_superuser or is_reviewer(user))
+    is_app = (user.is_superuser or is_approver(user))
+
+    qs = ComparativeQuote.objects.select_related("creado_por", "proveedor_seleccionado__proveedor")
+    qs, status = _filter_cc_list(qs, user, params, is_rev, is_app)
+    qs = filter_created_range(qs, params)
+
+    qs = qs.prefetch_related("items__producto", "precios").order_by("creado_en", "id")
+    filename = f"cuadros_{status}_{timezone.localdate():%Y%m%d}"
+    return filename, CC_EXPORT_HEADER, _cc_export_rows(qs)
+
+
+@login_required
+def cc_export(request):
+    """Listado de CC en CSV (en streaming) o XLSX (generado en la cola, ver core.exports)."""
+    try:
+        filename, header, rows = cc_export_data(request.user, request.GET)
+    except ValueError:
+        messages.error(request, "Fecha inválida: usa AAAA-MM-DD.")
+        return redirect(f"{reverse('cc_list')}?{urlencode({'status': request.GET.get('status') or 'all'})}")
+
+    if request.GET.get("formato") == "xlsx" and "xlsx" in EXPORT_FORMATS:
+        return start_xlsx_export(request, "cc", filename)
+    return csv_response(filename, header, rows)
+
 @login_required
 def cc_create(request):
     if not is_creator(request.user):
@@ -189,13 +264,9 @@ def cc_edit_header(request, pk: int):
 
     return render(request, "procurement/cc_edit_header.html", {"cc": cc, "form": form})
 
-@login_required
-def cc_detail(request, pk: int):
-    cc = get_object_or_404(ComparativeQuote, pk=pk)
-
+def _cc_read_denied(request, cc):
+    """Respuesta si el usuario NO puede ver el CC (None si puede). La usan cc_detail y sus descargas."""
     user = request.user
-    is_rev = (user.is_superuser or is_reviewer(user))
-    is_app = (user.is_superuser or is_approver(user))
 
     # Si está en BORRADOR, solo el creador o superuser pueden verlo
     if cc.estado == ComparativeQuote.Status.BORRADOR and not (
@@ -212,25 +283,25 @@ def cc_detail(request, pk: int):
         or cc.creado_por_id == user.id
     ):
         return HttpResponseForbidden("No tienes permiso para ver este cuadro.")
+    return None
 
-    items = list(cc.items.select_related("producto").all())
-    proveedores = list(cc.proveedores.select_related("proveedor").all())
 
-    precios = defaultdict(dict)
-    for p in cc.precios.all():
-        precios[p.proveedor_id][p.producto_id] = p.precio_unit
+@login_required
+def cc_detail(request, pk: int):
+    cc = get_object_or_404(ComparativeQuote, pk=pk)
 
-    totales_por_proveedor = {}
-    for ps in proveedores:
-        prov_id = ps.proveedor_id
-        total = Decimal("0")
-        for it in items:
-            precio_unit = precios.get(prov_id, {}).get(it.producto_id)
-            if precio_unit is not None:
-                total += (it.cantidad * precio_unit)
-        totales_por_proveedor[str(prov_id)] = total
+    user = request.user
+    is_rev = (user.is_superuser or is_reviewer(user))
+    is_app = (user.is_superuser or is_approver(user))
+
+    denied = _cc_read_denied(request, cc)
+    if denied:
+        return denied
+
+    matrix = ComparisonMatrix.for_quote(cc)
+    items = matrix.items
+    proveedores = matrix.proveedores
 
-    total_general = sum(totales_por_proveedor.values(), Decimal("0"))
     # 🔒 Bloqueo total cuando está REVISADO/APROBADO/RECHAZADO (excepto superuser)
     cc_bloqueado = (cc.estado in LOCKED_CC_STATES and not user.is_superuser)
 
@@ -279,7 +350,9 @@ def cc_detail(request, pk: int):
     # =========================
     ops = list(cc.ordenes_pago.all().order_by("id"))
     first_op_id = ops[0].id if ops else None
-    approver_seen_ops = bool(request.session.get(f"cc_seen_ops_{cc.pk}", False))
+    # ✅ Círculo de lectura: OPs que este usuario ya abrió (una consulta)
+    seen_op_ids = PaymentOrderRead.objects.seen_ids(user, [op.id for op in ops]) if ops else set()
+    approver_seen_ops = bool(seen_op_ids)
 
     # =========================
     # Checklist para enviar a revisión (validación UI)
@@ -294,15 +367,7 @@ def cc_detail(request, pk: int):
     has_ops_complete = has_ops and (len(ops_incompletas) == 0)
     first_incomplete_op_id = ops_incompletas[0].id if ops_incompletas else None
 
-    missing_matrix = []
-    matriz_completa = False
-    if has_items and has_proveedores:
-        for ps in proveedores:
-            for it in items:
-                pu = precios.get(ps.proveedor_id, {}).get(it.producto_id)
-                if pu is None:
-                    missing_matrix.append((ps.proveedor_id, it.producto_id))
-        matriz_completa = (len(missing_matrix) == 0)
+    matriz_completa = matrix.is_complete
 
     cc_ready_for_review = all([
         has_items,
@@ -340,9 +405,9 @@ def cc_detail(request, pk: int):
             "cc": cc,
             "items": items,
             "proveedores": proveedores,
-            "precios": precios,
-            "totales_por_proveedor": totales_por_proveedor,
-            "total_general": total_general,
+            "matriz": matrix.rows(),
+            "totales_proveedores": matrix.supplier_totals,
+            "total_general": matrix.total_general,
             "ordenes": cc.ordenes_pago.all(),
 
             "is_reviewer": is_rev,
@@ -378,6 +443,7 @@ def cc_detail(request, pk: int):
 
             # ✅ Aprobador (círculo lectura)
             "approver_seen_ops": approver_seen_ops,
+            "seen_op_ids": seen_op_ids,
             "first_op_id": first_op_id,
         },
     )
@@ -448,7 +514,9 @@ def cc_add_item(request, pk):
 
             return redirect("cc_detail", pk=pk)
     else:
-        form = ComparativeItemForm()
+        # ✅ Al volver de crear producto (?created_product=ID) queda preseleccionado
+        created = request.GET.get("created_product") or ""
+        form = ComparativeItemForm(initial={"producto": created} if created.isdigit() else None)
 
     return render(request, "procurement/cc_add_item.html", {"form": form, "cc": cc})
 
@@ -597,68 +665,78 @@ def cc_prices(request, pk):
     # 🔒 Si está aprobado: se permite VER, pero no GUARDAR (excepto superuser)
     cc_bloqueado = (cc.estado == ComparativeQuote.Status.APROBADO and not request.user.is_superuser)
 
-    items = list(cc.items.select_related("producto").all())
-    proveedores = list(cc.proveedores.select_related("proveedor").all())
-
-    precios_existentes = {
-        f"{p.proveedor_id}_{p.producto_id}": p.precio_unit
-        for p in cc.precios.all()
-    }
+    matrix = ComparisonMatrix.for_quote(cc)
+    items = matrix.items
+    proveedores = matrix.proveedores
 
     if request.method == "POST":
         if cc_bloqueado:
             messages.error(request, "El cuadro está APROBADO: la matriz está bloqueada (no se puede guardar).")
             return redirect("cc_prices", pk=pk)
 
-        with transaction.atomic():
-            for ps in proveedores:
-                for it in items:
-                    field_name = f"precio_{ps.proveedor_id}_{it.producto_id}"
-                    raw = (request.POST.get(field_name) or "").strip()
-                    if raw == "":
-                        continue
-
-                    raw = raw.replace(",", ".")
-                    precio = Decimal(raw)
-
-                    obj = cc.precios.filter(
-                        proveedor_id=ps.proveedor_id,
-                        producto_id=it.producto_id,
-                    ).first()
-
-                    if obj:
-                        obj.precio_unit = precio
-                        obj.save()
-                    else:
-                        cc.precios.create(
+        # 1) Parsear y validar TODA la matriz antes de escribir
+        precio_field = ComparativePrice._meta.get_field("precio_unit")
+        cambios = []
+        invalidos = []
+        for ps in proveedores:
+            for it in items:
+                key = f"{ps.proveedor_id}_{it.producto_id}"
+                raw = (request.POST.get(f"precio_{key}") or "").strip()
+                if raw == "":
+                    continue
+
+                try:
+                    precio = Decimal(raw.replace(",", "."))
+                    if not precio.is_finite():
+                        raise InvalidOperation
+                    precio = precio.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+                    precio_field.run_validators(precio)
+                except (InvalidOperation, ValidationError):
+                    invalidos.append(f"{ps.proveedor.nombre_empresa} → {it.producto.nombre}: “{raw}”")
+                    continue
+
+                # solo las celdas que realmente cambiaron
+                if matrix.price(ps.proveedor_id, it.producto_id) != precio:
+                    cambios.append(
+                        ComparativePrice(
+                            cuadro=cc,
                             proveedor_id=ps.proveedor_id,
                             producto_id=it.producto_id,
                             precio_unit=precio,
                         )
+                    )
+
+        if invalidos:
+            preview = ", ".join(invalidos[:10])
+            extra = "" if len(invalidos) <= 10 else f" … (+{len(invalidos) - 10} más)"
+            messages.error(request, f"Precios inválidos (no se guardó nada): {preview}{extra}")
+            return redirect("cc_prices", pk=pk)
 
-                    precios_existentes[f"{ps.proveedor_id}_{it.producto_id}"] = precio
+        # 2) Un solo INSERT ... ON CONFLICT DO UPDATE para todas las celdas cambiadas
+        if cambios:
+            with transaction.atomic():
+                ComparativePrice.objects.bulk_create(
+                    cambios,
+                    update_conflicts=True,
+                    unique_fields=["cuadro", "proveedor", "producto"],
+                    update_fields=["precio_unit"],
+                )
+                # bulk_create no dispara señales: invalidamos la impresión a mano
+                bump_render_version(ComparativeQuote, pk=cc.pk)
 
         messages.success(request, "Precios guardados.")
         return redirect("cc_prices", pk=pk)
 
-    matriz = []
-    for it in items:
-        fila = {"item": it, "celdas": []}
-        for ps in proveedores:
-            key = f"{ps.proveedor_id}_{it.producto_id}"
-            fila["celdas"].append(
-                {
-                    "proveedor_id": ps.proveedor_id,
-                    "producto_id": it.producto_id,
-                    "precio_unit": precios_existentes.get(key, ""),
-                }
-            )
-        matriz.append(fila)
-
     return render(
         request,
         "procurement/cc_prices.html",
-        {"cc": cc, "items": items, "proveedores": proveedores, "matriz": matriz, "cc_bloqueado": cc_bloqueado},
+        {
+            "cc": cc,
+            "items": items,
+            "proveedores": proveedores,
+            "bloques": matrix.by_supplier(),
+            "cc_bloqueado": cc_bloqueado,
+        },
     )
 
 
@@ -718,12 +796,11 @@ def cc_send_review(request, pk):
     # =========================
     errores = []
 
-    items = list(cc.items.select_related("producto").all())
-    proveedores = list(cc.proveedores.select_related("proveedor").all())
+    matrix = ComparisonMatrix.for_quote(cc)
 
-    if not items:
+    if not matrix.items:
         errores.append("Debes agregar al menos un producto.")
-    if not proveedores:
+    if not matrix.proveedores:
         errores.append("Debes agregar al menos un proveedor.")
 
     if not cc.proveedor_seleccionado_id:
@@ -731,15 +808,11 @@ def cc_send_review(request, pk):
     if not (cc.motivo_seleccion or "").strip():
         errores.append("Debes registrar el motivo de la selección.")
 
-    if items and proveedores:
-        existentes = set(cc.precios.values_list("proveedor_id", "producto_id"))
-        faltantes = []
-        for ps in proveedores:
-            for it in items:
-                key = (ps.proveedor_id, it.producto_id)
-                if key not in existentes:
-                    faltantes.append(f"{ps.proveedor.nombre_empresa} → {it.producto.nombre}")
-
+    if matrix.items and matrix.proveedores:
+        faltantes = [
+            f"{ps.proveedor.nombre_empresa} → {it.producto.nombre}"
+            for ps, it in matrix.missing
+        ]
         if faltantes:
             preview = ", ".join(faltantes[:10])
             extra = "" if len(faltantes) <= 10 else f" … (+{len(faltantes) - 10} más)"
@@ -777,8 +850,10 @@ def cc_send_review(request, pk):
     # =========================
     with transaction.atomic():
         # OPs a EN_REVISION
+        enviadas = []
         for op in ops:
             if op.estado in {PaymentOrder.Status.BORRADOR, PaymentOrder.Status.RECHAZADO}:
+                enviadas.append(op)
                 op.estado = PaymentOrder.Status.EN_REVISION
                 op.revisado_por = None
                 op.revisado_en = None
@@ -808,6 +883,8 @@ def cc_send_review(request, pk):
             "rechazado_por", "rechazado_en",
         ])
 
+        emit_state_change(cc, *enviadas)
+
     messages.success(request, "Cuadro y Órdenes de Pago enviados a revisión.")
     return redirect("cc_detail", pk=cc.pk)
 
@@ -857,6 +934,7 @@ def cc_mark_reviewed(request, pk):
         cc.revisado_por = request.user
         cc.revisado_en = now
         cc.save(update_fields=["estado", "revisado_por", "revisado_en"])
+        emit_state_change(cc)
 
     messages.success(request, "Cuadro marcado como revisado.")
     return redirect("cc_detail", pk=cc.pk)
@@ -915,6 +993,8 @@ def cc_back_to_review(request, pk):
             "rechazado_por", "rechazado_en",
         ])
 
+        emit_state_change(cc, *ops)
+
     messages.success(request, "Cuadro y Órdenes devueltos a revisión.")
     return redirect("cc_detail", pk=pk)
 
@@ -955,10 +1035,9 @@ def cc_approve_final(request, pk):
         return redirect(f"{reverse('op_detail', kwargs={'pk': first_bad.pk})}?{qs}")
 
     # ✅ Círculo de lectura: obligar que el aprobador haya abierto al menos una OP desde el CC
-    # (lo marcamos desde op_detail con session key)
+    # (lo marca op_detail en PaymentOrderRead)
     if not user.is_superuser:
-        seen_key = f"cc_seen_ops_{cc.pk}"
-        if not request.session.get(seen_key):
+        if not PaymentOrderRead.objects.filter(user=user, orden__in=ops).exists():
             messages.info(
                 request,
                 "Antes de aprobar, revisa las Órdenes de Pago asociadas (círculo de lectura)."
@@ -971,8 +1050,10 @@ def cc_approve_final(request, pk):
     with transaction.atomic():
         now = timezone.now()
 
+        aprobadas = []
         for op in ops:
             if op.estado == PaymentOrder.Status.REVISADO:
+                aprobadas.append(op)
                 op.estado = PaymentOrder.Status.APROBADO
                 op.aprobado_por = user
                 op.aprobado_en = now
@@ -996,9 +1077,11 @@ def cc_approve_final(request, pk):
             "rechazado_por", "rechazado_en",
         ])
 
+        emit_state_change(cc, *aprobadas)
+
     # limpiamos la marca de lectura para el próximo ciclo (opcional)
     if not user.is_superuser:
-        request.session.pop(f"cc_seen_ops_{cc.pk}", None)
+        PaymentOrderRead.objects.filter(user=user, orden__in=ops).delete()
 
     messages.success(request, "Cuadro aprobado.")
     return redirect("cc_detail", pk=cc.pk)
@@ -1012,12 +1095,9 @@ def cc_generate_ops(request, pk):
     if not (user.is_superuser or cc.creado_por_id == user.id):
         return HttpResponseForbidden("No tiene permisos para generar OPs desde este cuadro.")
 
-    items = list(cc.items.select_related("producto").all())
-    proveedores = list(cc.proveedores.select_related("proveedor").all())
-
-    precios = defaultdict(dict)
-    for p in cc.precios.all():
-        precios[p.proveedor_id][p.producto_id] = p.precio_unit
+    matrix = ComparisonMatrix.for_quote(cc)
+    items = matrix.items
+    proveedores = matrix.proveedores
 
     if request.method == "POST":
         asignados = defaultdict(list)
@@ -1034,8 +1114,7 @@ def cc_generate_ops(request, pk):
         faltan = []
         for proveedor_id, items_lista in asignados.items():
             for it in items_lista:
-                precio_unit = precios.get(proveedor_id, {}).get(it.producto_id)
-                if precio_unit is None:
+                if matrix.price(proveedor_id, it.producto_id) is None:
                     faltan.append(f"{it.producto.nombre} (prov_id={proveedor_id})")
 
         if faltan:
@@ -1045,41 +1124,58 @@ def cc_generate_ops(request, pk):
             )
             return redirect("cc_generate_ops", pk=pk)
 
+        proveedores_map = Provider.objects.in_bulk(list(asignados.keys()))
+        desconocidos = [pid for pid in asignados if pid not in proveedores_map]
+        if desconocidos:
+            messages.error(request, "Proveedor inválido en la asignación de productos.")
+            return redirect("cc_generate_ops", pk=pk)
+
         creadas_ops = []
 
+        # ✅ Generación en lote: números reservados de una vez + bulk_create de OPs e ítems
         with transaction.atomic():
-            for proveedor_id, items_lista in asignados.items():
-                proveedor = Provider.objects.get(pk=proveedor_id)
-
-                op = PaymentOrder.objects.create(
-                    cuadro=cc,
-                    proveedor=proveedor,
-                    para="Maria Teresa Vargas",
-                    cargo_para="Directora Ejecutiva",
-                    de=request.user.get_full_name() or request.user.username,
-                    cargo_de=getattr(getattr(request.user, "userprofile", None), "cargo", "") or "",
-                    fecha_solicitud=timezone.localdate(),
-                    proyecto="Uso Contable",
-                    partida_contable="Uso Contable",
-                    con_factura="Si",
-                    efectivo="No",
-                    # ✅ IMPORTANTE: ya NO ponemos texto automático
-                    descripcion="",
-                    creado_por=request.user,
+            numeros = next_document_numbers("OP", len(asignados))
+            de = request.user.get_full_name() or request.user.username
+            cargo_de = getattr(getattr(request.user, "userprofile", None), "cargo", "") or ""
+            hoy = timezone.localdate()
+
+            for numero, proveedor_id in zip(numeros, asignados):
+                creadas_ops.append(
+                    PaymentOrder(
+                        number=numero,
+                        cuadro=cc,
+                        proveedor=proveedores_map[proveedor_id],
+                        para="Maria Teresa Vargas",
+                        cargo_para="Directora Ejecutiva",
+                        de=de,
+                        cargo_de=cargo_de,
+                        fecha_solicitud=hoy,
+                        proyecto="Uso Contable",
+                        partida_contable="Uso Contable",
+                        con_factura="Si",
+                        efectivo="No",
+                        # ✅ IMPORTANTE: ya NO ponemos texto automático
+                        descripcion="",
+                        creado_por=request.user,
+                    )
                 )
 
-                for it in items_lista:
-                    precio_unit = precios.get(proveedor_id, {}).get(it.producto_id, Decimal("0"))
-                    PaymentOrderItem.objects.create(
+            creadas_ops = PaymentOrder.objects.bulk_create(creadas_ops)
+            counters_bulk_created(creadas_ops)
+
+            PaymentOrderItem.objects.bulk_create(
+                [
+                    PaymentOrderItem(
                         orden=op,
                         producto=it.producto,
                         unidad=it.unidad,
                         cantidad=it.cantidad,
-                        precio_unit=precio_unit,
+                        precio_unit=matrix.price(proveedor_id, it.producto_id),
                     )
-
-                # ✅ CLAVE: guardar la OP creada
-                creadas_ops.append(op)
+                    for op, (proveedor_id, items_lista) in zip(creadas_ops, asignados.items())
+                    for it in items_lista
+                ]
+            )
 
         if not creadas_ops:
             messages.error(request, "No se pudo generar ninguna Orden de Pago.")
@@ -1112,58 +1208,41 @@ def cc_print(request, pk: int):
     ):
         return HttpResponseForbidden("No tienes permiso para ver este cuadro.")
 
-    items = list(cc.items.select_related("producto").all())
-    proveedores = list(cc.proveedores.select_related("proveedor").all())
+    def _render():
+        return render(request, "procurement/cc_print.html", cc_print_context(cc))
 
-    precios = defaultdict(dict)
-    for p in cc.precios.all():
-        precios[p.proveedor_id][p.producto_id] = p.precio_unit
+    # ✅ Cuadro bloqueado: la impresión se sirve desde caché (se invalida con render_version)
+    return cached_render(cc, _render, enabled=cc.estado in LOCKED_CC_STATES)
 
-    totales_por_proveedor = {}
-    for ps in proveedores:
-        prov_id = ps.proveedor_id
-        total = Decimal("0")
-        for it in items:
-            pu = precios.get(prov_id, {}).get(it.producto_id)
-            if pu is not None:
-                total += (it.cantidad * pu)
-        totales_por_proveedor[str(prov_id)] = total
-
-    total_general = sum(totales_por_proveedor.values(), Decimal("0"))
-
-    return render(
-        request,
-        "procurement/cc_print.html",
-        {
-            "cc": cc,
-            "items": items,
-            "proveedores": proveedores,
-            "precios": precios,
-            "totales_por_proveedor": totales_por_proveedor,
-            "total_general": total_general,
-        },
-    )
 
 @login_required
-def cc_attachment_upload(request, pk: int):
+def cc_pdf(request, pk: int):
     cc = get_object_or_404(ComparativeQuote, pk=pk)
 
-    # Si está en BORRADOR, solo el creador o superuser pueden verlo/subir
-    if cc.estado == ComparativeQuote.Status.BORRADOR and not (
-        request.user.is_superuser or cc.creado_por_id == request.user.id
+    # Mismo permiso que la impresión
+    if not (
+        request.user.is_superuser
+        or is_reviewer(request.user)
+        or is_approver(request.user)
+        or cc.creado_por_id == request.user.id
     ):
-        messages.error(request, "Este cuadro está en borrador y aún no está disponible para revisión.")
-        return redirect("cc_list")
+        return HttpResponseForbidden("No tienes permiso para ver este cuadro.")
 
-    # Permiso: solo creador (o superuser) puede adjuntar
-    if not (request.user.is_superuser or cc.creado_por_id == request.user.id):
-        messages.error(request, "No tienes permiso para adjuntar documentos a este cuadro.")
-        return redirect("cc_detail", pk=pk)
+    if cc.estado != ComparativeQuote.Status.APROBADO:
+        messages.error(request, "El PDF solo está disponible para cuadros aprobados.")
+        return redirect("cc_detail", pk=cc.pk)
 
+    return pdf_response(request, cc)
 
-    # Si está aprobado, no se permite adjuntar (excepto superuser)
-    if cc.estado == ComparativeQuote.Status.APROBADO and not request.user.is_superuser:
-        messages.error(request, "El cuadro está APROBADO: no se pueden adjuntar documentos.")
+@login_required
+def cc_attachment_upload(request, pk: int):
+    cc = get_object_or_404(ComparativeQuote, pk=pk)
+
+    denied = _attachment_denied(request, cc)
+    if denied:
+        messages.error(request, denied)
+        if cc.estado == ComparativeQuote.Status.BORRADOR and cc.creado_por_id != request.user.id:
+            return redirect("cc_list")
         return redirect("cc_detail", pk=pk)
 
     if request.method != "POST":
@@ -1171,10 +1250,27 @@ def cc_attachment_upload(request, pk: int):
 
     form = ComparativeAttachmentForm(request.POST, request.FILES)
     if form.is_valid():
+        try:
+            sha256, kind = uploads.inspect_uploaded_file(cc, form.cleaned_data["archivo"])
+        except uploads.UploadError as e:
+            messages.error(request, e.message)
+            return redirect("cc_detail", pk=pk)
         att = form.save(commit=False)
         att.cuadro = cc
         att.subido_por = request.user
-        att.save()
+        att.tamano = form.cleaned_data["archivo"].size
+        att.sha256 = sha256
+        att.tipo = kind
+        try:
+            # el archivo se enlaza con blob_lock tomado hasta el commit de la fila (ver ContentAddressedStorage)
+            with transaction.atomic():
+                # mismo lock que las subidas por partes: la cuota se revisa con las demás subidas serializadas
+                uploads.lock_for_quota(cc)
+                uploads.check_quota(cc, att.tamano)
+                att.save()
+        except uploads.UploadError as e:
+            messages.error(request, e.message)
+            return redirect("cc_detail", pk=pk)
         messages.success(request, "Documento adjuntado.")
     else:
         messages.error(request, "No se pudo adjuntar el documento. Verifica el archivo.")
@@ -1182,6 +1278,133 @@ def cc_attachment_upload(request, pk: int):
     return redirect("cc_detail", pk=pk)
 
 
+def _attachment_denied(request, cc):
+    """Mensaje si el usuario NO puede adjuntar documentos al CC (None si puede)."""
+    # Si está en BORRADOR, solo el creador o superuser pueden verlo/subir
+    if cc.estado == ComparativeQuote.Status.BORRADOR and not (
+        request.user.is_superuser or cc.creado_por_id == request.user.id
+    ):
+        return "Este cuadro está en borrador y aún no está disponible para revisión."
+
+    # Permiso: solo creador (o superuser) puede adjuntar
+    if not (request.user.is_superuser or cc.creado_por_id == request.user.id):
+        return "No tienes permiso para adjuntar documentos a este cuadro."
+
+    # Si está aprobado, no se permite adjuntar (excepto superuser)
+    if cc.estado == ComparativeQuote.Status.APROBADO and not request.user.is_superuser:
+        return "El cuadro está APROBADO: no se pueden adjuntar documentos."
+    return None
+
+
+def _upload_error(e):
+    return JsonResponse({"error": e.message, **e.extra}, status=e.status, json_dumps_params={"ensure_ascii": False})
+
+
+def _upload_state(upload):
+    return {
+        "id": str(upload.pk),
+        "offset": upload.recibido,
+        "tamano": upload.tamano,
+        "chunk_size": uploads.CHUNK_SIZE,
+        "url": reverse("cc_upload_chunk", kwargs={"pk": upload.cuadro_id, "upload_id": upload.pk}),
+    }
+
+
+@login_required
+def cc_upload_start(request, pk: int):
+    """
+    Inicia una subida por partes: POST nombre, tamano.
+    Valida permisos y cuotas ANTES de recibir un solo byte del archivo.
+    """
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+
+    cc = get_object_or_404(ComparativeQuote, pk=pk)
+    denied = _attachment_denied(request, cc)
+    if denied:
+        return JsonResponse({"error": denied}, status=403, json_dumps_params={"ensure_ascii": False})
+
+    raw_size = request.POST.get("tamano") or ""
+    if not raw_size.isdigit():
+        return JsonResponse({"error": "tamano inválido."}, status=400)
+
+    try:
+        upload = uploads.start_upload(cc, request.user, request.POST.get("nombre"), int(raw_size))
+    except uploads.UploadError as e:
+        return _upload_error(e)
+    return JsonResponse(_upload_state(upload), status=201)
+
+
+@login_required
+def cc_upload_chunk(request, pk: int, upload_id):
+    """
+    GET: estado (offset recibido) para reanudar.
+    PUT: agrega una parte; cabecera Upload-Offset = byte donde empieza, cuerpo = bytes crudos.
+    DELETE: cancela la subida.
+    """
+    upload = get_object_or_404(
+        ComparativeAttachmentUpload, pk=upload_id, cuadro_id=pk, subido_por=request.user
+    )
+
+    if request.method == "GET":
+        return JsonResponse(_upload_state(upload))
+
+    if request.method == "DELETE":
+        uploads.abort_upload(upload)
+        return JsonResponse({"ok": True})
+
+    if request.method != "PUT":
+        return HttpResponseNotAllowed(["GET", "PUT", "DELETE"])
+
+    # El CC puede haber cambiado de estado entre partes
+    denied = _attachment_denied(request, upload.cuadro)
+    if denied:
+        return JsonResponse({"error": denied}, status=403, json_dumps_params={"ensure_ascii": False})
+
+    raw_offset = request.headers.get("Upload-Offset") or ""
+    raw_length = request.META.get("CONTENT_LENGTH") or ""
+    if not (raw_offset.isdigit() and raw_length.isdigit()):
+        return JsonResponse({"error": "Faltan Upload-Offset o Content-Length."}, status=400)
+
+    try:
+        # `request` se lee como stream: la parte no se carga entera en memoria
+        upload, attachment = uploads.append_chunk(upload.pk, int(raw_offset), request, int(raw_length))
+    except uploads.UploadError as e:
+        if e.status == 415:
+            # tipo no permitido: se descarta la subida entera (no retiene cuota)
+            uploads.abort_upload(upload)
+        return _upload_error(e)
+
+    if attachment is None:
+        return JsonResponse(_upload_state(upload))
+    return JsonResponse({"done": True, "attachment_id": attachment.pk, "offset": attachment.tamano})
+
+
+@login_required
+def cc_attachment_download(request, pk: int, att_id: int):
+    """
+    Descarga de un adjunto con los mismos permisos de lectura que cc_detail.
+    El envío de los bytes lo hace el servidor web (X-Accel-Redirect) o os.sendfile: ver apps/core/downloads.py.
+    """
+    cc = get_object_or_404(ComparativeQuote, pk=pk)
+    adj = get_object_or_404(ComparativeQuoteAttachment, pk=att_id, cuadro=cc)
+
+    denied = _cc_read_denied(request, cc)
+    if denied:
+        return denied
+
+    # Content-Type según el tipo detectado al subir (el nombre lo elige el usuario);
+    # serve_file fuerza la descarga de todo lo que no sea PDF o imagen
+    return serve_file(
+        request,
+        adj.archivo,
+        filename=adj.nombre or os.path.basename(adj.archivo.name),
+        content_type=uploads.content_type_for(adj.tipo),
+        as_attachment=request.GET.get("descargar") == "1",
+        etag=f'"{adj.sha256}"' if adj.sha256 else None,
+    )
+
+
 @login_required
 def cc_attachment_delete(request, pk: int, att_id: int):
     cc = get_object_or_404(ComparativeQuote, pk=pk)
@@ -1263,6 +1486,8 @@ def cc_reject(request, pk):
             "aprobado_por", "aprobado_en",
         ])
 
+        emit_state_change(cc, *ops)
+
     messages.success(request, "Cuadro y Órdenes de Pago rechazados.")
     return redirect("cc_detail", pk=cc.pk)
 
@@ -1308,8 +1533,10 @@ def cc_back_to_draft(request, pk):
 
         # Mantener consistencia: si el CC vuelve a borrador,
         # las OPs relacionadas (si NO están aprobadas) vuelven a BORRADOR.
+        devueltas = []
         for op in cc.ordenes_pago.all():
             if op.estado != PaymentOrder.Status.APROBADO:
+                devueltas.append(op)
                 op.estado = PaymentOrder.Status.BORRADOR
                 op.revisado_por = None
                 op.revisado_en = None
@@ -1324,5 +1551,7 @@ def cc_back_to_draft(request, pk):
                     "rechazado_por", "rechazado_en",
                 ])
 
+        emit_state_change(cc, *devueltas)
+
     messages.success(request, "Devuelto a borrador.")
     return redirect("cc_detail", pk=cc.pk)
@@ -0,0 +1,50 @@
+"""
+gunicorn para producción (perfil "prod" de docker-compose.yml):
+
+    gunicorn -c config/gunicorn.conf.py config.wsgi
+
+Todo se ajusta por variables de entorno (GUNICORN_*). Ver docs/rendimiento.md.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+
+# sync: un request por proceso. gthread: varios hilos por proceso; conviene por el
+# long-polling de /api/live-updates/, que deja un hilo esperando hasta LIVE_UPDATES_TIMEOUT.
+# Por proceso esperan a la vez hasta LIVE_UPDATES_MAX_WAITERS (por defecto threads - 2).
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+# gthread: un proceso por CPU (los hilos cubren las esperas de BD); sync: 2 x CPU + 1
+_cpus = multiprocessing.cpu_count()
+workers = int(os.environ.get("GUNICORN_WORKERS", _cpus if worker_class == "gthread" else _cpus * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", "8")) if worker_class == "gthread" else 1
+
+# Recicla cada worker tras N requests (con jitter para que no reinicien todos a la vez)
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+# Mayor que LIVE_UPDATES_TIMEOUT (25 s) y que la generación de un PDF
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+# Al recibir SIGTERM / reciclar: tiempo para terminar los requests en curso
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+
+# La app se carga una vez en el maestro y los workers la heredan (copy-on-write).
+# Ojo: con preload_app, `kill -HUP` recicla workers pero NO recarga el código;
+# para desplegar código nuevo se reinicia el contenedor (docker compose up -d app).
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+# vacío = sin access log
+accesslog = os.environ.get("GUNICORN_ACCESSLOG", "-") or None
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOGLEVEL", "info")
+
+
+def when_ready(server):
+    # Con preload_app esto corre en el maestro ANTES de crear los workers
+    if not preload_app:
+        return
+    from apps.core.warmup import warm_up
+
+    server.log.info("Precarga: %d templates compilados", warm_up())
+
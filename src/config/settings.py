@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 from pathlib import Path
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -41,6 +43,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'apps.core',
     'apps.catalog',
     'apps.procurement',
@@ -96,6 +99,42 @@ DATABASES = {
     }
 }
 
+# Conexiones a PostgreSQL (DB_CONN_MODE), comparar con: manage.py bench_connections
+# - request (por defecto): una conexión nueva por request
+# - persistent: cada hilo del worker reutiliza su conexión hasta DB_CONN_MAX_AGE segundos,
+#   verificándola al inicio de cada request (CONN_HEALTH_CHECKS)
+# - pool: pool de psycopg 3 por proceso (OPTIONS["pool"], psycopg[pool]). Cada request toma una
+#   conexión al empezar y la devuelve al terminar; se recicla a los DB_CONN_MAX_AGE segundos
+#   y se verifica antes de entregarla. Entre DB_POOL_MIN_SIZE y DB_POOL_MAX_SIZE conexiones
+#   por proceso de gunicorn; el máximo debe cubrir los hilos del worker (GUNICORN_THREADS)
+#   más el hilo de live-updates, o los requests esperan hasta DB_POOL_TIMEOUT por una conexión
+DB_CONN_MODE = os.environ.get("DB_CONN_MODE", "request")
+DB_CONN_MAX_AGE = int(os.environ.get("DB_CONN_MAX_AGE", "600"))
+
+if DB_CONN_MODE == "persistent":
+    DATABASES["default"]["CONN_MAX_AGE"] = DB_CONN_MAX_AGE
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+elif DB_CONN_MODE == "pool":
+    _gunicorn_threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+    DB_POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", "2"))
+    DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", str(_gunicorn_threads + 1)))
+    if DB_POOL_MAX_SIZE < _gunicorn_threads + 1:
+        raise ImproperlyConfigured(
+            f"DB_POOL_MAX_SIZE={DB_POOL_MAX_SIZE} es menor que GUNICORN_THREADS + 1 ({_gunicorn_threads + 1}): "
+            "los hilos de gunicorn esperarían por una conexión."
+        )
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": DB_POOL_MIN_SIZE,
+            "max_size": DB_POOL_MAX_SIZE,
+            "max_lifetime": DB_CONN_MAX_AGE,
+            "timeout": int(os.environ.get("DB_POOL_TIMEOUT", "10")),
+        }
+    }
+elif DB_CONN_MODE != "request":
+    raise ImproperlyConfigured(f"DB_CONN_MODE inválido: {DB_CONN_MODE} (request | persistent | pool)")
+
 
 
 # Password validation
@@ -136,11 +175,26 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [
     BASE_DIR / 'static',   # ← apunta a src/static
 ]
+# collectstatic (producción: lo sirve nginx, ver docker/nginx/default.conf)
+STATIC_ROOT = Path(os.environ.get("DJANGO_STATIC_ROOT", BASE_DIR / "staticfiles"))
+
+# collectstatic genera nombres con hash + copias .gz/.br (apps/core/storage.py).
+# Con DEBUG=1 {% static %} sigue usando los nombres originales.
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "apps.core.storage.CompressedManifestStaticFilesStorage"},
+}
 
 # Media files (uploads)
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Descargas de MEDIA con permisos (ver apps/core/downloads.py):
+# django (FileResponse, por defecto) | nginx (X-Accel-Redirect) | sendfile (X-Sendfile, Apache/lighttpd)
+MEDIA_DOWNLOAD_BACKEND = os.environ.get("MEDIA_DOWNLOAD_BACKEND", "django")
+# location `internal` de nginx que apunta a MEDIA_ROOT
+MEDIA_ACCEL_PREFIX = os.environ.get("MEDIA_ACCEL_PREFIX", "/_media_protegida/")
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -149,3 +203,71 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_URL = "/accounts/login/"
 LOGIN_REDIRECT_URL = "/"
 LOGOUT_REDIRECT_URL = "/accounts/login/"
+
+# Long-poll de /api/live-updates/ (ver apps/core/events.py y docs/rendimiento.md)
+LIVE_UPDATES_TIMEOUT = int(os.environ.get("LIVE_UPDATES_TIMEOUT", "25"))
+# Cada cuánto (s) un hilo por proceso consulta el último evento mientras hay alguien esperando
+LIVE_UPDATES_INTERVAL = float(os.environ.get("LIVE_UPDATES_INTERVAL", "1"))
+# Long-polls esperando a la vez por proceso: por defecto GUNICORN_THREADS - 2, para que siempre
+# queden hilos para los demás requests. Los que no entran reciben retry_after.
+LIVE_UPDATES_MAX_WAITERS = int(
+    os.environ.get("LIVE_UPDATES_MAX_WAITERS", str(max(1, int(os.environ.get("GUNICORN_THREADS", "8")) - 2)))
+)
+
+# PDFs archivados de documentos aprobados (ver apps/core/pdf.py)
+# PDF_WORKERS: hilos por proceso web para generarlos en segundo plano (0 = al terminar el request)
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", "1"))
+# PDF_QUEUE=1: se generan en la cola de tareas (manage.py runworker) en vez de en el proceso web
+PDF_QUEUE = os.environ.get("PDF_QUEUE", "0") == "1"
+
+# Exportaciones XLSX de listados (ver apps/core/exports.py)
+# EXPORT_QUEUE=1: se generan en la cola de tareas; si no, dentro del request (solo para desarrollo)
+EXPORT_QUEUE = os.environ.get("EXPORT_QUEUE", "0") == "1"
+EXPORT_KEEP_HOURS = int(os.environ.get("EXPORT_KEEP_HOURS", "24"))
+
+# Cola de tareas en la BD (ver apps/core/jobs.py)
+# JOB_HEARTBEAT_INTERVAL: cada cuántos segundos el worker renueva la tarea que está ejecutando
+# JOB_LOCK_TIMEOUT: segundos EN_CURSO sin renovar tras los que una tarea se da por abandonada y vuelve a la cola
+JOB_HEARTBEAT_INTERVAL = float(os.environ.get("JOB_HEARTBEAT_INTERVAL", "30"))
+JOB_LOCK_TIMEOUT = int(os.environ.get("JOB_LOCK_TIMEOUT", "600"))
+JOB_KEEP_DAYS = int(os.environ.get("JOB_KEEP_DAYS", "7"))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "1"))
+
+# Adjuntos de CC (ver apps/procurement/uploads.py): cuotas y tamaño de cada parte en bytes
+ATTACHMENT_MAX_FILE_SIZE = int(os.environ.get("ATTACHMENT_MAX_FILE_SIZE", str(500 * 1024 * 1024)))
+ATTACHMENT_MAX_CC_SIZE = int(os.environ.get("ATTACHMENT_MAX_CC_SIZE", str(2 * 1024 * 1024 * 1024)))
+ATTACHMENT_CHUNK_SIZE = int(os.environ.get("ATTACHMENT_CHUNK_SIZE", str(8 * 1024 * 1024)))
+
+# Cachés: <ALIAS>_CACHE_BACKEND = locmem (por defecto) | file | redis
+# - "default": la de Django (sin uso propio de la app)
+# - "render": impresiones de CC/OP bloqueados (apps/core/render_cache.py)
+# redis sirve para Redis o cualquier servidor compatible (Valkey, KeyDB...) y requiere el paquete `redis`
+_CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+}
+
+
+def _cache_from_env(prefix, alias, redis_db, timeout):
+    backend = os.environ.get(f"{prefix}_BACKEND", "locmem")
+    default_location = {
+        "locmem": alias,
+        "file": str(BASE_DIR / "cache" / alias),
+        "redis": f"redis://127.0.0.1:6379/{redis_db}",
+    }[backend]
+    return {
+        "BACKEND": _CACHE_BACKENDS[backend],
+        "LOCATION": os.environ.get(f"{prefix}_LOCATION", default_location),
+        "TIMEOUT": int(os.environ.get(f"{prefix}_TIMEOUT", str(timeout))),
+    }
+
+
+CACHES = {
+    "default": _cache_from_env("CACHE", "default", 0, 300),
+    "render": _cache_from_env("RENDER_CACHE", "render", 1, 7 * 24 * 3600),
+}
+
+# Numeración de documentos (ver apps/core/sequences.py):
+# 0 = bloqueo dentro de la transacción (sin huecos); N = bloques de N por proceso (con huecos)
+DOCUMENT_NUMBER_POOL_SIZE = int(os.environ.get("DOCUMENT_NUMBER_POOL_SIZE", "0"))
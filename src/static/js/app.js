@@ -1,12 +1,11 @@
 (() => {
-  const POLL_MS = 8000; // más rápido (8s). Si quieres 5s lo bajamos.
+  const RETRY_MS = 8000; // si el long-poll falla, reintentamos con calma
 
   const endpoints = {
-    counts: "/api/pending-counts/",
-    status: "/api/live-status/",
+    updates: "/api/live-updates/",
   };
 
-  let busy = false;
+  let lastEvent = null; // null = aún no sincronizado
 
   async function fetchJSON(url) {
     const res = await fetch(url, {
@@ -30,17 +29,6 @@
     }
   }
 
-  async function updateCounts() {
-    try {
-      const url = `${endpoints.counts}?_=${Date.now()}`;
-      const data = await fetchJSON(url);
-      setNavBadge(document.getElementById("nav-badge-cc"), data.cc_pending);
-      setNavBadge(document.getElementById("nav-badge-op"), data.op_pending);
-    } catch (_) {
-      // silencioso
-    }
-  }
-
   function applyStatusToTable(table, items) {
     const byId = new Map(items.map((it) => [String(it.id), it]));
     const filter = table.dataset.liveFilter || "all";
@@ -67,46 +55,53 @@
     });
   }
 
-  async function refreshTables() {
-    const tables = document.querySelectorAll("table[data-live-kind]");
-    for (const table of tables) {
-      const kind = table.dataset.liveKind;
+  function watchedIds(kind) {
+    const ids = [];
+    document.querySelectorAll(`table[data-live-kind="${kind}"] tbody tr[data-live-id]`).forEach((tr) => {
+      const v = tr.dataset.liveId;
+      if (v && /^\d+$/.test(v)) ids.push(v);
+    });
+    return ids;
+  }
+
+  function applyUpdate(data) {
+    if (!data || !data.changed) return;
 
-      const ids = Array.from(table.querySelectorAll("tbody tr[data-live-id]"))
-        .map((tr) => tr.dataset.liveId)
-        .filter((v) => v && /^\d+$/.test(v));
+    if (data.counts) {
+      setNavBadge(document.getElementById("nav-badge-cc"), data.counts.cc_pending);
+      setNavBadge(document.getElementById("nav-badge-op"), data.counts.op_pending);
+    }
 
-      if (!kind || ids.length === 0) continue;
+    const items = data.items || {};
+    document.querySelectorAll("table[data-live-kind]").forEach((table) => {
+      const list = items[table.dataset.liveKind];
+      if (Array.isArray(list) && list.length) applyStatusToTable(table, list);
+    });
+  }
 
+  // Long-poll: el servidor responde solo cuando hay cambios de estado (o al vencer el timeout)
+  async function listen() {
+    while (true) {
       const url =
-        `${endpoints.status}?kind=${encodeURIComponent(kind)}` +
-        `&ids=${encodeURIComponent(ids.join(","))}` +
+        `${endpoints.updates}?since=${lastEvent === null ? "" : lastEvent}` +
+        `&cc=${encodeURIComponent(watchedIds("cc").join(","))}` +
+        `&op=${encodeURIComponent(watchedIds("op").join(","))}` +
         `&_=${Date.now()}`;
 
       try {
         const data = await fetchJSON(url);
-        if (data && Array.isArray(data.items)) {
-          applyStatusToTable(table, data.items);
-        }
+        if (data && typeof data.last_event === "number") lastEvent = data.last_event;
+        applyUpdate(data);
+        // el servidor tiene todos sus hilos de espera ocupados: volvemos en unos segundos
+        if (data && data.retry_after) await new Promise((r) => setTimeout(r, data.retry_after * 1000));
       } catch (_) {
-        // silencioso
+        // silencioso: esperamos y volvemos a intentar
+        await new Promise((r) => setTimeout(r, RETRY_MS));
       }
     }
   }
 
-  async function tick() {
-    if (busy) return;
-    busy = true;
-    try {
-      await updateCounts();
-      await refreshTables();
-    } finally {
-      busy = false;
-    }
-  }
-
   document.addEventListener("DOMContentLoaded", () => {
-    tick();
-    setInterval(tick, POLL_MS);
+    listen();
   });
 })();
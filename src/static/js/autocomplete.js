@@ -0,0 +1,106 @@
+// Typeahead para los campos AutocompleteInput (apps/catalog/widgets.py)
+// - Busca en el endpoint (data-url) con ?q=&page= mientras se escribe
+// - Pagina al llegar al final de la lista (has_more)
+// - Guarda el id elegido en el <input hidden> que se envía en el POST
+(() => {
+  if (window.__autocompleteReady) return;
+  window.__autocompleteReady = true;
+
+  const DEBOUNCE_MS = 200;
+
+  function escapeHTML(s) {
+    return String(s ?? "").replace(/[&<>"']/g, (c) => ({
+      "&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;",
+    }[c]));
+  }
+
+  function setup(box) {
+    const url = box.dataset.url;
+    const hidden = box.querySelector('input[type="hidden"]');
+    const input = box.querySelector('input[type="text"]');
+    const list = box.querySelector(".combo-list");
+    if (!url || !hidden || !input || !list) return;
+
+    let timer = null;
+    let query = "";
+    let page = 1;
+    let hasMore = false;
+    let loading = false;
+    let seq = 0; // descarta respuestas viejas
+
+    function close() { list.style.display = "none"; list.innerHTML = ""; }
+
+    async function load(reset) {
+      if (loading && !reset) return;
+      const mine = ++seq;
+      loading = true;
+      if (reset) page = 1;
+      try {
+        const params = new URLSearchParams({ q: query, page: String(page) });
+        const res = await fetch(`${url}?${params}`, {
+          headers: { "X-Requested-With": "XMLHttpRequest" },
+          credentials: "same-origin",
+        });
+        if (!res.ok || mine !== seq) return;
+        const data = await res.json();
+        if (reset) list.innerHTML = "";
+        render(data.results || []);
+        hasMore = !!data.has_more;
+        page = (data.page || page) + 1;
+      } catch (e) {
+        // sin red: dejamos la lista como está
+      } finally {
+        if (mine === seq) loading = false;
+      }
+    }
+
+    function render(items) {
+      if (!items.length && !list.children.length) {
+        list.innerHTML = `<div class="combo-item"><span class="combo-muted">Sin resultados…</span></div>`;
+      }
+      for (const it of items) {
+        const div = document.createElement("div");
+        div.className = "combo-item";
+        const extra = it.nit || it.unidad || "";
+        div.innerHTML = `<span>${escapeHTML(it.text)}</span><span class="combo-muted">${escapeHTML(extra)} #${it.id}</span>`;
+        div.addEventListener("click", () => {
+          hidden.value = it.id;
+          input.value = it.text;
+          close();
+          hidden.dispatchEvent(new CustomEvent("autocomplete:select", { bubbles: true, detail: it }));
+        });
+        list.appendChild(div);
+      }
+      list.style.display = "block";
+    }
+
+    input.addEventListener("focus", () => {
+      if (list.style.display !== "block") { query = hidden.value ? "" : input.value.trim(); load(true); }
+    });
+
+    input.addEventListener("input", () => {
+      hidden.value = ""; // el texto cambió: hasta elegir de nuevo no hay selección
+      clearTimeout(timer);
+      timer = setTimeout(() => { query = input.value.trim(); load(true); }, DEBOUNCE_MS);
+    });
+
+    list.addEventListener("scroll", () => {
+      if (hasMore && list.scrollTop + list.clientHeight >= list.scrollHeight - 24) load(false);
+    });
+
+    document.addEventListener("click", (e) => {
+      if (box.contains(e.target)) return;
+      close();
+    });
+  }
+
+  function init() {
+    document.querySelectorAll(".autocomplete[data-url]").forEach(setup);
+  }
+
+  if (document.readyState === "loading") {
+    document.addEventListener("DOMContentLoaded", init);
+  } else {
+    init();
+  }
+})();
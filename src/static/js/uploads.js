@@ -0,0 +1,129 @@
+// Subida por partes (reanudable) de adjuntos: forms con data-chunked-url
+// - POST data-chunked-url (nombre, tamano) → id + url de la subida
+// - PUT url con Upload-Offset, una parte por request
+// - Si se corta: GET url devuelve el offset y se sigue desde ahí (también tras recargar la página)
+// Sin JS el form se envía normal (subida clásica).
+(() => {
+  if (window.__chunkedUploadsReady) return;
+  window.__chunkedUploadsReady = true;
+
+  const MAX_RETRIES = 5;
+
+  function csrf(form) {
+    const input = form.querySelector('input[name="csrfmiddlewaretoken"]');
+    return input ? input.value : "";
+  }
+
+  function resumeKey(form, file) {
+    return `cc-upload:${form.dataset.chunkedUrl}:${file.name}:${file.size}:${file.lastModified}`;
+  }
+
+  async function json(res) {
+    try { return await res.json(); } catch (_) { return {}; }
+  }
+
+  async function startOrResume(form, file) {
+    const key = resumeKey(form, file);
+    const saved = localStorage.getItem(key);
+    if (saved) {
+      const res = await fetch(saved, { credentials: "same-origin" });
+      if (res.ok) return await res.json();
+      localStorage.removeItem(key);
+    }
+
+    const body = new FormData();
+    body.append("nombre", file.name);
+    body.append("tamano", String(file.size));
+    const res = await fetch(form.dataset.chunkedUrl, {
+      method: "POST",
+      body,
+      credentials: "same-origin",
+      headers: { "X-CSRFToken": csrf(form) },
+    });
+    const data = await json(res);
+    if (!res.ok) throw new Error(data.error || `HTTP ${res.status}`);
+    localStorage.setItem(key, data.url);
+    return data;
+  }
+
+  async function upload(form, file, progress) {
+    const key = resumeKey(form, file);
+    let state = await startOrResume(form, file);
+    let offset = state.offset;
+    let retries = 0;
+
+    while (offset < file.size) {
+      const end = Math.min(offset + state.chunk_size, file.size);
+      let res, data;
+      try {
+        res = await fetch(state.url, {
+          method: "PUT",
+          body: file.slice(offset, end),
+          credentials: "same-origin",
+          headers: {
+            "X-CSRFToken": csrf(form),
+            "Upload-Offset": String(offset),
+            "Content-Type": "application/octet-stream",
+          },
+        });
+        data = await json(res);
+      } catch (_) {
+        res = null; // sin red: reintentamos
+      }
+
+      if (res && res.ok) {
+        offset = data.offset;
+        retries = 0;
+        progress(offset / file.size);
+        if (data.done) break;
+        continue;
+      }
+      if (res && res.status === 409 && typeof data.offset === "number") {
+        offset = data.offset; // el servidor tiene otra cosa: seguimos desde ahí
+        continue;
+      }
+      if (res && res.status !== 400 && res.status < 500) {
+        localStorage.removeItem(key);
+        throw new Error(data.error || `HTTP ${res.status}`);
+      }
+      if (++retries > MAX_RETRIES) throw new Error("No se pudo completar la subida. Vuelve a intentar para continuar.");
+      await new Promise((r) => setTimeout(r, 1000 * retries));
+    }
+    localStorage.removeItem(key);
+  }
+
+  function setup(form) {
+    const input = form.querySelector('input[type="file"]');
+    const status = form.querySelector("[data-upload-status]");
+    const button = form.querySelector('button[type="submit"]');
+    if (!input) return;
+
+    form.addEventListener("submit", async (e) => {
+      const file = input.files && input.files[0];
+      if (!file) return;
+      e.preventDefault();
+      if (button) button.disabled = true;
+
+      const show = (text) => { if (status) { status.hidden = false; status.textContent = text; } };
+      show("Subiendo… 0%");
+      try {
+        await upload(form, file, (p) => show(`Subiendo… ${Math.floor(p * 100)}%`));
+        show("Listo ✅");
+        window.location.reload();
+      } catch (err) {
+        show(`⚠️ ${err.message}`);
+        if (button) button.disabled = false;
+      }
+    });
+  }
+
+  function init() {
+    document.querySelectorAll("form[data-chunked-url]").forEach(setup);
+  }
+
+  if (document.readyState === "loading") {
+    document.addEventListener("DOMContentLoaded", init);
+  } else {
+    init();
+  }
+})();